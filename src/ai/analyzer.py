@@ -3,30 +3,121 @@ Módulo de análisis con IA para resultados de reconocimiento.
 Gestiona la comunicación con OpenAI y el procesamiento de respuestas.
 """
 
-from openai import OpenAI
+from openai import AsyncOpenAI
+import asyncio
 import os
-from typing import Optional, Dict, Any
-from .prompts import get_system_prompt, get_analysis_prompt
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Optional, Dict, Any, AsyncIterator, Iterable, Iterator, List, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from .prompts import (
+    get_system_prompt, get_analysis_prompt, get_chunk_prompt, get_reduce_prompt, get_structured_prompt,
+    CHUNK_SYSTEM_ROLE, DIFF_DATA_TYPE, PROMPT_TEMPLATE_VERSION
+)
+from .batch import BatchRunner
+from .cache import ResponseCache, response_cache_key, scan_fingerprint
+from .clients import get_client, get_async_client
+from .resilience import ResilientCaller, RetryPolicy
+from .router import HISTORY, predict_max_tokens, route
+from .structured import extract_facts, format_facts, parse_report, render_report, response_format_for
+from .ratelimit import RateLimiter
+from .tokens import (
+    count_message_tokens, count_tokens, estimate_cost, has_exact_tokenizer, best_model_within_budget,
+    get_token_counter, cached_prompt_tokens, BATCH_DISCOUNT
+)
+from utils.nmap_xml import NmapHost, format_nmap_hosts
+from utils.parser import normalize_text, chunk_text
+from utils.compact import compact_scan_text, pack_text
+from utils.diff import diff_scans, format_diff, snapshot_hosts, snapshot_text, summarize_snapshot
+
+# Tamaño máximo de entrada admitido gracias al análisis por fragmentos
+MAX_INPUT_CHARS = 2_000_000
+
+
+@asynccontextmanager
+async def _throttle(
+    slots: Optional[asyncio.Semaphore],
+    limiter: Optional[RateLimiter],
+    tokens: int
+) -> AsyncIterator[None]:
+    """
+    Ocupa un hueco de peticiones simultáneas y consume RPM/TPM durante una petición.
+    """
+    if slots is None:
+        if limiter is not None:
+            await limiter.acquire(tokens)
+        yield
+        return
+    async with slots:
+        if limiter is not None:
+            await limiter.acquire(tokens)
+        yield
 
 class ReconAnalyzer:
     """
     Analizador de reconocimiento usando IA.
     """
     
-    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4o-mini"):
+    # Las entradas más largas se analizan por fragmentos (map-reduce)
+    map_reduce_threshold = 48000
+    chunk_chars = 16000
+    chunk_max_tokens = 600
+    map_concurrency = 4
+    
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: str = "gpt-4o-mini",
+        cache: Optional[ResponseCache] = None,
+        budget: Optional[float] = None,
+        budget_policy: str = "refuse",
+        base_url: Optional[str] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        fallback_model: Optional[str] = None,
+        hedge: bool = False,
+        routing_policy: Optional[str] = None,
+        quality_floor: Optional[int] = None,
+        similarity_threshold: Optional[float] = None
+    ):
         """
         Inicializa el analizador.
         
         Args:
             api_key: API key de OpenAI (opcional, usa variable de entorno si no se proporciona)
             model: Modelo de OpenAI a utilizar
+            cache: Caché de respuestas (opcional, sin caché si no se proporciona)
+            budget: Coste máximo previsto por análisis en USD (None para no limitar)
+            budget_policy: Qué hacer si se supera: "refuse" (no llamar a la API)
+                o "downgrade" (usar el mejor modelo que quepa en el presupuesto)
+            base_url: URL base de una API compatible (opcional, usa OPENAI_BASE_URL
+                o la API oficial si no se proporciona)
+            retry_policy: Reintentos, backoff y timeout por llamada (ver `ai.resilience`)
+            fallback_model: Modelo de reserva si el principal falla o su circuito está abierto
+            hedge: Duplicar las peticiones que superen el p95 de latencia del modelo
+            routing_policy: Elegir el modelo automáticamente en cada análisis:
+                "cheapest", "fastest" o "quality" (None usa siempre `model`)
+            quality_floor: Calidad mínima (1-3) para el router (por defecto, según la petición)
+            similarity_threshold: Reutilizar el análisis de un escaneo previo casi
+                idéntico (similitud de Jaccard de sus líneas, sin fechas ni latencias)
+                a partir de este umbral (0.0-1.0; None para desactivarlo; requiere caché)
         """
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL")
         self.model = model
+        self.cache = cache
+        self.budget = budget
+        self.budget_policy = budget_policy
+        self.routing_policy = routing_policy
+        self.quality_floor = quality_floor
+        self.similarity_threshold = similarity_threshold
+        self.caller = ResilientCaller(retry_policy, fallback_model, hedge)
         self.client = None
         
+        # Cliente compartido del proceso: sin pool ni handshake TLS por analizador
         if self.api_key:
-            self.client = OpenAI(api_key=self.api_key)
+            self.client = get_client(self.api_key, self.base_url)
     
     def is_configured(self) -> bool:
         """
@@ -37,85 +128,1016 @@ class ReconAnalyzer:
         """
         return self.client is not None
     
+    def _prepare_request(
+        self,
+        input_text: Union[str, Iterable[NmapHost]],
+        data_type: str,
+        mode: str,
+        temperature: float,
+        max_tokens: Optional[int],
+        type_scores: Optional[Dict[str, float]],
+        use_cache: bool,
+        compact: bool = True,
+        input_token_budget: Optional[int] = None,
+        structured: bool = False
+    ) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Valida la entrada y consulta la caché (común a las variantes de `analyze`).
+        
+        Returns:
+            Tupla (resultado inmediato si hay error o acierto de caché, petición)
+        """
+        request: Dict[str, Any] = {}
+        hosts = None
+        
+        if not isinstance(input_text, str):
+            # Entrada pre-parseada: no hace falta volver a extraer con regex
+            try:
+                if structured:
+                    # Los hosts se reutilizan como hechos conocidos
+                    hosts = list(input_text)
+                    input_text = format_nmap_hosts(hosts)
+                else:
+                    input_text = format_nmap_hosts(input_text)
+            except Exception as e:
+                return {
+                    "success": False,
+                    "error": f"Error al leer los hosts de Nmap: {str(e)}",
+                    "result": None
+                }, request
+            if data_type == "Mixto":
+                data_type = "Nmap"
+        
+        if not self.is_configured():
+            return {
+                "success": False,
+                "error": "API key de OpenAI no configurada",
+                "result": None
+            }, request
+        
+        if not input_text or not input_text.strip():
+            return {
+                "success": False,
+                "error": "No se proporcionó texto para analizar",
+                "result": None
+            }, request
+        
+        normalized_text = normalize_text(input_text)
+        input_text, compaction = self._compact_input(normalized_text, compact, input_token_budget)
+        
+        request.update(
+            input_text=input_text,
+            compaction=compaction,
+            data_type=data_type,
+            mode=mode,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            type_scores=type_scores,
+            model=self.model,
+            cache_key=None
+        )
+        if structured:
+            request["facts"] = extract_facts(normalized_text, hosts)
+        self._route(request)
+        
+        # Conteo de tokens y coste previsto antes de llamar a la API
+        request["preflight"] = self._preflight(request)
+        over_budget = self.budget is not None and request["preflight"]["projected_cost"]["total_cost"] > self.budget
+        if over_budget and self.budget_policy == "downgrade":
+            fallback = best_model_within_budget(
+                self.budget,
+                request["preflight"]["prompt_tokens"],
+                request["preflight"]["max_completion_tokens"],
+                self.get_available_models(),
+                exclude=self.model
+            )
+            if fallback is not None:
+                request["model"] = fallback
+                request["preflight"] = {**self._preflight(request), "downgraded_from": self.model}
+                over_budget = False
+        if over_budget:
+            projected = request["preflight"]["projected_cost"]["total_cost"]
+            return {
+                "success": False,
+                "error": f"El coste previsto (${projected:.4f}) supera el presupuesto (${self.budget:.4f})",
+                "result": None,
+                "metadata": {"preflight": request["preflight"]}
+            }, request
+        
+        # Consultar la caché de respuestas. La clave usa los parámetros pedidos,
+        # no el modelo ni el máximo de tokens elegidos por el router o el
+        # historial, que cambian según se acumulan estadísticas
+        if self.cache is not None and use_cache:
+            requested_model = f"router:{self.routing_policy}" if self.routing_policy else self.model
+            extra = {
+                "type_scores": type_scores,
+                "compact": compact,
+                "input_token_budget": input_token_budget,
+                "structured": structured
+            }
+            if self.routing_policy:
+                extra["quality_floor"] = self.quality_floor
+            if self.budget is not None and self.budget_policy == "downgrade":
+                extra["budget"] = self.budget
+            request["cache_key"] = response_cache_key(
+                requested_model, mode, data_type, temperature, max_tokens,
+                PROMPT_TEMPLATE_VERSION, normalized_text, extra=extra
+            )
+            cached, tier = self.cache.get(request["cache_key"])
+            if cached is not None:
+                result = dict(cached)
+                result["metadata"] = {**cached["metadata"], "cache": {"hit": True, "tier": tier}}
+                return result, request
+            
+            # Escaneo casi idéntico analizado con los mismos parámetros
+            if self.similarity_threshold is not None:
+                scope = response_cache_key(
+                    requested_model, mode, data_type, temperature, max_tokens,
+                    PROMPT_TEMPLATE_VERSION, "", extra=extra
+                )
+                request["fingerprint"] = (scope, scan_fingerprint(normalized_text))
+                match = self.cache.find_similar(request["fingerprint"][1], scope, self.similarity_threshold)
+                if match is not None:
+                    cached, tier = self.cache.get(match[0])
+                    if cached is not None:
+                        return self._reuse_similar(cached, tier, match[1], request), request
+        
+        return None, request
+    
+    def _reuse_similar(
+        self,
+        cached: Dict[str, Any],
+        tier: str,
+        similarity: float,
+        request: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Adapta el análisis de un escaneo casi idéntico: en modo estructurado
+        el informe se regenera con los activos de la entrada actual; en
+        Markdown se devuelve tal cual.
+        """
+        result = dict(cached)
+        cache_info = {"hit": True, "tier": tier, "near_duplicate": True, "similarity": round(similarity, 3)}
+        analysis = (cached.get("structured") or {}).get("analysis")
+        if "facts" in request and analysis is not None:
+            result["result"] = render_report(analysis, request["facts"], request["mode"])
+            result["structured"] = {"facts": request["facts"], "analysis": analysis}
+            cache_info["adapted"] = True
+        result["metadata"] = {**cached["metadata"], "cache": cache_info}
+        return result
+    
+    def _route(self, request: Dict[str, Any]) -> None:
+        """
+        Aplica el router de modelos (si hay política) y, con `max_tokens=None`,
+        la predicción de longitud de respuesta a partir del historial.
+        """
+        if self.routing_policy:
+            decision = route(
+                count_tokens(request["input_text"], request["model"]),
+                request["data_type"],
+                request["mode"],
+                self.get_available_models(),
+                self.routing_policy,
+                self.quality_floor
+            )
+            request["model"] = decision.model
+            if request["max_tokens"] is None:
+                request["max_tokens"] = (
+                    predict_max_tokens(request["data_type"], self._history_mode(request))
+                    if "facts" in request else decision.max_tokens
+                )
+            request["routing"] = {**decision.to_dict(), "max_tokens": request["max_tokens"]}
+        elif request["max_tokens"] is None:
+            request["max_tokens"] = predict_max_tokens(request["data_type"], self._history_mode(request))
+    
+    def _history_mode(self, request: Dict[str, Any]) -> str:
+        """
+        Modo con el que se registra la longitud de respuesta: las respuestas
+        JSON son mucho más cortas y se predicen por separado.
+        """
+        return f"{request['mode']}/json" if "facts" in request else request["mode"]
+    
+    def _compact_input(
+        self,
+        text: str,
+        compact: bool,
+        input_token_budget: Optional[int]
+    ) -> Tuple[str, Dict[str, int]]:
+        """
+        Etapa entre `normalize_text` y el prompt: agrupa la repetición de la
+        salida de Nmap y, con presupuesto, empaqueta por prioridad de línea.
+        
+        Returns:
+            Tupla (texto para el prompt, estadísticas de compactación)
+        """
+        original_chars = len(text)
+        if compact:
+            text = compact_scan_text(text)
+        dropped_lines = 0
+        if input_token_budget:
+            text, dropped_lines = pack_text(text, input_token_budget, get_token_counter(self.model))
+        return text, {
+            "original_chars": original_chars,
+            "compacted_chars": len(text),
+            "dropped_lines": dropped_lines
+        }
+    
+    def _preflight(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Cuenta los tokens de prompt de una petición y proyecta su coste
+        suponiendo que la respuesta agota `max_tokens` (cota superior).
+        """
+        model = request["model"]
+        if self._needs_map_reduce(request):
+            # Fase map por fragmento + fase reduce con los hallazgos de cada uno
+            chunks = chunk_text(request["input_text"], self.chunk_chars)
+            total = len(chunks)
+            prompt_tokens = sum(
+                count_message_tokens(self._chunk_messages(chunk, index, total, request["data_type"]), model)
+                for index, chunk in enumerate(chunks, 1)
+            )
+            map_output = total * self.chunk_max_tokens
+            prompt_tokens += count_message_tokens(self._build_messages({**request, "partials": []}), model) + map_output
+            completion_tokens = map_output + request["max_tokens"]
+        else:
+            prompt_tokens = count_message_tokens(self._build_messages(request), model)
+            completion_tokens = request["max_tokens"]
+        
+        return {
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "max_completion_tokens": completion_tokens,
+            "exact": has_exact_tokenizer(model),
+            "projected_cost": estimate_cost(prompt_tokens, completion_tokens, model)
+        }
+    
+    def preflight(
+        self,
+        input_text: Union[str, Iterable[NmapHost]],
+        data_type: str = "Mixto",
+        mode: str = "junior",
+        max_tokens: Optional[int] = 2500,
+        type_scores: Optional[Dict[str, float]] = None,
+        compact: bool = True,
+        input_token_budget: Optional[int] = None,
+        structured: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Estima tokens de prompt y coste máximo de un análisis sin llamar a la API.
+        
+        Args:
+            input_text: Texto o hosts de Nmap, como en `analyze`
+            data_type: Tipo de datos
+            mode: Modo de análisis
+            max_tokens: Máximo de tokens en la respuesta (None para predecirlo)
+            type_scores: Confianza por tipo del clasificador (opcional)
+            compact: Aplicar la compactación de escaneos, como en `analyze`
+            input_token_budget: Presupuesto de tokens de la entrada, como en `analyze`
+            structured: Salida estructurada, como en `analyze`
+        
+        Returns:
+            Diccionario con `prompt_tokens`, `max_completion_tokens`, `exact`
+            (tokenizador exacto o heurístico), `projected_cost` y `within_budget`
+        """
+        hosts = None
+        if not isinstance(input_text, str):
+            hosts = list(input_text)
+            input_text = format_nmap_hosts(hosts)
+            if data_type == "Mixto":
+                data_type = "Nmap"
+        
+        normalized_text = normalize_text(input_text)
+        input_text, _ = self._compact_input(normalized_text, compact, input_token_budget)
+        request = {
+            "input_text": input_text,
+            "data_type": data_type,
+            "mode": mode,
+            "max_tokens": max_tokens,
+            "type_scores": type_scores,
+            "model": self.model
+        }
+        if structured:
+            request["facts"] = extract_facts(normalized_text, hosts)
+        self._route(request)
+        result = self._preflight(request)
+        if "routing" in request:
+            result["routing"] = request["routing"]
+        result["within_budget"] = self.budget is None or result["projected_cost"]["total_cost"] <= self.budget
+        return result
+    
+    def _needs_map_reduce(self, request: Dict[str, Any]) -> bool:
+        """
+        Indica si la entrada es demasiado grande para una sola llamada.
+        """
+        return "partials" not in request and len(request["input_text"]) > self.map_reduce_threshold
+    
+    def _chunk_messages(self, chunk: str, index: int, total: int, data_type: str) -> List[Dict[str, str]]:
+        """
+        Mensajes de la fase map para un fragmento.
+        """
+        return [
+            {"role": "system", "content": CHUNK_SYSTEM_ROLE},
+            {"role": "user", "content": get_chunk_prompt(chunk, index, total, data_type)}
+        ]
+    
+    def _run_map(self, request: Dict[str, Any]) -> None:
+        """
+        Fase map: analiza en paralelo cada fragmento semántico de la entrada
+        con un prompt compacto y guarda los hallazgos en la petición.
+        
+        Raises:
+            RuntimeError: Si no se pudo analizar ningún fragmento
+        """
+        chunks = chunk_text(request["input_text"], self.chunk_chars)
+        total = len(chunks)
+        
+        def analyze_chunk(item: Tuple[int, str]) -> Tuple[Optional[str], Any, Optional[str]]:
+            index, chunk = item
+            try:
+                messages = self._chunk_messages(chunk, index, total, request["data_type"])
+                response, _ = self.caller.call(
+                    lambda model, timeout: self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=0.2,
+                        max_tokens=self.chunk_max_tokens,
+                        timeout=timeout
+                    ),
+                    request["model"],
+                    max_tokens=self.chunk_max_tokens
+                )
+                return response.choices[0].message.content, response.usage, None
+            except Exception as e:
+                return None, None, str(e)
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(self.map_concurrency, total))) as pool:
+            outcomes = list(pool.map(analyze_chunk, enumerate(chunks, 1)))
+        self._collect_map(request, outcomes)
+    
+    def _collect_map(
+        self,
+        request: Dict[str, Any],
+        outcomes: List[Tuple[Optional[str], Any, Optional[str]]]
+    ) -> None:
+        """
+        Guarda en la petición los hallazgos y el consumo de la fase map.
+        
+        Raises:
+            RuntimeError: Si no se pudo analizar ningún fragmento
+        """
+        total = len(outcomes)
+        partials = []
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cached_tokens": 0}
+        errors = []
+        for content, chunk_usage, error in outcomes:
+            if error is not None:
+                errors.append(error)
+                partials.append("(fragmento no analizado)")
+                continue
+            partials.append(content or "")
+            for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+                usage[key] += getattr(chunk_usage, key, 0) or 0
+            usage["cached_tokens"] += cached_prompt_tokens(chunk_usage)
+        
+        if len(errors) == total:
+            raise RuntimeError(errors[0])
+        
+        request["partials"] = partials
+        request["map_usage"] = usage
+        request["map_reduce"] = {"chunks": total, "failed": len(errors)}
+    
+    async def _run_map_async(
+        self,
+        request: Dict[str, Any],
+        limiter: Optional[RateLimiter],
+        slots: Optional[asyncio.Semaphore]
+    ) -> None:
+        """
+        Fase map con el cliente asíncrono: cada fragmento (y cada reintento)
+        ocupa un hueco de `slots` y consume del limitador de RPM/TPM.
+        
+        Raises:
+            RuntimeError: Si no se pudo analizar ningún fragmento
+        """
+        def plan() -> List[Tuple[List[Dict[str, str]], int]]:
+            chunks = chunk_text(request["input_text"], self.chunk_chars)
+            planned = []
+            for index, chunk in enumerate(chunks, 1):
+                messages = self._chunk_messages(chunk, index, len(chunks), request["data_type"])
+                planned.append((messages, count_message_tokens(messages, request["model"]) + self.chunk_max_tokens))
+            return planned
+        
+        # Troceado y conteo de tokens fuera del bucle de eventos
+        planned = await asyncio.to_thread(plan)
+        client = self._get_async_client()
+        fan_out = asyncio.Semaphore(max(1, self.map_concurrency))
+        
+        async def analyze_chunk(messages: List[Dict[str, str]], tokens: int) -> Tuple[Optional[str], Any, Optional[str]]:
+            try:
+                async with fan_out:
+                    response, _ = await self.caller.call_async(
+                        lambda model, timeout: client.chat.completions.create(
+                            model=model,
+                            messages=messages,
+                            temperature=0.2,
+                            max_tokens=self.chunk_max_tokens,
+                            timeout=timeout
+                        ),
+                        request["model"],
+                        guard=lambda model: _throttle(slots, limiter, tokens),
+                        max_tokens=self.chunk_max_tokens
+                    )
+                return response.choices[0].message.content, response.usage, None
+            except Exception as e:
+                return None, None, str(e)
+        
+        outcomes = await asyncio.gather(*(analyze_chunk(messages, tokens) for messages, tokens in planned))
+        self._collect_map(request, list(outcomes))
+    
+    def _build_messages(self, request: Dict[str, Any]) -> List[Dict[str, str]]:
+        """
+        Construye los mensajes de sistema y usuario de una petición (o de la
+        fase reduce si la entrada se analizó por fragmentos).
+        """
+        system_prompt = get_system_prompt(request["mode"])
+        facts = format_facts(request["facts"]) if "facts" in request else None
+        if "partials" in request:
+            user_prompt = get_reduce_prompt(
+                request["partials"], request["data_type"], request["mode"], request["type_scores"], facts
+            )
+        elif facts is not None:
+            user_prompt = get_structured_prompt(
+                request["input_text"], facts, request["data_type"], request["mode"], request["type_scores"]
+            )
+        else:
+            user_prompt = get_analysis_prompt(
+                request["input_text"], request["data_type"], request["mode"], request["type_scores"]
+            )
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def _completion_options(self, request: Dict[str, Any], model: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Argumentos adicionales de la llamada de chat (formato JSON en modo
+        estructurado, según lo que admita el modelo que atiende la llamada).
+        """
+        if "facts" not in request:
+            return {}
+        return {"response_format": response_format_for(model or request["model"])}
+    
+    def _apply_call_info(self, request: Dict[str, Any], call_info: Dict[str, Any]) -> None:
+        """
+        Registra intentos y modelo efectivo de la llamada. Las respuestas del
+        modelo de reserva no se cachean con la clave del modelo principal.
+        """
+        if call_info["model"] != request["model"]:
+            call_info = {**call_info, "fallback_from": request["model"]}
+            request["model"] = call_info["model"]
+            request["cache_key"] = None
+        request["resilience"] = call_info
+    
+    def _build_result(
+        self,
+        analysis_result: str,
+        usage: Any,
+        request: Dict[str, Any],
+        timing: Optional[Dict[str, float]] = None
+    ) -> Dict[str, Any]:
+        """
+        Construye el diccionario de resultado a partir del texto y el uso de
+        tokens devueltos por la API, y lo cachea.
+        """
+        # Metadatos de uso (cached_tokens: prefijo del prompt servido desde la caché del proveedor)
+        usage = {
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "total_tokens": usage.total_tokens,
+            "cached_tokens": cached_prompt_tokens(usage)
+        }
+        
+        # Historial para el router y la predicción de max_tokens
+        latency = timing["duration"] if timing else request.get("resilience", {}).get("latency")
+        HISTORY.record(
+            request["model"], request["data_type"], self._history_mode(request), usage["completion_tokens"], latency
+        )
+        
+        # Sumar el consumo de la fase map
+        if "map_usage" in request:
+            for key, value in request["map_usage"].items():
+                usage[key] += value
+        
+        # Modo estructurado: el informe en Markdown se genera a partir del JSON
+        structured = None
+        if "facts" in request:
+            report = parse_report(analysis_result)
+            if report is not None:
+                analysis_result = render_report(report, request["facts"], request["mode"])
+            structured = {"facts": request["facts"], "analysis": report}
+        
+        result = {
+            "success": True,
+            "error": None,
+            "result": analysis_result,
+            "metadata": {
+                "model": request["model"],
+                "mode": request["mode"],
+                "data_type": request["data_type"],
+                "usage": usage,
+                "preflight": request["preflight"]
+            }
+        }
+        
+        if structured is not None:
+            result["structured"] = structured
+        result["metadata"]["compaction"] = request["compaction"]
+        if "routing" in request:
+            result["metadata"]["routing"] = request["routing"]
+        if "map_reduce" in request:
+            result["metadata"]["map_reduce"] = request["map_reduce"]
+        if "diff" in request:
+            result["metadata"]["diff"] = request["diff"]
+        
+        # Solo se cachean los análisis correctos (sin tiempos ni reintentos, que son de esta llamada)
+        if request["cache_key"] is not None:
+            self.cache.put(request["cache_key"], result)
+            if "fingerprint" in request:
+                self.cache.add_fingerprint(request["cache_key"], *request["fingerprint"])
+            result["metadata"] = {**result["metadata"], "cache": {"hit": False, "tier": None}}
+        
+        if "resilience" in request:
+            result["metadata"]["resilience"] = request["resilience"]
+        if "batch" in request:
+            result["metadata"]["batch"] = request["batch"]
+        if timing is not None:
+            result["metadata"]["timing"] = timing
+        
+        return result
+    
     def analyze(
         self,
-        input_text: str,
+        input_text: Union[str, Iterable[NmapHost]],
         data_type: str = "Mixto",
         mode: str = "junior",
         temperature: float = 0.7,
-        max_tokens: int = 2500
-    ) -> Dict[str, Any]:
+        max_tokens: Optional[int] = 2500,
+        type_scores: Optional[Dict[str, float]] = None,
+        use_cache: bool = True,
+        stream: bool = False,
+        compact: bool = True,
+        input_token_budget: Optional[int] = None,
+        structured: bool = False
+    ) -> Union[Dict[str, Any], "AnalysisStream"]:
         """
         Analiza los datos de reconocimiento usando IA.
         
+        Las entradas de más de `map_reduce_threshold` caracteres se dividen en
+        fragmentos semánticos (host de Nmap, registro WHOIS, sección DNS) que se
+        analizan en paralelo; sus hallazgos se combinan después en el informe
+        habitual (`metadata["map_reduce"]` indica fragmentos y fallos).
+        
         Args:
-            input_text: Texto con resultados de reconocimiento
+            input_text: Texto con resultados de reconocimiento, o hosts ya
+                parseados de un XML de Nmap (ver `utils.nmap_xml`)
             data_type: Tipo de datos ("Mixto", "Nmap", "WHOIS/DNS")
             mode: Modo de análisis ("junior" o "expert")
             temperature: Temperatura del modelo (0.0-1.0)
-            max_tokens: Máximo de tokens en la respuesta
+            max_tokens: Máximo de tokens en la respuesta (None para predecirlo
+                a partir de respuestas anteriores del mismo tipo y modo)
+            type_scores: Confianza por tipo de `classify_data_type` (opcional)
+            use_cache: Reutilizar respuestas cacheadas si hay caché configurada
+            stream: Devolver un `AnalysisStream` que emite el texto según llega
+            compact: Compactar la salida de Nmap antes del prompt (ver `utils.compact`)
+            input_token_budget: Presupuesto de tokens de la entrada; si se supera,
+                se conservan primero hosts, puertos abiertos, versiones y anomalías
+            structured: Pasar los activos extraídos localmente como hechos y pedir
+                solo un JSON de hallazgos, riesgos y recomendaciones; el informe en
+                Markdown se genera localmente y `result["structured"]` contiene los
+                hechos y el JSON (ver `ai.structured`)
         
         Returns:
             Diccionario con el resultado del análisis y metadatos
+            (`metadata["cache"]` indica si vino de caché y de qué nivel),
+            o `AnalysisStream` si `stream=True`
         """
-        if not self.is_configured():
+        early, request = self._prepare_request(
+            input_text, data_type, mode, temperature, max_tokens, type_scores, use_cache,
+            compact, input_token_budget, structured
+        )
+        return self._run(request, early, stream)
+    
+    def _run(
+        self,
+        request: Dict[str, Any],
+        early: Optional[Dict[str, Any]],
+        stream: bool
+    ) -> Union[Dict[str, Any], "AnalysisStream"]:
+        """
+        Ejecuta una petición preparada (síncrona o en streaming).
+        """
+        if stream:
+            return AnalysisStream(self, request, early)
+        if early is not None:
+            return early
+        
+        try:
+            if self._needs_map_reduce(request):
+                self._run_map(request)
+            
+            # Llamar a la API (con reintentos, hedging y modelo de reserva)
+            messages = self._build_messages(request)
+            response, call_info = self.caller.call(
+                lambda model, timeout: self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=request["temperature"],
+                    max_tokens=request["max_tokens"],
+                    timeout=timeout,
+                    **self._completion_options(request, model)
+                ),
+                request["model"],
+                max_tokens=request["max_tokens"]
+            )
+            self._apply_call_info(request, call_info)
+            return self._build_result(response.choices[0].message.content, response.usage, request)
+        
+        except Exception as e:
             return {
                 "success": False,
-                "error": "API key de OpenAI no configurada",
+                "error": f"Error al analizar: {str(e)}",
                 "result": None
             }
+    
+    def _get_async_client(self) -> AsyncOpenAI:
+        """
+        Devuelve el cliente asíncrono compartido del bucle de eventos actual.
+        """
+        return get_async_client(self.api_key, self.base_url)
+    
+    async def analyze_async(
+        self,
+        input_text: Union[str, Iterable[NmapHost]],
+        data_type: str = "Mixto",
+        mode: str = "junior",
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = 2500,
+        type_scores: Optional[Dict[str, float]] = None,
+        use_cache: bool = True,
+        limiter: Optional[RateLimiter] = None,
+        compact: bool = True,
+        input_token_budget: Optional[int] = None,
+        structured: bool = False,
+        slots: Optional[asyncio.Semaphore] = None
+    ) -> Dict[str, Any]:
+        """
+        Versión asíncrona de `analyze` (mismos argumentos y mismo resultado).
         
-        if not input_text or not input_text.strip():
+        La preparación (normalización, compactación, conteo de tokens y
+        consulta de la caché) se ejecuta en un hilo para no bloquear el bucle
+        de eventos. Cada petición a la API, incluidas las de la fase map y los
+        reintentos, pasa por `slots` y por el limitador.
+        
+        Args:
+            limiter: Limitador de RPM/TPM compartido entre llamadas (opcional)
+            slots: Semáforo de peticiones simultáneas compartido (opcional)
+        
+        Returns:
+            Diccionario con el resultado del análisis y metadatos
+        """
+        early, request = await asyncio.to_thread(
+            self._prepare_request,
+            input_text, data_type, mode, temperature, max_tokens, type_scores, use_cache,
+            compact, input_token_budget, structured
+        )
+        if early is not None:
+            return early
+        
+        try:
+            if self._needs_map_reduce(request):
+                await self._run_map_async(request, limiter, slots)
+            
+            def plan() -> Tuple[List[Dict[str, str]], int]:
+                messages = self._build_messages(request)
+                # OpenAI descuenta max_tokens del límite TPM al recibir la petición
+                return messages, count_message_tokens(messages, request["model"]) + request["max_tokens"]
+            
+            messages, tokens = await asyncio.to_thread(plan)
+            response, call_info = await self.caller.call_async(
+                lambda model, timeout: self._get_async_client().chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=request["max_tokens"],
+                    timeout=timeout,
+                    **self._completion_options(request, model)
+                ),
+                request["model"],
+                guard=lambda model: _throttle(slots, limiter, tokens),
+                max_tokens=request["max_tokens"]
+            )
+            self._apply_call_info(request, call_info)
+            # Guardar en la caché (SQLite) también fuera del bucle
+            return await asyncio.to_thread(
+                self._build_result, response.choices[0].message.content, response.usage, request
+            )
+        
+        except Exception as e:
             return {
                 "success": False,
-                "error": "No se proporcionó texto para analizar",
+                "error": f"Error al analizar: {str(e)}",
                 "result": None
             }
+    
+    async def analyze_many(
+        self,
+        inputs: Iterable[Union[str, Iterable[NmapHost]]],
+        concurrency: int = 5,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Analiza varias entradas en paralelo y devuelve cada resultado al terminar.
+        
+        Args:
+            inputs: Entradas a analizar (texto o hosts de Nmap)
+            concurrency: Máximo de peticiones simultáneas (contando las de la
+                fase map de las entradas grandes) y de entradas en curso
+            rpm: Límite de peticiones por minuto (opcional)
+            tpm: Límite de tokens por minuto (opcional)
+            **kwargs: Argumentos de `analyze` (data_type, mode, temperature...)
+        
+        Yields:
+            Tuplas (índice de la entrada, resultado con la forma de `analyze`)
+        """
+        # Entradas en preparación o en curso, y peticiones simultáneas a la API
+        admission = asyncio.Semaphore(concurrency)
+        slots = asyncio.Semaphore(concurrency)
+        limiter = RateLimiter(rpm, tpm) if rpm or tpm else None
+        
+        async def run(index: int, item: Union[str, Iterable[NmapHost]]) -> Tuple[int, Dict[str, Any]]:
+            async with admission:
+                return index, await self.analyze_async(item, limiter=limiter, slots=slots, **kwargs)
         
+        tasks = [asyncio.ensure_future(run(index, item)) for index, item in enumerate(inputs)]
         try:
-            # Construir prompts
-            system_prompt = get_system_prompt(mode)
-            user_prompt = get_analysis_prompt(input_text, data_type, mode)
-            
-            # Llamar a la API
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=temperature,
-                max_tokens=max_tokens
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    def _batch_body(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Cuerpo de la petición de chat de una entrada para la Batch API.
+        """
+        return {
+            "model": request["model"],
+            "messages": self._build_messages(request),
+            "temperature": request["temperature"],
+            "max_tokens": request["max_tokens"],
+            **self._completion_options(request)
+        }
+    
+    def analyze_batch(
+        self,
+        inputs: Iterable[Union[str, os.PathLike, Iterable[NmapHost]]],
+        data_type: str = "Mixto",
+        mode: str = "junior",
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = 2500,
+        type_scores: Optional[Dict[str, float]] = None,
+        use_cache: bool = True,
+        compact: bool = True,
+        input_token_budget: Optional[int] = None,
+        structured: bool = False,
+        poll_interval: float = 30.0,
+        timeout: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Analiza muchas entradas con la Batch API de OpenAI (mitad de precio,
+        resultados en un plazo de hasta 24 horas).
+        
+        Las entradas pasan por la misma preparación que `analyze` (compactación,
+        router, presupuesto y caché); las que no están en caché se envían en
+        lotes JSONL por modelo. Las entradas grandes se analizan en dos lotes:
+        uno con los fragmentos de todas ellas y otro con la fase reduce.
+        Para probarlo sin la API oficial basta con un servidor compatible en
+        `base_url` (u `OPENAI_BASE_URL`).
+        
+        Args:
+            inputs: Textos, rutas de ficheros de escaneo (`Path` u otro `os.PathLike`;
+                un `str` siempre se trata como texto) o hosts de Nmap
+            data_type, mode, temperature, max_tokens, type_scores, use_cache,
+            compact, input_token_budget, structured: Como en `analyze`, para todas las entradas
+            poll_interval: Segundos entre consultas del estado de los lotes
+            timeout: Segundos máximos de espera (None para esperar al plazo del lote)
+        
+        Returns:
+            Lista con un resultado por entrada, en el mismo orden y con la forma
+            de `analyze` (`metadata["batch"]` indica el lote de cada resultado)
+        """
+        results: List[Optional[Dict[str, Any]]] = []
+        pending: Dict[int, Dict[str, Any]] = {}
+        
+        for index, item in enumerate(inputs):
+            if isinstance(item, os.PathLike):
+                try:
+                    item = Path(item).read_text(encoding="utf-8", errors="replace")
+                except OSError as e:
+                    results.append({
+                        "success": False,
+                        "error": f"Error al leer el fichero: {str(e)}",
+                        "result": None
+                    })
+                    continue
+            early, request = self._prepare_request(
+                item, data_type, mode, temperature, max_tokens, type_scores, use_cache,
+                compact, input_token_budget, structured
             )
+            results.append(early)
+            if early is None:
+                pending[index] = request
+        
+        runner = BatchRunner(self.client, poll_interval, timeout=timeout)
+        chunked: Dict[int, int] = {}
+        try:
+            # Primer lote: peticiones directas y fragmentos de las entradas grandes
+            lines = []
+            for index, request in pending.items():
+                if self._needs_map_reduce(request):
+                    chunks = chunk_text(request["input_text"], self.chunk_chars)
+                    chunked[index] = len(chunks)
+                    lines.extend(
+                        (f"{index}-{number}", {
+                            "model": request["model"],
+                            "messages": self._chunk_messages(chunk, number, len(chunks), request["data_type"]),
+                            "temperature": 0.2,
+                            "max_tokens": self.chunk_max_tokens
+                        })
+                        for number, chunk in enumerate(chunks, 1)
+                    )
+                else:
+                    lines.append((str(index), self._batch_body(request)))
+            outcomes, _ = runner.run(lines, {"source": "ai-recon-mapper", "phase": "analysis"})
             
-            # Extraer resultado
-            analysis_result = response.choices[0].message.content
-            
-            # Metadatos de uso
-            usage = {
-                "prompt_tokens": response.usage.prompt_tokens,
-                "completion_tokens": response.usage.completion_tokens,
-                "total_tokens": response.usage.total_tokens
-            }
-            
+            # Segundo lote: fase reduce de las entradas grandes
+            reduce_lines = []
+            for index, total in chunked.items():
+                request = pending[index]
+                partials = []
+                usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cached_tokens": 0}
+                failed = 0
+                for number in range(1, total + 1):
+                    outcome = outcomes.get(f"{index}-{number}")
+                    if outcome is None or "error" in outcome:
+                        failed += 1
+                        partials.append("(fragmento no analizado)")
+                        continue
+                    partials.append(outcome["body"]["choices"][0]["message"]["content"] or "")
+                    chunk_usage = outcome["body"].get("usage") or {}
+                    for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+                        usage[key] += chunk_usage.get(key, 0) or 0
+                    usage["cached_tokens"] += cached_prompt_tokens(chunk_usage)
+                if failed == total:
+                    results[index] = {
+                        "success": False,
+                        "error": "Error al analizar: no se pudo analizar ningún fragmento",
+                        "result": None
+                    }
+                    continue
+                request.update(partials=partials, map_usage=usage, map_reduce={"chunks": total, "failed": failed})
+                reduce_lines.append((str(index), self._batch_body(request)))
+            if reduce_lines:
+                reduce_outcomes, _ = runner.run(reduce_lines, {"source": "ai-recon-mapper", "phase": "reduce"})
+                outcomes.update(reduce_outcomes)
+        
+        except Exception as e:
+            for index in pending:
+                if results[index] is None:
+                    results[index] = {
+                        "success": False,
+                        "error": f"Error al analizar: {str(e)}",
+                        "result": None
+                    }
+            return results
+        
+        for index, request in pending.items():
+            if results[index] is not None:
+                continue
+            outcome = outcomes.get(str(index))
+            if outcome is None or "error" in outcome:
+                reason = outcome["error"] if outcome else "el lote terminó sin respuesta para esta entrada"
+                results[index] = {
+                    "success": False,
+                    "error": f"Error al analizar: {reason}",
+                    "result": None
+                }
+                continue
+            body = outcome["body"]
+            request["batch"] = {"batch_id": outcome["batch_id"], "discount": BATCH_DISCOUNT}
+            usage = body.get("usage") or {}
+            # Un resultado que no se puede procesar no descarta el resto del lote
+            try:
+                results[index] = self._build_result(
+                    body["choices"][0]["message"]["content"],
+                    SimpleNamespace(
+                        prompt_tokens=usage.get("prompt_tokens", 0),
+                        completion_tokens=usage.get("completion_tokens", 0),
+                        total_tokens=usage.get("total_tokens", 0),
+                        prompt_tokens_details=usage.get("prompt_tokens_details")
+                    ),
+                    request
+                )
+            except Exception as e:
+                results[index] = {
+                    "success": False,
+                    "error": f"Error al analizar: {str(e)}",
+                    "result": None
+                }
+        
+        return results
+    
+    def analyze_diff(
+        self,
+        baseline: Union[str, Iterable[NmapHost]],
+        current: Union[str, Iterable[NmapHost]],
+        mode: str = "junior",
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = 2500,
+        use_cache: bool = True,
+        stream: bool = False
+    ) -> Union[Dict[str, Any], "AnalysisStream"]:
+        """
+        Analiza los cambios entre dos escaneos del mismo objetivo.
+        
+        Ambos escaneos se reducen localmente a sus hosts y puertos abiertos
+        (ver `utils.diff`) y al modelo solo se envían los hosts y puertos
+        nuevos, desaparecidos o con otro servicio o versión, junto con un
+        resumen de una línea de cada escaneo. Si no hay cambios no se llama
+        a la API.
+        
+        Args:
+            baseline: Escaneo de referencia (texto o hosts ya parseados)
+            current: Escaneo más reciente (texto o hosts ya parseados)
+            mode: Modo de análisis ("junior" o "expert")
+            temperature: Temperatura del modelo (0.0-1.0)
+            max_tokens: Máximo de tokens en la respuesta (None para predecirlo)
+            use_cache: Reutilizar respuestas cacheadas si hay caché configurada
+            stream: Devolver un `AnalysisStream` que emite el texto según llega
+        
+        Returns:
+            Diccionario con el resultado del análisis y metadatos
+            (`metadata["diff"]` cuenta los cambios de cada tipo),
+            o `AnalysisStream` si `stream=True`
+        """
+        snapshots = []
+        for scan in (baseline, current):
+            try:
+                snapshots.append(
+                    snapshot_text(normalize_text(scan)) if isinstance(scan, str) else snapshot_hosts(scan)
+                )
+            except Exception as e:
+                return {
+                    "success": False,
+                    "error": f"Error al leer los escaneos: {str(e)}",
+                    "result": None
+                }
+        if not snapshots[0].services and not snapshots[1].services:
             return {
+                "success": False,
+                "error": "No se encontraron hosts en los escaneos (la comparación admite salidas de Nmap y masscan)",
+                "result": None
+            }
+        
+        diff = diff_scans(*snapshots)
+        if diff.is_empty():
+            # Mismos hosts y servicios: el resultado se genera localmente
+            early = {
                 "success": True,
                 "error": None,
-                "result": analysis_result,
+                "result": "## 📋 Resumen de Cambios\n\nNo hay cambios en hosts, puertos abiertos ni "
+                          f"versiones respecto al escaneo base ({summarize_snapshot(diff.baseline)}).",
                 "metadata": {
                     "model": self.model,
                     "mode": mode,
-                    "data_type": data_type,
-                    "usage": usage
+                    "data_type": DIFF_DATA_TYPE,
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cached_tokens": 0},
+                    "diff": diff.counts()
                 }
             }
+            return self._run({}, early, stream)
         
-        except Exception as e:
-            return {
-                "success": False,
-                "error": f"Error al analizar: {str(e)}",
-                "result": None
-            }
+        # La diferencia ya es compacta: no se aplica la compactación de Nmap
+        early, request = self._prepare_request(
+            format_diff(diff), DIFF_DATA_TYPE, mode, temperature, max_tokens, None, use_cache, compact=False
+        )
+        request["diff"] = diff.counts()
+        if early is not None and early["success"]:
+            # Acierto de caché (o de un escaneo casi idéntico): recuentos de esta comparación
+            early["metadata"] = {**early["metadata"], "diff": request["diff"]}
+        return self._run(request, early, stream)
     
     def set_model(self, model: str):
         """
@@ -140,41 +1162,131 @@ class ReconAnalyzer:
             "gpt-3.5-turbo"
         ]
     
-    def estimate_cost(self, prompt_tokens: int, completion_tokens: int) -> Dict[str, float]:
+    def estimate_cost(
+        self,
+        prompt_tokens: int,
+        completion_tokens: int,
+        model: Optional[str] = None,
+        batch: bool = False,
+        cached_tokens: int = 0
+    ) -> Dict[str, float]:
         """
         Estima el coste aproximado de una llamada.
         
         Args:
             prompt_tokens: Tokens del prompt
             completion_tokens: Tokens de la respuesta
+            model: Modelo a tarificar (por defecto, el del analizador)
+            batch: Aplicar el descuento de la Batch API
+            cached_tokens: Tokens del prompt servidos desde la caché de prefijos
         
         Returns:
             Diccionario con estimación de coste
         """
-        # Precios aproximados (actualizar según pricing de OpenAI)
-        pricing = {
-            "gpt-4o-mini": {
-                "input": 0.150 / 1_000_000,  # $0.150 por 1M tokens
-                "output": 0.600 / 1_000_000   # $0.600 por 1M tokens
-            },
-            "gpt-4o": {
-                "input": 2.50 / 1_000_000,
-                "output": 10.00 / 1_000_000
-            }
-        }
+        return estimate_cost(prompt_tokens, completion_tokens, model or self.model, batch, cached_tokens)
+
+
+class AnalysisStream:
+    """
+    Análisis en streaming: se itera para obtener los fragmentos de texto
+    según los genera el modelo y, al terminar, `result` contiene el mismo
+    diccionario que devuelve `analyze()`, con `metadata["timing"]`:
+    
+    - `ttft`: segundos hasta el primer token
+    - `duration`: segundos totales de la llamada
+    - `tokens_per_second`: tokens de respuesta por segundo tras el primero
+    """
+    
+    def __init__(
+        self,
+        analyzer: ReconAnalyzer,
+        request: Dict[str, Any],
+        early: Optional[Dict[str, Any]] = None
+    ):
+        self.analyzer = analyzer
+        self.request = request
+        self.result: Optional[Dict[str, Any]] = early
+        self._early = early
+    
+    def __iter__(self) -> Iterator[str]:
+        # Error de validación o acierto de caché: se emite el texto completo de una vez
+        if self._early is not None:
+            if self._early["success"]:
+                yield self._early["result"]
+            return
         
-        model_pricing = pricing.get(self.model, pricing["gpt-4o-mini"])
+        request = self.request
+        parts: List[str] = []
+        usage = None
+        ttft = None
+        start = time.perf_counter()
         
-        input_cost = prompt_tokens * model_pricing["input"]
-        output_cost = completion_tokens * model_pricing["output"]
-        total_cost = input_cost + output_cost
+        try:
+            # En entradas grandes, la fase map se completa antes de emitir el informe
+            if self.analyzer._needs_map_reduce(request):
+                self.analyzer._run_map(request)
+            
+            # Los reintentos cubren la apertura del stream (sin hedging: ya es incremental)
+            messages = self.analyzer._build_messages(request)
+            response, call_info = self.analyzer.caller.call(
+                lambda model, timeout: self.analyzer.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=request["temperature"],
+                    max_tokens=request["max_tokens"],
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    timeout=timeout,
+                    **self.analyzer._completion_options(request, model)
+                ),
+                request["model"],
+                stream=True
+            )
+            self.analyzer._apply_call_info(request, call_info)
+            for chunk in response:
+                # El último fragmento trae el uso de tokens y ninguna opción
+                if getattr(chunk, "usage", None) is not None:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                    parts.append(delta)
+                    # En modo estructurado llega JSON: se emite el informe ya generado al final
+                    if "facts" not in request:
+                        yield delta
         
-        return {
-            "input_cost": round(input_cost, 6),
-            "output_cost": round(output_cost, 6),
-            "total_cost": round(total_cost, 6),
-            "currency": "USD"
+        except Exception as e:
+            self.result = {
+                "success": False,
+                "error": f"Error al analizar: {str(e)}",
+                "result": None
+            }
+            return
+        
+        duration = time.perf_counter() - start
+        if usage is None:
+            # Servidores compatibles que no envían uso: un token por fragmento
+            usage = SimpleNamespace(prompt_tokens=0, completion_tokens=len(parts), total_tokens=len(parts))
+        generation = duration - (ttft or 0.0)
+        timing = {
+            "ttft": round(ttft or duration, 3),
+            "duration": round(duration, 3),
+            "tokens_per_second": round(usage.completion_tokens / generation, 1) if generation > 0 else 0.0
         }
+        try:
+            self.result = self.analyzer._build_result("".join(parts), usage, request, timing)
+        except Exception as e:
+            self.result = {
+                "success": False,
+                "error": f"Error al analizar: {str(e)}",
+                "result": None
+            }
+            return
+        if "facts" in request:
+            yield self.result["result"]
 
 
 # Función de conveniencia para uso rápido
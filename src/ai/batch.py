@@ -0,0 +1,202 @@
+"""
+Envío de análisis a la Batch API de OpenAI.
+Construye los ficheros JSONL de peticiones, los sube, espera a que terminen
+los lotes y devuelve la respuesta de cada petición por su `custom_id`. La
+Batch API cuesta la mitad y tiene límites propios, a cambio de un plazo de
+hasta 24 horas: pensada para reanalizar archivos de escaneos sin prisa.
+"""
+
+import json
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Límites de la Batch API por fichero de entrada
+BATCH_MAX_REQUESTS = 50_000
+BATCH_MAX_BYTES = 190 * 1024 * 1024
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+# Estados finales de un lote
+FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def build_batch_line(custom_id: str, body: Dict[str, Any]) -> bytes:
+    """
+    Serializa una petición de chat como línea JSONL de la Batch API.
+
+    Args:
+        custom_id: Identificador para emparejar la respuesta
+        body: Cuerpo de la petición (model, messages, temperature, max_tokens...)
+
+    Returns:
+        Línea codificada en UTF-8 terminada en salto de línea
+    """
+    line = {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+    return (json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def split_batch_files(
+    lines: Iterable[Tuple[str, bytes]],
+    max_requests: int = BATCH_MAX_REQUESTS,
+    max_bytes: int = BATCH_MAX_BYTES
+) -> Iterator[List[bytes]]:
+    """
+    Reparte líneas JSONL de un mismo modelo en ficheros dentro de los límites.
+
+    Args:
+        lines: Tuplas (custom_id, línea JSONL)
+        max_requests: Peticiones máximas por fichero
+        max_bytes: Tamaño máximo de cada fichero
+
+    Yields:
+        Listas de líneas que forman cada fichero
+    """
+    current: List[bytes] = []
+    size = 0
+    for _, line in lines:
+        if current and (len(current) >= max_requests or size + len(line) > max_bytes):
+            yield current
+            current, size = [], 0
+        current.append(line)
+        size += len(line)
+    if current:
+        yield current
+
+
+def _file_text(content: Any) -> str:
+    # `files.content` devuelve un objeto con `.text` (o bytes en servidores mínimos)
+    text = getattr(content, "text", content)
+    if callable(text):
+        text = text()
+    if isinstance(text, bytes):
+        text = text.decode("utf-8")
+    return text
+
+
+class BatchRunner:
+    """
+    Sube peticiones a la Batch API, espera a que terminen y recoge las respuestas.
+
+    Funciona con cualquier servidor compatible (`base_url` del cliente), lo
+    que permite probarlo contra un servidor local.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        poll_interval: float = 30.0,
+        completion_window: str = "24h",
+        timeout: Optional[float] = None
+    ):
+        """
+        Args:
+            client: Cliente síncrono de OpenAI
+            poll_interval: Segundos entre consultas del estado de los lotes
+            completion_window: Plazo de los lotes (la API solo admite "24h")
+            timeout: Segundos máximos de espera (None para esperar al plazo)
+        """
+        self.client = client
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+        self.timeout = timeout
+
+    def submit(self, requests: List[Tuple[str, Dict[str, Any]]], metadata: Optional[Dict[str, str]] = None) -> List[str]:
+        """
+        Sube las peticiones y crea los lotes (uno o varios por modelo).
+
+        Args:
+            requests: Tuplas (custom_id, cuerpo de la petición)
+            metadata: Metadatos a adjuntar a cada lote
+
+        Returns:
+            Identificadores de los lotes creados
+        """
+        by_model: Dict[str, List[Tuple[str, bytes]]] = {}
+        for custom_id, body in requests:
+            by_model.setdefault(body["model"], []).append((custom_id, build_batch_line(custom_id, body)))
+
+        batch_ids = []
+        for model, lines in by_model.items():
+            for number, file_lines in enumerate(split_batch_files(lines), 1):
+                uploaded = self.client.files.create(
+                    file=(f"recon-{model}-{number}.jsonl", b"".join(file_lines)),
+                    purpose="batch"
+                )
+                batch = self.client.batches.create(
+                    input_file_id=uploaded.id,
+                    endpoint=BATCH_ENDPOINT,
+                    completion_window=self.completion_window,
+                    metadata=metadata
+                )
+                batch_ids.append(batch.id)
+        return batch_ids
+
+    def wait(self, batch_ids: List[str]) -> List[Any]:
+        """
+        Espera a que todos los lotes lleguen a un estado final.
+
+        Returns:
+            Objetos de lote finales
+
+        Raises:
+            TimeoutError: Si se supera `timeout`
+        """
+        deadline = time.monotonic() + self.timeout if self.timeout is not None else None
+        pending = list(batch_ids)
+        finished: Dict[str, Any] = {}
+        while pending:
+            for batch_id in list(pending):
+                batch = self.client.batches.retrieve(batch_id)
+                if batch.status in FINAL_STATUSES:
+                    finished[batch_id] = batch
+                    pending.remove(batch_id)
+            if not pending:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"Lotes sin terminar tras {self.timeout:.0f} s: {', '.join(pending)}")
+            time.sleep(self.poll_interval)
+        return [finished[batch_id] for batch_id in batch_ids]
+
+    def collect(self, batches: List[Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Descarga las respuestas y errores de los lotes terminados.
+
+        Los lotes caducados o cancelados pueden traer respuestas parciales;
+        las peticiones sin respuesta no aparecen en el resultado.
+
+        Returns:
+            Diccionario custom_id -> {"body": respuesta, "batch_id": lote} o
+            {"error": mensaje, "batch_id": lote}
+        """
+        outcomes: Dict[str, Dict[str, Any]] = {}
+        for batch in batches:
+            for file_id in (getattr(batch, "output_file_id", None), getattr(batch, "error_file_id", None)):
+                if not file_id:
+                    continue
+                for line in _file_text(self.client.files.content(file_id)).splitlines():
+                    if not line.strip():
+                        continue
+                    row = json.loads(line)
+                    response = row.get("response") or {}
+                    if row.get("error") or response.get("status_code", 200) != 200:
+                        error = row.get("error") or (response.get("body") or {}).get("error") or {}
+                        message = error.get("message") if isinstance(error, dict) else str(error)
+                        outcomes[row["custom_id"]] = {
+                            "error": message or f"HTTP {response.get('status_code')}",
+                            "batch_id": batch.id
+                        }
+                    else:
+                        outcomes[row["custom_id"]] = {"body": response["body"], "batch_id": batch.id}
+        return outcomes
+
+    def run(self, requests: List[Tuple[str, Dict[str, Any]]], metadata: Optional[Dict[str, str]] = None) -> Tuple[Dict[str, Dict[str, Any]], List[Any]]:
+        """
+        Sube, espera y recoge un conjunto de peticiones.
+
+        Returns:
+            Tupla (respuestas por custom_id, lotes finales)
+        """
+        if not requests:
+            return {}, []
+        batches = self.wait(self.submit(requests, metadata))
+        return self.collect(batches), batches
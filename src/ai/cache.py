@@ -0,0 +1,292 @@
+"""
+Caché persistente de respuestas del analizador, direccionada por contenido.
+Combina un nivel LRU en memoria con un nivel SQLite en disco con TTL y
+expulsión por tamaño, para que repetir un análisis idéntico no llame a la API.
+Guarda además la firma MinHash de cada entrada para encontrar escaneos casi
+idénticos (ver `utils.similarity`).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from utils.cache import LRUCache
+from utils.similarity import MinHasher, SimilarityIndex, scan_features
+
+# Ruta por defecto del nivel en disco (sobrescribible con RECON_CACHE_PATH)
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "ai-recon-mapper" / "responses.sqlite3"
+
+# Firmas de escaneo: deben ser estables entre procesos porque se persisten
+_HASHER = MinHasher(num_perm=64)
+
+
+def scan_fingerprint(normalized_input: str) -> array:
+    """
+    Firma MinHash de una entrada normalizada, sin campos volátiles.
+
+    Args:
+        normalized_input: Texto de entrada ya normalizado
+
+    Returns:
+        Firma para `ResponseCache.find_similar`
+    """
+    return _HASHER.signature(scan_features(normalized_input))
+
+
+def response_cache_key(
+    model: str,
+    mode: str,
+    data_type: str,
+    temperature: float,
+    max_tokens: Optional[int],
+    template_version: str,
+    normalized_input: str,
+    extra: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Calcula la clave de caché de una petición de análisis.
+
+    Args:
+        model: Modelo de OpenAI (o política del router si se elige automáticamente)
+        mode: Modo de análisis
+        data_type: Tipo de datos
+        temperature: Temperatura
+        max_tokens: Máximo de tokens de salida (None si se predice del historial)
+        template_version: Versión de las plantillas de prompts
+        normalized_input: Texto de entrada ya normalizado
+        extra: Otros parámetros que alteran el prompt (opcional)
+
+    Returns:
+        Hash SHA-256 hexadecimal
+    """
+    header = json.dumps(
+        [model, mode.lower(), data_type, round(float(temperature), 3),
+         None if max_tokens is None else int(max_tokens),
+         template_version, extra or {}],
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    digest = hashlib.sha256(header.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalized_input.encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    Caché de dos niveles: LRU en memoria y SQLite en disco.
+
+    Las entradas caducan tras `ttl` segundos y, si el fichero supera
+    `max_bytes`, se eliminan las menos usadas recientemente.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: float = 7 * 24 * 3600,
+        max_bytes: int = 256 * 1024 * 1024,
+        memory_size: int = 256
+    ):
+        """
+        Inicializa la caché.
+
+        Args:
+            path: Ruta del fichero SQLite (None para la ruta por defecto, ":memory:" para no persistir)
+            ttl: Segundos de validez de cada entrada
+            max_bytes: Tamaño máximo acumulado de las respuestas en disco
+            memory_size: Entradas del nivel en memoria
+        """
+        self.path = str(path or os.getenv("RECON_CACHE_PATH") or DEFAULT_CACHE_PATH)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._memory = LRUCache(maxsize=memory_size)
+        self._lock = threading.Lock()
+        # Índices de similitud por umbral, construidos en la primera búsqueda
+        self._indexes: Dict[float, SimilarityIndex] = {}
+
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            " key TEXT PRIMARY KEY,"
+            " scope TEXT NOT NULL,"
+            " signature BLOB NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, key: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Busca una respuesta.
+
+        Args:
+            key: Clave de `response_cache_key`
+
+        Returns:
+            Tupla (valor o None, nivel donde se encontró: "memory", "disk" o None)
+        """
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            created, value = entry
+            if now - created <= self.ttl:
+                return value, "memory"
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None, None
+            if now - row[1] > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                return None, None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+
+        value = json.loads(row[0])
+        self._memory.put(key, (row[1], value))
+        return value, "disk"
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        """
+        Guarda una respuesta en ambos niveles.
+
+        Args:
+            key: Clave de `response_cache_key`
+            value: Resultado serializable en JSON
+        """
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False)
+        # Copia independiente: el llamador puede seguir modificando `value`
+        self._memory.put(key, (now, json.loads(payload)))
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now)
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def add_fingerprint(self, key: str, scope: str, signature: array) -> None:
+        """
+        Registra la firma de una entrada ya guardada con `put`.
+
+        Args:
+            key: Clave de la respuesta
+            scope: Parámetros de la petición sin la entrada (solo se comparan
+                escaneos analizados con los mismos parámetros)
+            signature: Firma de `scan_fingerprint`
+        """
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO fingerprints (key, scope, signature) VALUES (?, ?, ?)",
+                (key, scope, signature.tobytes())
+            )
+            self._db.commit()
+            for index in self._indexes.values():
+                index.add(key, signature, scope)
+
+    def _load_index(self, threshold: float) -> SimilarityIndex:
+        """
+        Construye el índice de similitud de un umbral con las firmas de las
+        respuestas vigentes, descartando las huérfanas. Se llama con el lock tomado.
+        """
+        self._db.execute("DELETE FROM fingerprints WHERE key NOT IN (SELECT key FROM responses)")
+        self._db.commit()
+        index = SimilarityIndex(threshold, _HASHER.num_perm)
+        for key, scope, blob in self._db.execute("SELECT key, scope, signature FROM fingerprints"):
+            signature = array("I")
+            signature.frombytes(blob)
+            index.add(key, signature, scope)
+        self._indexes[threshold] = index
+        return index
+
+    def find_similar(self, signature: array, scope: str, threshold: float) -> Optional[Tuple[str, float]]:
+        """
+        Busca la respuesta de un escaneo casi idéntico.
+
+        Args:
+            signature: Firma de `scan_fingerprint`
+            scope: Parámetros de la petición sin la entrada
+            threshold: Similitud de Jaccard mínima (0.0-1.0)
+
+        Returns:
+            Tupla (clave de la respuesta, similitud estimada) o None. La
+            respuesta puede haber caducado: comprobarla con `get`.
+        """
+        with self._lock:
+            index = self._indexes.get(threshold) or self._load_index(threshold)
+        return index.query(signature, scope)
+
+    def _evict(self, now: float) -> None:
+        """
+        Elimina entradas caducadas y, si hace falta, las menos usadas hasta
+        volver por debajo de `max_bytes`. Se llama con el lock tomado.
+        """
+        self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        excess = total - self.max_bytes
+        freed = 0
+        stale = []
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed ASC"):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._db.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    def clear(self) -> None:
+        """Vacía ambos niveles."""
+        self._memory.clear()
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.execute("DELETE FROM fingerprints")
+            self._db.commit()
+            self._indexes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Entradas y tamaño del nivel en disco, y uso del nivel en memoria."""
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"disk_entries": entries, "disk_bytes": size, "memory": self._memory.info()}
+
+
+_default_cache: Optional[ResponseCache] = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache() -> ResponseCache:
+    """
+    Devuelve la caché compartida del proceso (se crea en el primer uso).
+
+    Returns:
+        ResponseCache compartida
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+        return _default_cache
@@ -0,0 +1,129 @@
+"""
+Registro de clientes de OpenAI compartidos por todo el proceso.
+Todas las sesiones de Streamlit, hilos y analizadores con la misma API key y
+URL base reutilizan un único cliente y su pool de conexiones HTTP.
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Dict, Optional, Tuple
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+# Pool de conexiones: varias sesiones concurrentes y conexiones vivas entre análisis
+POOL_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=20,
+    keepalive_expiry=300.0
+)
+
+# Conexión rápida; lectura larga porque una respuesta completa puede tardar
+DEFAULT_TIMEOUT = httpx.Timeout(120.0, connect=10.0)
+
+ClientKey = Tuple[Optional[str], Optional[str]]
+
+_clients: Dict[ClientKey, OpenAI] = {}
+_warmed: Dict[ClientKey, bool] = {}
+# Los clientes asíncronos quedan ligados al bucle de eventos donde se usan
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[ClientKey, AsyncOpenAI]]" = (
+    weakref.WeakKeyDictionary()
+)
+_lock = threading.Lock()
+
+
+def get_client(api_key: Optional[str], base_url: Optional[str] = None) -> OpenAI:
+    """
+    Devuelve el cliente compartido para una API key y URL base.
+
+    Args:
+        api_key: API key de OpenAI
+        base_url: URL base de la API (None para la oficial)
+
+    Returns:
+        Cliente síncrono con pool de conexiones persistentes
+    """
+    key = (api_key, base_url)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                timeout=DEFAULT_TIMEOUT,
+                # Los reintentos los gestiona ai.resilience
+                max_retries=0,
+                http_client=httpx.Client(limits=POOL_LIMITS, timeout=DEFAULT_TIMEOUT)
+            )
+            _clients[key] = client
+        return client
+
+
+def get_async_client(api_key: Optional[str], base_url: Optional[str] = None) -> AsyncOpenAI:
+    """
+    Devuelve el cliente asíncrono compartido del bucle de eventos actual.
+
+    Debe llamarse desde una corrutina; cada bucle tiene su propio pool porque
+    las conexiones de httpx no pueden cambiar de bucle.
+
+    Args:
+        api_key: API key de OpenAI
+        base_url: URL base de la API (None para la oficial)
+
+    Returns:
+        Cliente asíncrono con pool de conexiones persistentes
+    """
+    loop = asyncio.get_running_loop()
+    key = (api_key, base_url)
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                timeout=DEFAULT_TIMEOUT,
+                max_retries=0,
+                http_client=httpx.AsyncClient(limits=POOL_LIMITS, timeout=DEFAULT_TIMEOUT)
+            )
+            clients[key] = client
+        return client
+
+
+def warm_up(api_key: Optional[str], base_url: Optional[str] = None, background: bool = True) -> None:
+    """
+    Abre la conexión (DNS, TCP y TLS) del cliente compartido con una petición
+    ligera, para que el primer análisis no pague ese coste. Solo se hace una
+    vez por cliente; los errores se ignoran.
+
+    Args:
+        api_key: API key de OpenAI
+        base_url: URL base de la API (None para la oficial)
+        background: Ejecutar en un hilo sin bloquear al llamador
+    """
+    key = (api_key, base_url)
+    with _lock:
+        if _warmed.get(key):
+            return
+        _warmed[key] = True
+
+    def run():
+        try:
+            get_client(api_key, base_url).with_options(timeout=10.0, max_retries=0).models.list()
+        except Exception:
+            pass
+
+    if background:
+        threading.Thread(target=run, name="openai-warm-up", daemon=True).start()
+    else:
+        run()
+
+
+def clear_clients() -> None:
+    """Cierra y olvida todos los clientes síncronos registrados."""
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+        _warmed.clear()
@@ -1,8 +1,18 @@
 """
 Módulo de prompts para el análisis de reconocimiento con IA.
 Contiene plantillas de prompts para diferentes modos y niveles de experiencia.
+
+Los prompts se montan con todo el contenido fijo (rol, modo, formato de
+salida y restricciones) al principio y los datos variables al final, para
+que la caché automática de prefijos del proveedor reutilice la parte fija:
+no se debe insertar nada variable antes de las instrucciones.
 """
 
+from typing import Dict, List, Optional
+
+# Versión de las plantillas: cambiarla invalida las respuestas cacheadas
+PROMPT_TEMPLATE_VERSION = "3"
+
 # Prompt del sistema base
 SYSTEM_ROLE = """Eres un experto en ciberseguridad y hacking ético con amplia experiencia en:
 - Análisis de reconocimiento (Nmap, WHOIS, DNS, Shodan, etc.)
@@ -39,16 +49,18 @@ Adapta tu respuesta para un profesional de ciberseguridad:
 - Sugiere herramientas avanzadas de análisis
 """
 
-# Plantilla de análisis estructurado
-ANALYSIS_TEMPLATE = """
-Analiza los siguientes datos de reconocimiento y proporciona un informe estructurado.
-
-DATOS A ANALIZAR:
-```
-{input_text}
-```
+# Restricciones comunes a todas las plantillas de análisis
+ANALYSIS_RESTRICTIONS = """RESTRICCIONES IMPORTANTES:
+- NO proporciones comandos de explotación
+- NO incluyas instrucciones para realizar ataques
+- Mantén un enfoque educativo y ético
+- Si detectas información sensible, recomienda protegerla
+- Enfócate en la comprensión, no en la explotación
+"""
 
-TIPO DE DATOS: {data_type}
+# Instrucciones fijas del análisis (prefijo estable del prompt)
+ANALYSIS_INSTRUCTIONS = """
+Analiza los datos de reconocimiento que aparecen al final y proporciona un informe estructurado.
 
 FORMATO DE SALIDA OBLIGATORIO (Markdown):
 
@@ -97,14 +109,48 @@ FORMATO DE SALIDA OBLIGATORIO (Markdown):
 
 ---
 
-RESTRICCIONES IMPORTANTES:
-- NO proporciones comandos de explotación
-- NO incluyas instrucciones para realizar ataques
-- Mantén un enfoque educativo y ético
-- Si detectas información sensible, recomienda protegerla
-- Enfócate en la comprensión, no en la explotación
+""" + ANALYSIS_RESTRICTIONS
+
+# Parte variable del análisis: siempre al final del prompt
+ANALYSIS_TEMPLATE = """
+TIPO DE DATOS: {data_type}
+{note}
+DATOS A ANALIZAR:
+```
+{input_text}
+```
 """
 
+# Instrucciones fijas de la comparación de dos escaneos: solo se envían las diferencias
+DIFF_ANALYSIS_INSTRUCTIONS = """
+Analiza las diferencias entre dos escaneos del mismo objetivo que aparecen al final.
+Solo se incluyen los cambios y un resumen del escaneo base: los hosts y puertos
+que no aparecen no han cambiado. Céntrate en qué ha cambiado y qué implica.
+
+FORMATO DE SALIDA OBLIGATORIO (Markdown):
+
+## 📋 Resumen de Cambios
+[Breve descripción de los cambios más importantes]
+
+## 🆕 Nueva Exposición
+[Hosts y puertos nuevos, con los servicios y versiones que exponen]
+
+## ✅ Exposición Eliminada
+[Hosts y puertos que ya no responden]
+
+## 🔄 Cambios de Servicio y Versión
+[Actualizaciones, regresiones o servicios sustituidos]
+
+## ⚠️ Impacto en el Riesgo (Educativo)
+[Si cada cambio aumenta o reduce la superficie expuesta y por qué]
+
+## 💡 Recomendaciones
+[Qué revisar a raíz de los cambios]
+
+---
+
+""" + ANALYSIS_RESTRICTIONS
+
 # Plantilla para análisis de Nmap específico
 NMAP_ANALYSIS_TEMPLATE = """
 Analiza este escaneo de Nmap con enfoque en:
@@ -134,6 +180,73 @@ Analiza estos datos de reconocimiento mixto identificando:
 - Hallazgos cruzados y patrones
 """
 
+# Plantilla para la comparación de escaneos
+DIFF_ANALYSIS_TEMPLATE = """
+Evalúa los cambios con enfoque en:
+- Servicios expuestos por primera vez y su versión
+- Versiones que retroceden o siguen sin actualizar
+- Servicios retirados (posible mejora o caída del servicio)
+- Patrones comunes a varios hosts
+"""
+
+# Tipo de datos de las comparaciones (ver `utils.diff`)
+DIFF_DATA_TYPE = "Comparación de escaneos"
+
+# Prompts del análisis por fragmentos (map-reduce) de entradas grandes
+CHUNK_SYSTEM_ROLE = """Eres un analista de ciberseguridad. Extraes hallazgos de datos de
+reconocimiento de forma compacta y literal, sin explicaciones."""
+
+CHUNK_ANALYSIS_TEMPLATE = """
+Extrae SOLO los hallazgos del fragmento de datos de reconocimiento que aparece al final,
+en viñetas breves y sin introducción:
+- Activos: IPs, dominios y hostnames
+- Puertos abiertos con servicio y versión
+- Tecnologías detectadas
+- Riesgos potenciales o configuraciones llamativas
+Omite las categorías vacías y no repitas los datos en bruto.
+
+Fragmento {index} de {total} ({data_type}):
+```
+{chunk}
+```
+"""
+
+REDUCE_ANALYSIS_NOTE = """Los datos son los hallazgos extraídos de {total} fragmentos de una
+entrada demasiado grande para analizarla de una vez. Combínalos, elimina duplicados
+y elabora un único informe sobre el conjunto."""
+
+# Instrucciones fijas del modo de salida estructurada (JSON): los activos ya están extraídos
+STRUCTURED_ANALYSIS_INSTRUCTIONS = """
+Analiza los datos de reconocimiento que aparecen al final. Los HECHOS CONOCIDOS
+se han extraído localmente: no los repitas, úsalos como referencia.
+
+FORMATO DE SALIDA OBLIGATORIO: un único objeto JSON con las claves
+- summary: resumen ejecutivo breve
+- exposure_level: "bajo", "medio", "alto" o "crítico"
+- technologies: tecnologías detectadas (servidores, frameworks, CMS...)
+- findings: hallazgos concretos (title, asset, severity, detail)
+- risks: riesgos potenciales con explicación educativa (title, severity, explanation)
+- recommendations: acciones sugeridas (action, priority: "alta", "media" o "baja")
+- next_steps: qué hacer con esta información
+- learning_resources: temas para estudiar (lista vacía en modo experto)
+Las severidades son "info", "baja", "media", "alta" o "crítica".
+No listes de nuevo IPs, dominios ni puertos salvo como `asset` de un hallazgo.
+
+""" + ANALYSIS_RESTRICTIONS
+
+# Parte variable del modo estructurado: siempre al final del prompt
+STRUCTURED_ANALYSIS_TEMPLATE = """
+TIPO DE DATOS: {data_type}
+{note}
+HECHOS CONOCIDOS:
+{facts}
+
+DATOS A ANALIZAR:
+```
+{input_text}
+```
+"""
+
 def get_system_prompt(mode: str = "junior") -> str:
     """
     Construye el prompt del sistema según el modo seleccionado.
@@ -151,34 +264,164 @@ def get_system_prompt(mode: str = "junior") -> str:
     else:
         return f"{base_prompt}\n\n{JUNIOR_MODE_INSTRUCTIONS}"
 
-def get_analysis_prompt(input_text: str, data_type: str = "Mixto", mode: str = "junior") -> str:
+def format_type_scores(type_scores: Dict[str, float]) -> str:
+    """
+    Formatea las puntuaciones del clasificador para incluirlas en el prompt.
+    
+    Args:
+        type_scores: Confianza por tipo de datos (0.0-1.0)
+    
+    Returns:
+        Línea con la composición estimada o cadena vacía si no hay señales
+    """
+    parts = [
+        f"{data_type} {score:.0%}"
+        for data_type, score in sorted(type_scores.items(), key=lambda item: -item[1])
+        if score > 0
+    ]
+    if not parts:
+        return ""
+    return f"COMPOSICIÓN ESTIMADA DE LOS DATOS: {', '.join(parts)}"
+
+def get_type_context(data_type: str) -> str:
+    """
+    Selecciona la plantilla adicional según el tipo de datos.
+    
+    Args:
+        data_type: Tipo de datos ("Mixto", "Nmap", "WHOIS/DNS" o `DIFF_DATA_TYPE`)
+    
+    Returns:
+        Instrucciones específicas del tipo de datos
+    """
+    if data_type == DIFF_DATA_TYPE:
+        return DIFF_ANALYSIS_TEMPLATE
+    if "nmap" in data_type.lower():
+        return NMAP_ANALYSIS_TEMPLATE
+    if "whois" in data_type.lower() or "dns" in data_type.lower():
+        return WHOIS_DNS_TEMPLATE
+    return MIXED_ANALYSIS_TEMPLATE
+
+def _data_note(data_type: str, type_scores: Optional[Dict[str, float]], note: str = "") -> str:
+    """
+    Notas variables que acompañan a los datos: la composición estimada en
+    datos mixtos y, en la fase reduce, la explicación de los fragmentos.
+    """
+    lines = []
+    if type_scores and get_type_context(data_type) is MIXED_ANALYSIS_TEMPLATE:
+        composition = format_type_scores(type_scores)
+        if composition:
+            lines.append(composition)
+    if note:
+        lines.append(note)
+    return "".join(f"{line}\n" for line in lines)
+
+def get_analysis_prompt(
+    input_text: str,
+    data_type: str = "Mixto",
+    mode: str = "junior",
+    type_scores: Optional[Dict[str, float]] = None,
+    note: str = ""
+) -> str:
     """
     Construye el prompt de análisis completo.
     
+    Las instrucciones y la plantilla del tipo de datos van primero y son
+    idénticas entre llamadas; los datos, la composición y la nota van al final.
+    Las comparaciones de escaneos (`DIFF_DATA_TYPE`) usan su propio formato
+    de salida centrado en los cambios.
+    
     Args:
         input_text: Texto a analizar
         data_type: Tipo de datos ("Mixto", "Nmap", "WHOIS/DNS")
         mode: Modo de análisis ("junior" o "expert")
+        type_scores: Confianza por tipo del clasificador (opcional)
+        note: Aclaración sobre los datos (p. ej. en la fase reduce)
     
     Returns:
         Prompt completo para el análisis
     """
-    # Seleccionar plantilla adicional según el tipo
-    additional_context = ""
-    if "nmap" in data_type.lower():
-        additional_context = NMAP_ANALYSIS_TEMPLATE
-    elif "whois" in data_type.lower() or "dns" in data_type.lower():
-        additional_context = WHOIS_DNS_TEMPLATE
-    else:
-        additional_context = MIXED_ANALYSIS_TEMPLATE
+    data = ANALYSIS_TEMPLATE.format(
+        data_type=data_type,
+        note=_data_note(data_type, type_scores, note),
+        input_text=input_text
+    )
+    instructions = DIFF_ANALYSIS_INSTRUCTIONS if data_type == DIFF_DATA_TYPE else ANALYSIS_INSTRUCTIONS
+    return f"{instructions}\n{get_type_context(data_type)}\n{data}"
+
+def get_structured_prompt(
+    input_text: str,
+    facts: str,
+    data_type: str = "Mixto",
+    mode: str = "junior",
+    type_scores: Optional[Dict[str, float]] = None,
+    note: str = ""
+) -> str:
+    """
+    Construye el prompt del modo de salida estructurada, con el mismo orden
+    que `get_analysis_prompt` (instrucciones fijas primero, datos al final).
     
-    # Construir prompt completo
-    base_analysis = ANALYSIS_TEMPLATE.format(
-        input_text=input_text,
-        data_type=data_type
+    Args:
+        input_text: Texto a analizar
+        facts: Activos extraídos localmente (ver `ai.structured.format_facts`)
+        data_type: Tipo de datos ("Mixto", "Nmap", "WHOIS/DNS")
+        mode: Modo de análisis ("junior" o "expert")
+        type_scores: Confianza por tipo del clasificador (opcional)
+        note: Aclaración sobre los datos (p. ej. en la fase reduce)
+    
+    Returns:
+        Prompt que pide el informe como JSON
+    """
+    data = STRUCTURED_ANALYSIS_TEMPLATE.format(
+        data_type=data_type,
+        note=_data_note(data_type, type_scores, note),
+        facts=facts,
+        input_text=input_text
     )
+    return f"{STRUCTURED_ANALYSIS_INSTRUCTIONS}\n{get_type_context(data_type)}\n{data}"
+
+def get_chunk_prompt(chunk: str, index: int, total: int, data_type: str = "Mixto") -> str:
+    """
+    Construye el prompt compacto de la fase map para un fragmento.
+    
+    Args:
+        chunk: Texto del fragmento
+        index: Posición del fragmento (desde 1)
+        total: Número total de fragmentos
+        data_type: Tipo de datos
     
-    return f"{additional_context}\n\n{base_analysis}"
+    Returns:
+        Prompt del fragmento
+    """
+    return CHUNK_ANALYSIS_TEMPLATE.format(index=index, total=total, data_type=data_type, chunk=chunk)
+
+def get_reduce_prompt(
+    partials: List[str],
+    data_type: str = "Mixto",
+    mode: str = "junior",
+    type_scores: Optional[Dict[str, float]] = None,
+    facts: Optional[str] = None
+) -> str:
+    """
+    Construye el prompt de la fase reduce: los hallazgos de cada fragmento
+    se analizan con la plantilla habitual para obtener el informe completo.
+    
+    Args:
+        partials: Hallazgos devueltos para cada fragmento
+        data_type: Tipo de datos
+        mode: Modo de análisis
+        type_scores: Confianza por tipo del clasificador (opcional)
+        facts: Hechos conocidos para pedir el informe como JSON (opcional)
+    
+    Returns:
+        Prompt de combinación
+    """
+    findings = "\n\n".join(
+        f"### Fragmento {index}\n{partial.strip()}" for index, partial in enumerate(partials, 1)
+    )
+    note = REDUCE_ANALYSIS_NOTE.format(total=len(partials))
+    if facts is not None:
+        return get_structured_prompt(findings, facts, data_type, mode, type_scores, note)
+    return get_analysis_prompt(findings, data_type, mode, type_scores, note)
 
 def get_prompts_info() -> dict:
     """
@@ -188,13 +431,19 @@ def get_prompts_info() -> dict:
         Diccionario con información de los prompts
     """
     return {
+        "version": PROMPT_TEMPLATE_VERSION,
         "modes": ["junior", "expert"],
-        "data_types": ["Mixto", "Nmap", "WHOIS/DNS"],
+        "data_types": ["Mixto", "Nmap", "WHOIS/DNS", DIFF_DATA_TYPE],
         "templates": {
             "system": "SYSTEM_ROLE",
+            "instructions": "ANALYSIS_INSTRUCTIONS",
             "analysis": "ANALYSIS_TEMPLATE",
             "nmap": "NMAP_ANALYSIS_TEMPLATE",
             "whois_dns": "WHOIS_DNS_TEMPLATE",
-            "mixed": "MIXED_ANALYSIS_TEMPLATE"
+            "mixed": "MIXED_ANALYSIS_TEMPLATE",
+            "chunk": "CHUNK_ANALYSIS_TEMPLATE",
+            "reduce": "REDUCE_ANALYSIS_NOTE",
+            "structured": "STRUCTURED_ANALYSIS_INSTRUCTIONS",
+            "diff": "DIFF_ANALYSIS_INSTRUCTIONS"
         }
     }
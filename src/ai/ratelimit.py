@@ -0,0 +1,83 @@
+"""
+Limitadores de ritmo para las llamadas asíncronas a la API.
+Implementan token buckets para peticiones por minuto (RPM) y tokens por
+minuto (TPM), los dos límites que aplica OpenAI por cuenta y modelo.
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Token bucket asíncrono: se rellena a ritmo constante hasta `capacity`.
+
+    Los consumidores esperan en orden de llegada hasta que hay saldo suficiente.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        """
+        Inicializa el bucket.
+
+        Args:
+            per_minute: Unidades repuestas por minuto
+            capacity: Saldo máximo acumulable (por defecto, un minuto de ritmo)
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        """
+        Espera hasta poder consumir `amount` unidades y las consume.
+
+        Una petición mayor que la capacidad se limita a la capacidad para no
+        bloquearse indefinidamente.
+
+        Args:
+            amount: Unidades a consumir
+        """
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+
+class RateLimiter:
+    """
+    Combina los límites de peticiones y de tokens por minuto.
+    """
+
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None):
+        """
+        Inicializa el limitador.
+
+        Args:
+            rpm: Peticiones por minuto (None para no limitar)
+            tpm: Tokens por minuto (None para no limitar)
+        """
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+
+    async def acquire(self, tokens: int) -> None:
+        """
+        Reserva una petición y los tokens que va a consumir.
+
+        Args:
+            tokens: Tokens estimados de la petición (prompt + respuesta máxima)
+        """
+        if self.requests is not None:
+            await self.requests.acquire(1)
+        if self.tokens is not None:
+            await self.tokens.acquire(tokens)
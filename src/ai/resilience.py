@@ -0,0 +1,446 @@
+"""
+Capa de resiliencia para las llamadas a la API.
+Reintentos con backoff exponencial y jitter (respetando Retry-After),
+timeouts por llamada, peticiones duplicadas (hedging) cuando una llamada
+supera el p95 de latencia y circuit breaker por modelo con modelo de reserva.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncContextManager, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from openai import APIConnectionError, APIStatusError
+
+# Códigos HTTP que indican un fallo transitorio del servicio
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """El circuito del modelo está abierto: se falla sin llamar a la API."""
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Parámetros de reintento y timeout.
+
+    Attributes:
+        max_retries: Reintentos tras el primer intento
+        base_delay: Espera base del backoff en segundos
+        max_delay: Espera máxima entre intentos en segundos
+        timeout: Timeout base de cada llamada en segundos
+        seconds_per_token: Segundos añadidos al timeout por cada token de
+            `max_tokens` en las llamadas sin streaming (la respuesta llega entera)
+    """
+
+    max_retries: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 20.0
+    timeout: float = 60.0
+    seconds_per_token: float = 0.03
+
+    def timeout_for(self, max_tokens: Optional[int] = None) -> float:
+        """
+        Timeout de una llamada: el base más el tiempo de generar `max_tokens`
+        (4000 tokens suman 120 s con los valores por defecto).
+
+        Args:
+            max_tokens: Máximo de tokens de la respuesta (None si no se conoce
+                o si la llamada abre un stream)
+        """
+        return self.timeout + self.seconds_per_token * (max_tokens or 0)
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Indica si un error es transitorio (conexión, timeout, 429 o 5xx).
+    """
+    if isinstance(error, APIConnectionError):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in RETRYABLE_STATUS
+    return isinstance(error, (TimeoutError, asyncio.TimeoutError))
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """
+    Segundos de espera indicados por el servidor (Retry-After o retry-after-ms).
+
+    Returns:
+        Segundos o None si la respuesta no los indica
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def backoff_delay(attempt: int, policy: RetryPolicy, error: Optional[Exception] = None) -> float:
+    """
+    Espera antes del reintento `attempt` (desde 0): Retry-After si el servidor
+    lo indica; si no, backoff exponencial con jitter completo.
+    """
+    server_delay = retry_after(error) if error is not None else None
+    if server_delay is not None:
+        return min(server_delay, policy.max_delay)
+    return random.uniform(0, min(policy.max_delay, policy.base_delay * 2 ** attempt))
+
+
+class LatencyTracker:
+    """
+    Latencias recientes por modelo para calcular percentiles.
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, seconds: float) -> None:
+        """Registra la latencia de una llamada correcta."""
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, model: str, q: float = 0.95) -> Optional[float]:
+        """
+        Percentil `q` de la latencia del modelo, o None sin muestras suficientes.
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker: tras `failure_threshold` fallos seguidos se abre y falla
+    de inmediato durante `reset_timeout` segundos; después deja pasar una
+    llamada de prueba (semiabierto) que lo cierra si sale bien.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """"closed", "open" o "half-open"."""
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def acquire(self) -> Optional[str]:
+        """
+        Pide permiso para llamar.
+
+        Returns:
+            "call" con el circuito cerrado, "probe" si es la llamada de prueba
+            del estado semiabierto (liberarla con `release_probe` si no acaba
+            en `record_success` ni `record_failure`) o None si no se puede llamar
+        """
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return "call"
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return "probe"
+            return None
+
+    def allow(self) -> bool:
+        """Indica si se puede llamar (en semiabierto, solo una llamada de prueba)."""
+        return self.acquire() is not None
+
+    def release_probe(self) -> None:
+        """Libera la llamada de prueba sin cambiar el estado del circuito."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+# Estado compartido por todo el proceso (todas las sesiones llaman a los mismos modelos)
+LATENCIES = LatencyTracker()
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+_hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="openai-hedge")
+
+
+def get_breaker(model: str) -> CircuitBreaker:
+    """Devuelve el circuit breaker compartido de un modelo."""
+    with _breakers_lock:
+        breaker = _breakers.get(model)
+        if breaker is None:
+            breaker = _breakers[model] = CircuitBreaker()
+        return breaker
+
+
+class ResilientCaller:
+    """
+    Ejecuta llamadas a la API con reintentos, hedging, circuit breaker y
+    modelo de reserva.
+
+    Las funciones de llamada reciben `(modelo, timeout)` y devuelven la respuesta.
+    """
+
+    def __init__(
+        self,
+        policy: Optional[RetryPolicy] = None,
+        fallback_model: Optional[str] = None,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95
+    ):
+        """
+        Args:
+            policy: Reintentos y timeout (por defecto `RetryPolicy()`)
+            fallback_model: Modelo a usar si el principal falla o su circuito está abierto
+            hedge: Lanzar una petición duplicada si la primera supera el percentil
+            hedge_quantile: Percentil de latencia a partir del cual se duplica
+        """
+        self.policy = policy or RetryPolicy()
+        self.fallback_model = fallback_model
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+
+    def _models(self, model: str) -> List[str]:
+        if self.fallback_model and self.fallback_model != model:
+            return [model, self.fallback_model]
+        return [model]
+
+    def _attempt(self, call: Callable[[str, float], Any], model: str, hedge: bool, timeout: float) -> Tuple[Any, bool]:
+        threshold = LATENCIES.percentile(model, self.hedge_quantile) if hedge else None
+        if threshold is None:
+            return call(model, timeout), False
+
+        # Hedging: si la primera petición supera el umbral se lanza otra y gana la primera que acabe
+        first = _hedge_pool.submit(call, model, timeout)
+        done, _ = wait([first], timeout=threshold)
+        if done:
+            return first.result(), False
+        second = _hedge_pool.submit(call, model, timeout)
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result(), True
+                error = future.exception()
+        raise error
+
+    def call(
+        self,
+        call: Callable[[str, float], Any],
+        model: str,
+        hedge: Optional[bool] = None,
+        max_tokens: Optional[int] = None,
+        stream: bool = False
+    ) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Ejecuta una llamada síncrona.
+
+        Solo las respuestas completas sin streaming alimentan las latencias
+        del hedging: abrir un stream solo espera a las cabeceras y bajaría el
+        percentil hasta el tiempo al primer byte.
+
+        Args:
+            call: Función `(modelo, timeout) -> respuesta`
+            model: Modelo principal
+            hedge: Forzar o desactivar el hedging para esta llamada
+            max_tokens: Máximo de tokens de la respuesta, para ajustar el timeout
+            stream: La llamada abre un stream (sin hedging ni registro de latencia)
+
+        Returns:
+            Tupla (respuesta, información: modelo usado, intentos, hedged, latencia)
+
+        Raises:
+            El último error si se agotan reintentos y modelos, o CircuitOpenError
+        """
+        hedge = not stream and (self.hedge if hedge is None else hedge)
+        timeout = self.policy.timeout_for(None if stream else max_tokens)
+        attempts = 0
+        last_error: Exception = CircuitOpenError(f"Circuito abierto para {model}")
+
+        for current in self._models(model):
+            breaker = get_breaker(current)
+            permit = breaker.acquire()
+            if permit is None:
+                last_error = CircuitOpenError(f"Circuito abierto para {current}")
+                continue
+            probing = permit == "probe"
+            try:
+                for retry in range(self.policy.max_retries + 1):
+                    attempts += 1
+                    start = time.perf_counter()
+                    try:
+                        response, hedged = self._attempt(call, current, hedge, timeout)
+                    except Exception as e:
+                        if not is_retryable(e):
+                            # El modelo responde: el error es de la petición, no del servicio
+                            breaker.record_success()
+                            raise
+                        last_error = e
+                        breaker.record_failure()
+                        permit = breaker.acquire() if retry < self.policy.max_retries else None
+                        if permit is None:
+                            break
+                        probing = probing or permit == "probe"
+                        time.sleep(backoff_delay(retry, self.policy, e))
+                        continue
+                    latency = time.perf_counter() - start
+                    breaker.record_success()
+                    if not stream:
+                        LATENCIES.record(current, latency)
+                    return response, {"model": current, "attempts": attempts, "hedged": hedged, "latency": round(latency, 3)}
+            finally:
+                # Una interrupción no puede dejar el circuito semiabierto bloqueado
+                if probing:
+                    breaker.release_probe()
+
+        raise last_error
+
+    async def _request_async(
+        self,
+        call: Callable[[str, float], Awaitable[Any]],
+        model: str,
+        timeout: float,
+        guard: Optional[Callable[[str], AsyncContextManager[Any]]]
+    ) -> Any:
+        # El guard (límites de concurrencia y de RPM/TPM) se espera fuera del timeout
+        if guard is None:
+            return await asyncio.wait_for(call(model, timeout), timeout)
+        async with guard(model):
+            return await asyncio.wait_for(call(model, timeout), timeout)
+
+    async def _attempt_async(
+        self,
+        call: Callable[[str, float], Awaitable[Any]],
+        model: str,
+        hedge: bool,
+        timeout: float,
+        guard: Optional[Callable[[str], AsyncContextManager[Any]]] = None
+    ) -> Tuple[Any, bool]:
+        threshold = LATENCIES.percentile(model, self.hedge_quantile) if hedge else None
+        if threshold is None:
+            return await self._request_async(call, model, timeout, guard), False
+
+        first = asyncio.ensure_future(self._request_async(call, model, timeout, guard))
+        done, _ = await asyncio.wait({first}, timeout=threshold)
+        if done:
+            return first.result(), False
+        second = asyncio.ensure_future(self._request_async(call, model, timeout, guard))
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result(), True
+                    error = task.exception()
+        finally:
+            # Cancelar la petición perdedora
+            for task in pending:
+                task.cancel()
+        raise error
+
+    async def call_async(
+        self,
+        call: Callable[[str, float], Awaitable[Any]],
+        model: str,
+        hedge: Optional[bool] = None,
+        guard: Optional[Callable[[str], AsyncContextManager[Any]]] = None,
+        max_tokens: Optional[int] = None,
+        stream: bool = False
+    ) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Versión asíncrona de `call`; la petición perdedora del hedging se cancela.
+
+        Args:
+            call, model, hedge, max_tokens, stream: Como en `call`
+            guard: Fábrica `modelo -> context manager asíncrono` que envuelve
+                cada petición enviada (intentos, reintentos y duplicados del
+                hedging), p. ej. para respetar límites de concurrencia y RPM/TPM
+        """
+        hedge = not stream and (self.hedge if hedge is None else hedge)
+        timeout = self.policy.timeout_for(None if stream else max_tokens)
+        attempts = 0
+        last_error: Exception = CircuitOpenError(f"Circuito abierto para {model}")
+
+        for current in self._models(model):
+            breaker = get_breaker(current)
+            permit = breaker.acquire()
+            if permit is None:
+                last_error = CircuitOpenError(f"Circuito abierto para {current}")
+                continue
+            probing = permit == "probe"
+            try:
+                for retry in range(self.policy.max_retries + 1):
+                    attempts += 1
+                    start = time.perf_counter()
+                    try:
+                        response, hedged = await self._attempt_async(call, current, hedge, timeout, guard)
+                    except Exception as e:
+                        if not is_retryable(e):
+                            # El modelo responde: el error es de la petición, no del servicio
+                            breaker.record_success()
+                            raise
+                        last_error = e
+                        breaker.record_failure()
+                        permit = breaker.acquire() if retry < self.policy.max_retries else None
+                        if permit is None:
+                            break
+                        probing = probing or permit == "probe"
+                        await asyncio.sleep(backoff_delay(retry, self.policy, e))
+                        continue
+                    latency = time.perf_counter() - start
+                    breaker.record_success()
+                    if not stream:
+                        LATENCIES.record(current, latency)
+                    return response, {"model": current, "attempts": attempts, "hedged": hedged, "latency": round(latency, 3)}
+            finally:
+                # Una interrupción no puede dejar el circuito semiabierto bloqueado
+                if probing:
+                    breaker.release_probe()
+
+        raise last_error
@@ -0,0 +1,241 @@
+"""
+Router de modelos adaptativo.
+Elige entre los modelos disponibles según el tamaño de la entrada, el tipo
+de datos, el modo y el historial de latencia y longitud de respuesta, y
+predice un `max_tokens` ajustado a lo que realmente se suele generar.
+"""
+
+import math
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from statistics import median
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .tokens import estimate_cost
+
+# Calidad relativa (1-3) y ventana de contexto de cada modelo
+MODEL_PROFILES: Dict[str, Dict[str, int]] = {
+    "gpt-4o-mini": {"quality": 2, "context": 128_000},
+    "gpt-4o": {"quality": 3, "context": 128_000},
+    "gpt-4-turbo": {"quality": 3, "context": 128_000},
+    "gpt-3.5-turbo": {"quality": 1, "context": 16_385}
+}
+
+# Latencia orientativa (s) mientras no hay historial del modelo
+DEFAULT_LATENCY = {
+    "gpt-3.5-turbo": 6.0,
+    "gpt-4o-mini": 10.0,
+    "gpt-4o": 15.0,
+    "gpt-4-turbo": 30.0
+}
+
+# max_tokens por defecto según el tipo de datos, sin historial
+DEFAULT_MAX_TOKENS = {"WHOIS/DNS": 1200, "Nmap": 2000, "Mixto": 2500}
+
+ROUTING_POLICIES = ("cheapest", "fastest", "quality")
+
+_MIN_SAMPLES = 5
+_MAX_TOKENS_FLOOR = 500
+_MAX_TOKENS_CEILING = 4000
+
+
+def normalize_data_type(data_type: str) -> str:
+    """
+    Agrupa las etiquetas de tipo de datos como `get_type_context`: el
+    clasificador devuelve "WHOIS" o "DNS" y las tablas usan "WHOIS/DNS".
+
+    Args:
+        data_type: Tipo de datos o etiqueta del clasificador
+
+    Returns:
+        "Nmap", "WHOIS/DNS" o el tipo sin cambios
+    """
+    lowered = data_type.lower()
+    if "nmap" in lowered:
+        return "Nmap"
+    if "whois" in lowered or "dns" in lowered:
+        return "WHOIS/DNS"
+    return data_type
+
+
+@dataclass
+class RouteDecision:
+    """
+    Resultado del router.
+
+    Attributes:
+        model: Modelo elegido
+        max_tokens: Máximo de tokens de respuesta previsto
+        policy: Política aplicada
+        reason: Explicación breve de la elección
+        candidates: Modelos considerados con su coste y latencia estimados
+    """
+
+    model: str
+    max_tokens: int
+    policy: str
+    reason: str
+    candidates: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "policy": self.policy,
+            "reason": self.reason,
+            "candidates": self.candidates
+        }
+
+
+class UsageHistory:
+    """
+    Historial reciente de llamadas: latencia por modelo y tokens de respuesta
+    por tipo de datos y modo.
+    """
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._latency: Dict[str, Deque[float]] = {}
+        self._completions: Dict[Tuple[str, str], Deque[int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, data_type: str, mode: str, completion_tokens: int, latency: Optional[float] = None) -> None:
+        """
+        Registra una llamada correcta.
+
+        Args:
+            model: Modelo usado
+            data_type: Tipo de datos analizado
+            mode: Modo de análisis
+            completion_tokens: Tokens generados
+            latency: Duración de la llamada en segundos (opcional)
+        """
+        with self._lock:
+            if latency is not None:
+                self._latency.setdefault(model, deque(maxlen=self.window)).append(latency)
+            key = (normalize_data_type(data_type), mode.lower())
+            self._completions.setdefault(key, deque(maxlen=self.window)).append(completion_tokens)
+
+    def latency(self, model: str) -> Optional[float]:
+        """Latencia mediana del modelo o None sin muestras suficientes."""
+        with self._lock:
+            samples = list(self._latency.get(model, ()))
+        return median(samples) if len(samples) >= _MIN_SAMPLES else None
+
+    def completion_tokens(self, data_type: str, mode: str) -> List[int]:
+        """Tokens de respuesta registrados para un tipo de datos y modo."""
+        with self._lock:
+            return list(self._completions.get((normalize_data_type(data_type), mode.lower()), ()))
+
+
+# Historial compartido por todo el proceso
+HISTORY = UsageHistory()
+
+
+def predict_max_tokens(data_type: str, mode: str, history: UsageHistory = HISTORY) -> int:
+    """
+    Predice un `max_tokens` suficiente: el percentil 90 de las respuestas
+    previas del mismo tipo y modo con un 20% de margen, redondeado a 250.
+
+    Args:
+        data_type: Tipo de datos
+        mode: Modo de análisis
+        history: Historial de llamadas
+
+    Returns:
+        Máximo de tokens de respuesta
+    """
+    samples = sorted(history.completion_tokens(data_type, mode))
+    if len(samples) < _MIN_SAMPLES:
+        predicted = DEFAULT_MAX_TOKENS.get(normalize_data_type(data_type), DEFAULT_MAX_TOKENS["Mixto"])
+        if mode.lower() == "junior":
+            # El modo junior explica más y genera respuestas más largas
+            predicted += 500
+    else:
+        p90 = samples[min(len(samples) - 1, int(0.9 * len(samples)))]
+        predicted = math.ceil(p90 * 1.2 / 250) * 250
+    return max(_MAX_TOKENS_FLOOR, min(_MAX_TOKENS_CEILING, predicted))
+
+
+def required_quality(data_type: str, mode: str, input_tokens: int) -> int:
+    """
+    Calidad mínima razonable para una petición.
+
+    Las consultas WHOIS/DNS pequeñas las resuelve cualquier modelo; el modo
+    experto, los datos mixtos y las entradas grandes piden al menos nivel 2.
+    """
+    if mode.lower() == "expert" or input_tokens > 20_000:
+        return 2
+    if normalize_data_type(data_type) == "WHOIS/DNS" or input_tokens < 2_000:
+        return 1
+    return 2
+
+
+def route(
+    input_tokens: int,
+    data_type: str,
+    mode: str,
+    models: List[str],
+    policy: str = "cheapest",
+    quality_floor: Optional[int] = None,
+    history: UsageHistory = HISTORY
+) -> RouteDecision:
+    """
+    Elige modelo y `max_tokens` para una petición.
+
+    Args:
+        input_tokens: Tokens de prompt previstos
+        data_type: Tipo de datos
+        mode: Modo de análisis
+        models: Modelos entre los que elegir
+        policy: "cheapest" (menor coste), "fastest" (menor latencia) o
+            "quality" (mayor calidad; a igualdad, el más barato)
+        quality_floor: Calidad mínima exigida (por defecto, según la petición)
+        history: Historial de llamadas
+
+    Returns:
+        Decisión del router
+
+    Raises:
+        ValueError: Si la política no existe
+    """
+    if policy not in ROUTING_POLICIES:
+        raise ValueError(f"Política de routing desconocida: {policy}")
+
+    max_tokens = predict_max_tokens(data_type, mode, history)
+    floor = quality_floor if quality_floor is not None else required_quality(data_type, mode, input_tokens)
+    observed = history.completion_tokens(data_type, mode)
+    expected_completion = int(median(observed)) if len(observed) >= _MIN_SAMPLES else max_tokens // 2
+
+    candidates = []
+    for model in models:
+        profile = MODEL_PROFILES.get(model)
+        if profile is None or input_tokens + max_tokens > profile["context"]:
+            continue
+        candidates.append({
+            "model": model,
+            "quality": profile["quality"],
+            "cost": estimate_cost(input_tokens, expected_completion, model)["total_cost"],
+            "latency": history.latency(model) or DEFAULT_LATENCY.get(model, 30.0)
+        })
+
+    eligible = [candidate for candidate in candidates if candidate["quality"] >= floor]
+    if not eligible:
+        # Ningún modelo llega al mínimo: el de mayor calidad que quepa
+        eligible = sorted(candidates, key=lambda candidate: -candidate["quality"])[:1]
+    if not eligible:
+        # Entrada mayor que cualquier contexto: se usa el primero (irá por fragmentos)
+        return RouteDecision(models[0], max_tokens, policy, "ningún modelo admite la entrada completa")
+
+    if policy == "cheapest":
+        chosen = min(eligible, key=lambda candidate: (candidate["cost"], -candidate["quality"]))
+        reason = f"el más barato con calidad ≥ {floor}"
+    elif policy == "fastest":
+        chosen = min(eligible, key=lambda candidate: (candidate["latency"], candidate["cost"]))
+        reason = f"el más rápido con calidad ≥ {floor}"
+    else:
+        chosen = min(eligible, key=lambda candidate: (-candidate["quality"], candidate["cost"]))
+        reason = "el de mayor calidad"
+
+    return RouteDecision(chosen["model"], max_tokens, policy, reason, candidates)
@@ -0,0 +1,306 @@
+"""
+Modo de salida estructurada.
+Los activos (IPs, dominios, puertos, servicios y versiones) se extraen
+localmente y se pasan al modelo como hechos conocidos; el modelo solo
+devuelve un JSON con hallazgos, riesgos y recomendaciones, y el informe en
+Markdown se genera aquí. La respuesta es mucho más corta y el resultado se
+puede indexar sin parsear Markdown.
+"""
+
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+from utils.formats import extract_hosts
+from utils.nmap_xml import NmapHost
+from utils.parser import scan_text
+
+SEVERITIES = ["info", "baja", "media", "alta", "crítica"]
+EXPOSURE_LEVELS = ["bajo", "medio", "alto", "crítico"]
+PRIORITIES = ["alta", "media", "baja"]
+
+# Esquema de la respuesta (modo estricto de Structured Outputs: todo obligatorio y sin extras)
+REPORT_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "summary": {"type": "string"},
+        "exposure_level": {"type": "string", "enum": EXPOSURE_LEVELS},
+        "technologies": {"type": "array", "items": {"type": "string"}},
+        "findings": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "title": {"type": "string"},
+                    "asset": {"type": "string"},
+                    "severity": {"type": "string", "enum": SEVERITIES},
+                    "detail": {"type": "string"}
+                },
+                "required": ["title", "asset", "severity", "detail"],
+                "additionalProperties": False
+            }
+        },
+        "risks": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "title": {"type": "string"},
+                    "severity": {"type": "string", "enum": SEVERITIES},
+                    "explanation": {"type": "string"}
+                },
+                "required": ["title", "severity", "explanation"],
+                "additionalProperties": False
+            }
+        },
+        "recommendations": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "action": {"type": "string"},
+                    "priority": {"type": "string", "enum": PRIORITIES}
+                },
+                "required": ["action", "priority"],
+                "additionalProperties": False
+            }
+        },
+        "next_steps": {"type": "array", "items": {"type": "string"}},
+        "learning_resources": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": [
+        "summary", "exposure_level", "technologies", "findings", "risks",
+        "recommendations", "next_steps", "learning_resources"
+    ],
+    "additionalProperties": False
+}
+
+RESPONSE_FORMAT: Dict[str, Any] = {
+    "type": "json_schema",
+    "json_schema": {"name": "recon_report", "strict": True, "schema": REPORT_SCHEMA}
+}
+
+# Modelos sin Structured Outputs (json_schema): se les pide un objeto JSON libre
+JSON_OBJECT_ONLY_MODELS = ("gpt-4", "gpt-3.5-turbo")
+
+# Hosts listados como hechos en el prompt (el resto se resume)
+MAX_FACT_HOSTS = 200
+
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+_SEVERITY_ICONS = {"info": "🔵", "baja": "🟢", "media": "🟡", "alta": "🟠", "crítica": "🔴"}
+
+
+def extract_facts(text: str, hosts: Optional[Iterable[NmapHost]] = None) -> Dict[str, Any]:
+    """
+    Extrae localmente los activos de una entrada.
+
+    Args:
+        text: Texto normalizado
+        hosts: Hosts ya parseados (si la entrada venía de un formato estructurado)
+
+    Returns:
+        Diccionario serializable con `ips`, `domains`, `ports` y `hosts`
+        (cada host con sus servicios abiertos)
+    """
+    scan = scan_text(text)
+    hosts = list(hosts) if hosts is not None else extract_hosts(text)
+
+    host_facts = []
+    for host in hosts:
+        services = [
+            {
+                "port": port.portid,
+                "protocol": port.protocol,
+                "service": port.service,
+                "version": " ".join(part for part in (port.product, port.version) if part)
+            }
+            for port in host.ports
+            if port.state in ("open", "open|filtered")
+        ]
+        host_facts.append({
+            "address": host.address,
+            "hostnames": list(host.hostnames),
+            "os": host.os_guesses[0][0] if host.os_guesses else "",
+            "services": services
+        })
+
+    return {
+        "ips": scan.ips,
+        "domains": scan.domains,
+        "ports": scan.ports,
+        "hosts": host_facts
+    }
+
+
+def format_facts(facts: Dict[str, Any], max_hosts: int = MAX_FACT_HOSTS) -> str:
+    """
+    Representa los hechos de forma compacta para el prompt.
+
+    Args:
+        facts: Resultado de `extract_facts`
+        max_hosts: Hosts detallados como máximo
+
+    Returns:
+        Texto con una línea por host y listas de IPs, dominios y puertos
+    """
+    lines = []
+    for host in facts["hosts"][:max_hosts]:
+        name = host["address"] + (f" ({', '.join(host['hostnames'])})" if host["hostnames"] else "")
+        services = "; ".join(
+            f"{service['port']}/{service['protocol']} {service['service']} {service['version']}".rstrip()
+            for service in host["services"]
+        )
+        os_name = f" [SO: {host['os']}]" if host["os"] else ""
+        lines.append(f"- {name}{os_name}: {services or 'sin puertos abiertos'}")
+    if len(facts["hosts"]) > max_hosts:
+        lines.append(f"- ... y {len(facts['hosts']) - max_hosts} hosts más")
+
+    lines.append(f"IPs ({len(facts['ips'])}): {', '.join(facts['ips'][:max_hosts]) or 'ninguna'}")
+    lines.append(f"Dominios ({len(facts['domains'])}): {', '.join(facts['domains'][:max_hosts]) or 'ninguno'}")
+    lines.append(f"Puertos: {', '.join(str(port) for port in facts['ports']) or 'ninguno'}")
+    return "\n".join(lines)
+
+
+def response_format_for(model: str) -> Dict[str, Any]:
+    """
+    Formato de respuesta admitido por un modelo.
+
+    Args:
+        model: Modelo de OpenAI
+
+    Returns:
+        `RESPONSE_FORMAT` (esquema estricto) o `{"type": "json_object"}` para
+        los modelos sin Structured Outputs; el prompt ya describe las claves
+        y `parse_report` completa las que falten
+    """
+    if any(model == name or model.startswith(f"{name}-") for name in JSON_OBJECT_ONLY_MODELS):
+        return {"type": "json_object"}
+    return RESPONSE_FORMAT
+
+
+def parse_report(content: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Lee el JSON devuelto por el modelo.
+
+    Tolera bloques de código Markdown y completa las claves que falten. Los
+    modelos sin Structured Outputs no siguen el esquema: un texto donde se
+    esperaba un objeto se convierte en su primer campo (`{"title": texto}`)
+    y cualquier otro tipo inesperado invalida el informe.
+
+    Args:
+        content: Texto de la respuesta
+
+    Returns:
+        Informe o None si la respuesta no es un objeto JSON con la forma del esquema
+    """
+    if not content:
+        return None
+    try:
+        report = json.loads(_FENCE_RE.sub("", content.strip()))
+    except ValueError:
+        return None
+    if not isinstance(report, dict):
+        return None
+    for key, schema in REPORT_SCHEMA["properties"].items():
+        value = report.get(key)
+        if schema["type"] != "array":
+            if value is None:
+                value = ""
+            elif not isinstance(value, str):
+                return None
+            report[key] = value
+            continue
+        if value is None:
+            value = []
+        elif not isinstance(value, list):
+            value = [value]
+        items = schema["items"]
+        if items["type"] == "object":
+            first_field = items["required"][0]
+            value = [{first_field: item} if isinstance(item, str) else item for item in value]
+            if not all(isinstance(item, dict) for item in value):
+                return None
+        elif not all(isinstance(item, str) for item in value):
+            return None
+        report[key] = value
+    return report
+
+
+def render_report(report: Dict[str, Any], facts: Dict[str, Any], mode: str = "junior") -> str:
+    """
+    Genera el informe en Markdown con las mismas secciones que
+    `ANALYSIS_INSTRUCTIONS`: los activos salen de los hechos locales y el
+    análisis, del JSON del modelo.
+
+    Args:
+        report: Resultado de `parse_report`
+        facts: Resultado de `extract_facts`
+        mode: Modo de análisis (el modo junior incluye recursos de aprendizaje)
+
+    Returns:
+        Informe en Markdown
+    """
+    def bullets(items: List[str], empty: str = "Ninguno") -> str:
+        return "\n".join(f"- {item}" for item in items) if items else f"_{empty}_"
+
+    hostnames = sorted({name for host in facts["hosts"] for name in host["hostnames"]})
+    services = [
+        f"**{host['address']}** {service['port']}/{service['protocol']} "
+        f"{service['service'] or '?'}" + (f" — `{service['version']}`" if service["version"] else "")
+        for host in facts["hosts"]
+        for service in host["services"]
+    ]
+    versions = sorted({
+        service["version"] for host in facts["hosts"] for service in host["services"] if service["version"]
+    })
+    others = [f"{host['address']}: {host['os']}" for host in facts["hosts"] if host["os"]]
+    if not services and facts["ports"]:
+        services = [", ".join(str(port) for port in facts["ports"])]
+
+    findings = [
+        f"{_SEVERITY_ICONS.get(item.get('severity'), '⚪')} **{item.get('title', '')}**"
+        + (f" ({item['asset']})" if item.get("asset") else "")
+        + (f": {item['detail']}" if item.get("detail") else "")
+        for item in report["findings"]
+    ]
+    risks = [
+        f"{_SEVERITY_ICONS.get(item.get('severity'), '⚪')} **{item.get('title', '')}**: {item.get('explanation', '')}"
+        for item in report["risks"]
+    ]
+    recommendations = [
+        f"**[{item.get('priority', 'media')}]** {item.get('action', '')}" for item in report["recommendations"]
+    ]
+
+    sections = [
+        "## 📋 Resumen Ejecutivo",
+        report["summary"] or "_Sin resumen_",
+        "## 🎯 Activos Detectados",
+        "### IPs Identificadas",
+        bullets(facts["ips"], "Ninguna"),
+        "### Dominios y Subdominios",
+        bullets(sorted(set(facts["domains"]) | set(hostnames))),
+        "### Otros Activos",
+        bullets(others),
+        "## 🔧 Servicios y Tecnologías",
+        "### Puertos Abiertos",
+        bullets(services),
+        "### Tecnologías Detectadas",
+        bullets(report["technologies"], "Ninguna"),
+        "### Versiones de Software",
+        bullets([f"`{version}`" for version in versions], "Ninguna"),
+        "## ⚠️ Análisis de Riesgos (Educativo)",
+        "### Hallazgos",
+        bullets(findings),
+        "### Riesgos Potenciales",
+        bullets(risks),
+        "### Nivel de Exposición",
+        (report["exposure_level"] or "no evaluado").capitalize(),
+        "## 💡 Recomendaciones",
+        "### Acciones Sugeridas",
+        bullets(recommendations, "Ninguna"),
+    ]
+    if mode.lower() != "expert":
+        sections += ["### Recursos de Aprendizaje", bullets(report["learning_resources"])]
+    sections += ["### Próximos Pasos", bullets(report["next_steps"])]
+    return "\n\n".join(sections)
@@ -0,0 +1,257 @@
+"""
+Conteo local de tokens y estimación de costes antes de llamar a la API.
+Usa tiktoken si está instalado y, si no, una heurística basada en las reglas
+de pre-tokenización de los encodings de OpenAI.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.cache import LRUCache, content_key
+
+try:
+    import tiktoken
+except ImportError:  # Dependencia opcional
+    tiktoken = None
+
+# Precios por token en USD (actualizar según pricing de OpenAI).
+# "cached_input" es el precio de los tokens de entrada servidos desde la caché
+# de prefijos del proveedor (igual a "input" en modelos sin esa caché).
+MODEL_PRICING: Dict[str, Dict[str, float]] = {
+    "gpt-4o-mini": {
+        "input": 0.150 / 1_000_000,  # $0.150 por 1M tokens
+        "cached_input": 0.075 / 1_000_000,
+        "output": 0.600 / 1_000_000   # $0.600 por 1M tokens
+    },
+    "gpt-4o": {
+        "input": 2.50 / 1_000_000,
+        "cached_input": 1.25 / 1_000_000,
+        "output": 10.00 / 1_000_000
+    },
+    "gpt-4-turbo": {
+        "input": 10.00 / 1_000_000,
+        "cached_input": 10.00 / 1_000_000,
+        "output": 30.00 / 1_000_000
+    },
+    "gpt-3.5-turbo": {
+        "input": 0.50 / 1_000_000,
+        "cached_input": 0.50 / 1_000_000,
+        "output": 1.50 / 1_000_000
+    }
+}
+
+# Descuento de la Batch API sobre el precio normal
+BATCH_DISCOUNT = 0.5
+
+# Tokens fijos que añade el formato de chat por mensaje y por respuesta
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+# Trozos de la heurística: letras, dígitos, símbolos y saltos de línea.
+# Los encodings cl100k/o200k agrupan los dígitos de 3 en 3 y un espacio
+# inicial va unido a la palabra siguiente.
+_LETTERS_RE = re.compile(r"[^\W\d_]+")
+_DIGITS_RE = re.compile(r"\d+")
+_SYMBOLS_RE = re.compile(r"[^\w\s]+|_+")
+_NEWLINES_RE = re.compile(r"\n+")
+
+_TOKEN_CACHE = LRUCache(maxsize=512)
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str) -> Any:
+    """
+    Devuelve el encoding de tiktoken del modelo o None si no está disponible
+    (paquete no instalado o ficheros BPE no descargables sin red).
+    """
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        try:
+            return tiktoken.get_encoding("o200k_base" if "4o" in model else "cl100k_base")
+        except Exception:
+            return None
+
+
+def has_exact_tokenizer(model: str = "gpt-4o-mini") -> bool:
+    """
+    Indica si el conteo para el modelo es exacto (tiktoken) o heurístico.
+    """
+    return _get_encoding(model) is not None
+
+
+def _heuristic_tokens(text: str) -> int:
+    letters = sum((len(word) + 3) // 4 for word in _LETTERS_RE.findall(text))
+    digits = sum((len(number) + 2) // 3 for number in _DIGITS_RE.findall(text))
+    symbols = sum((len(run) + 1) // 2 for run in _SYMBOLS_RE.findall(text))
+    newlines = len(_NEWLINES_RE.findall(text))
+    return letters + digits + symbols + newlines
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """
+    Cuenta los tokens de un texto para un modelo.
+
+    Args:
+        text: Texto a contar
+        model: Modelo de OpenAI
+
+    Returns:
+        Número de tokens (exacto con tiktoken, estimado sin él)
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    key = (encoding.name if encoding is not None else "heuristic", content_key(text))
+    if encoding is not None:
+        return _TOKEN_CACHE.get_or_compute(key, lambda: len(encoding.encode(text, disallowed_special=())))
+    return _TOKEN_CACHE.get_or_compute(key, lambda: _heuristic_tokens(text))
+
+
+def count_message_tokens(messages: List[Dict[str, str]], model: str = "gpt-4o-mini") -> int:
+    """
+    Cuenta los tokens de prompt de una lista de mensajes de chat.
+
+    Args:
+        messages: Mensajes con "role" y "content"
+        model: Modelo de OpenAI
+
+    Returns:
+        Tokens de prompt que facturará la API
+    """
+    total = TOKENS_PER_REPLY
+    for message in messages:
+        total += TOKENS_PER_MESSAGE + count_tokens(message["content"], model) + 1
+    return total
+
+
+def get_model_pricing(model: str) -> Dict[str, float]:
+    """
+    Devuelve los precios por token de un modelo.
+
+    Los modelos desconocidos usan la tarifa más cara de la tabla, para que
+    los presupuestos nunca se subestimen.
+
+    Args:
+        model: Modelo de OpenAI
+
+    Returns:
+        Diccionario con precios de entrada y salida por token
+    """
+    pricing = MODEL_PRICING.get(model)
+    if pricing is None:
+        pricing = max(MODEL_PRICING.values(), key=lambda item: item["input"] + item["output"])
+    return pricing
+
+
+def estimate_cost(
+    prompt_tokens: int,
+    completion_tokens: int,
+    model: str = "gpt-4o-mini",
+    batch: bool = False,
+    cached_tokens: int = 0
+) -> Dict[str, Any]:
+    """
+    Estima el coste de una llamada.
+
+    Args:
+        prompt_tokens: Tokens del prompt
+        completion_tokens: Tokens de la respuesta
+        model: Modelo de OpenAI
+        batch: Aplicar el descuento de la Batch API
+        cached_tokens: Tokens del prompt servidos desde la caché de prefijos
+            (incluidos en `prompt_tokens`)
+
+    Returns:
+        Diccionario con estimación de coste
+    """
+    model_pricing = get_model_pricing(model)
+    factor = BATCH_DISCOUNT if batch else 1.0
+    cached_tokens = min(cached_tokens, prompt_tokens)
+
+    input_cost = (
+        (prompt_tokens - cached_tokens) * model_pricing["input"]
+        + cached_tokens * model_pricing["cached_input"]
+    ) * factor
+    output_cost = completion_tokens * model_pricing["output"] * factor
+    total_cost = input_cost + output_cost
+
+    return {
+        "input_cost": round(input_cost, 6),
+        "output_cost": round(output_cost, 6),
+        "total_cost": round(total_cost, 6),
+        "cached_tokens": cached_tokens,
+        "currency": "USD"
+    }
+
+
+def cached_prompt_tokens(usage: Any) -> int:
+    """
+    Lee los tokens de prompt servidos desde la caché de prefijos del uso que
+    devuelve la API (`usage.prompt_tokens_details.cached_tokens`).
+
+    Args:
+        usage: Uso de tokens como objeto del SDK o diccionario
+
+    Returns:
+        Tokens cacheados (0 si el servidor no los informa)
+    """
+    if isinstance(usage, dict):
+        details = usage.get("prompt_tokens_details")
+    else:
+        details = getattr(usage, "prompt_tokens_details", None)
+    if isinstance(details, dict):
+        return details.get("cached_tokens") or 0
+    return getattr(details, "cached_tokens", 0) or 0
+
+
+def best_model_within_budget(
+    budget: float,
+    prompt_tokens: int,
+    completion_tokens: int,
+    models: List[str],
+    exclude: Optional[str] = None
+) -> Optional[str]:
+    """
+    Elige el modelo más caro (y por tanto más capaz) de `models` cuyo coste
+    previsto cabe en el presupuesto.
+
+    Args:
+        budget: Presupuesto máximo en USD
+        prompt_tokens: Tokens de prompt previstos
+        completion_tokens: Tokens de respuesta previstos
+        models: Modelos candidatos
+        exclude: Modelo a descartar (el que ya excede el presupuesto)
+
+    Returns:
+        Nombre del modelo o None si ninguno cabe
+    """
+    fitting = [
+        (estimate_cost(prompt_tokens, completion_tokens, model)["total_cost"], model)
+        for model in models
+        if model != exclude and model in MODEL_PRICING
+    ]
+    fitting = [item for item in fitting if item[0] <= budget]
+    if not fitting:
+        return None
+    return max(fitting)[1]
+
+
+def get_token_counter(model: str = "gpt-4o-mini") -> Callable[[str], int]:
+    """
+    Devuelve una función de conteo sin caché, para contar muchos fragmentos
+    pequeños (p. ej. línea a línea) sin desplazar la caché de textos.
+
+    Args:
+        model: Modelo de OpenAI
+
+    Returns:
+        Función texto -> tokens
+    """
+    encoding = _get_encoding(model)
+    if encoding is not None:
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    return _heuristic_tokens
@@ -5,17 +5,22 @@ Aplicación profesional para análisis de reconocimiento de ciberseguridad con I
 
 import streamlit as st
 from dotenv import load_dotenv
+import json
+import os
 import sys
 from pathlib import Path
+from typing import Optional
 
 # Agregar el directorio src al path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from ai.analyzer import ReconAnalyzer
-from utils.parser import (
-    normalize_text, detect_data_type, get_text_stats,
-    extract_ips, extract_domains, extract_ports
-)
+from ai.analyzer import ReconAnalyzer, MAX_INPUT_CHARS
+from ai.cache import get_default_cache
+from ai.clients import warm_up
+from ai.prompts import DIFF_DATA_TYPE
+from utils.parser import normalize_text, classify_data_type
+from utils.formats import detect_format, parse_scan
+from utils.cache import IncrementalScanner, content_key
 from utils.helpers import (
     check_api_key, format_error_message, format_tokens_usage,
     format_cost_estimate, validate_input_text, format_warning_message
@@ -24,6 +29,10 @@ from utils.helpers import (
 # Cargar variables de entorno
 load_dotenv()
 
+# Abrir la conexión con la API en segundo plano (una vez por proceso)
+if os.getenv("OPENAI_API_KEY"):
+    warm_up(os.getenv("OPENAI_API_KEY"), os.getenv("OPENAI_BASE_URL"))
+
 # Configuración de la página
 st.set_page_config(
     page_title="AI Recon Mapper v1.0",
@@ -71,11 +80,46 @@ if 'analysis_history' not in st.session_state:
     st.session_state.analysis_history = []
 if 'analyzer' not in st.session_state:
     st.session_state.analyzer = None
+if 'text_scanner' not in st.session_state:
+    st.session_state.text_scanner = IncrementalScanner()
+if 'preflight' not in st.session_state:
+    st.session_state.preflight = None
 
-def init_analyzer(model: str):
+def init_analyzer(
+    model: str,
+    budget: Optional[float] = None,
+    budget_policy: str = "refuse",
+    fallback_model: Optional[str] = None,
+    hedge: bool = False,
+    routing_policy: Optional[str] = None,
+    similarity_threshold: Optional[float] = None
+):
     """Inicializa o actualiza el analizador."""
-    if st.session_state.analyzer is None or st.session_state.analyzer.model != model:
-        st.session_state.analyzer = ReconAnalyzer(model=model)
+    if st.session_state.analyzer is None:
+        st.session_state.analyzer = ReconAnalyzer(model=model, cache=get_default_cache())
+    else:
+        # El cliente HTTP es compartido: cambiar de modelo no recrea conexiones
+        st.session_state.analyzer.set_model(model)
+    st.session_state.analyzer.budget = budget
+    st.session_state.analyzer.budget_policy = budget_policy
+    st.session_state.analyzer.caller.fallback_model = fallback_model
+    st.session_state.analyzer.caller.hedge = hedge
+    st.session_state.analyzer.routing_policy = routing_policy
+    st.session_state.analyzer.similarity_threshold = similarity_threshold
+
+def cached_preflight(input_text: str, **options) -> dict:
+    """
+    Estimación previa del análisis, memorizada en la sesión: los reruns que
+    no cambian el texto ni la configuración no vuelven a tokenizarlo.
+    """
+    analyzer = st.session_state.analyzer
+    key = (
+        content_key(input_text), analyzer.model, analyzer.budget, analyzer.budget_policy,
+        analyzer.routing_policy, analyzer.quality_floor, tuple(sorted(options.items()))
+    )
+    if st.session_state.preflight is None or st.session_state.preflight[0] != key:
+        st.session_state.preflight = (key, analyzer.preflight(input_text, **options))
+    return st.session_state.preflight[1]
 
 # ============================================================================
 # SIDEBAR
@@ -111,6 +155,19 @@ with st.sidebar:
         index=0
     )
     selected_model = model_options[selected_model_name]
+    auto_route = st.checkbox(
+        "🧭 Elegir el modelo automáticamente",
+        value=False,
+        help="Elige el modelo según el tamaño de la entrada, el tipo de datos, el modo y el historial de latencia y coste"
+    )
+    routing_policy = None
+    if auto_route:
+        routing_policy = st.radio(
+            "Criterio",
+            options=["cheapest", "fastest", "quality"],
+            format_func=lambda x: {"cheapest": "💲 Más barato", "fastest": "⚡ Más rápido", "quality": "🏆 Mayor calidad"}[x],
+            horizontal=True
+        )
     
     # Modo de análisis
     st.markdown("### 👤 Nivel de Experiencia")
@@ -150,6 +207,63 @@ with st.sidebar:
             step=500,
             help="Longitud máxima de la respuesta"
         )
+        if st.checkbox("Ajustar el máximo según respuestas anteriores", value=False):
+            max_tokens = None
+        structured = st.checkbox(
+            "Salida estructurada (JSON)",
+            value=False,
+            help="Los activos se extraen localmente y el modelo solo devuelve hallazgos, riesgos y "
+                 "recomendaciones en JSON: respuestas más cortas y resultados reutilizables"
+        )
+        similarity_threshold = None
+        if st.checkbox(
+            "Reutilizar análisis de escaneos casi idénticos",
+            value=False,
+            help="Si un escaneo solo difiere de otro ya analizado en fechas, latencias o unas pocas "
+                 "líneas, se reutiliza su análisis sin llamar a la API"
+        ):
+            similarity_threshold = st.slider(
+                "Similitud mínima",
+                min_value=0.7,
+                max_value=1.0,
+                value=0.9,
+                step=0.05
+            )
+        input_token_budget = st.number_input(
+            "Límite de tokens de entrada",
+            min_value=0,
+            value=0,
+            step=1000,
+            help="Si la entrada compactada lo supera, se conservan primero hosts, puertos abiertos, "
+                 "versiones y anomalías (0 = sin límite; las entradas grandes se analizan por fragmentos)"
+        ) or None
+        budget_value = st.number_input(
+            "Presupuesto por análisis (USD)",
+            min_value=0.0,
+            value=0.0,
+            step=0.05,
+            format="%.2f",
+            help="Coste máximo previsto antes de llamar a la API (0 = sin límite)"
+        )
+        budget = budget_value or None
+        budget_policy = st.radio(
+            "Si se supera el presupuesto",
+            options=["refuse", "downgrade"],
+            format_func=lambda x: "Cancelar el análisis" if x == "refuse" else "Usar un modelo más barato",
+            index=0
+        )
+        fallback_name = st.selectbox(
+            "Modelo de reserva",
+            options=["Ninguno"] + [name for name in model_options if model_options[name] != selected_model],
+            index=0,
+            help="Se usa si el modelo principal falla tras los reintentos o está temporalmente caído"
+        )
+        fallback_model = model_options.get(fallback_name)
+        hedge = st.checkbox(
+            "Duplicar peticiones lentas",
+            value=False,
+            help="Lanza una segunda petición si la primera supera el p95 de latencia (puede aumentar el coste)"
+        )
     
     st.markdown("---")
     
@@ -224,9 +338,37 @@ Nmap done: 1 IP address (1 host up) scanned in 12.34 seconds
         key="input_text_area"
     )
     
-    # Estadísticas del texto
+    # Alternativa: subir el fichero de resultados directamente
+    uploaded_file = st.file_uploader(
+        "O sube un fichero de resultados",
+        type=["txt", "xml", "gnmap", "json", "log"],
+        help="Nmap (normal, -oX, -oG), masscan, WHOIS o DNS"
+    )
+    if uploaded_file is not None:
+        # Se normaliza directamente desde el buffer en bytes (una sola decodificación)
+        input_text = normalize_text(uploaded_file.getbuffer())
+    
+    # Escaneo anterior opcional: solo se envían al modelo los cambios
+    with st.expander("🔀 Comparar con un escaneo anterior"):
+        baseline_file = st.file_uploader(
+            "Escaneo base",
+            type=["txt", "xml", "gnmap", "json", "log"],
+            help="Nmap o masscan. Se analizan solo los hosts y puertos nuevos, desaparecidos "
+                 "o con otro servicio o versión",
+            key="baseline_file"
+        )
+    baseline_text = normalize_text(baseline_file.getbuffer()) if baseline_file is not None else None
+    
+    # Estadísticas del texto (cacheadas por contenido: los reruns que no
+    # cambian el texto no vuelven a recorrerlo)
+    text_scan = None
+    scan_format = None
+    classification = None
     if input_text:
-        stats = get_text_stats(input_text)
+        text_scan = st.session_state.text_scanner.scan(input_text)
+        scan_format = detect_format(input_text)
+        classification = classify_data_type(input_text)
+        stats = text_scan.stats()
         
         st.markdown("### 📊 Estadísticas del Texto")
         
@@ -242,8 +384,38 @@ Nmap done: 1 IP address (1 host up) scanned in 12.34 seconds
         
         with stats_col3:
             st.metric("Puertos", stats['ports'])
-            detected_type = detect_data_type(input_text)
+            if scan_format:
+                detected_type = f"{scan_format.data_type} ({scan_format.name})"
+            else:
+                detected_type = f"{classification.label} ({classification.confidence:.0%})"
             st.info(f"**Tipo detectado:** {detected_type}")
+        
+        # Tokens y coste previstos antes de enviar
+        init_analyzer(selected_model, budget, budget_policy, fallback_model, hedge, routing_policy,
+                      similarity_threshold)
+        preflight = cached_preflight(
+            input_text,
+            data_type="Mixto" if data_type == "Mixto (Auto-detectar)" else data_type,
+            mode=mode,
+            max_tokens=max_tokens,
+            input_token_budget=input_token_budget,
+            structured=structured
+        )
+        preflight_col1, preflight_col2 = st.columns(2)
+        with preflight_col1:
+            st.metric(
+                "Tokens de prompt" + ("" if preflight["exact"] else " (aprox.)"),
+                f"{preflight['prompt_tokens']:,}"
+            )
+        with preflight_col2:
+            st.metric("Coste máximo previsto", f"${preflight['projected_cost']['total_cost']:.4f}")
+        if not preflight["within_budget"]:
+            if budget_policy == "downgrade":
+                st.warning("⚠️ Supera el presupuesto: se usará un modelo más barato si alguno cabe")
+            else:
+                st.warning("⚠️ El coste previsto supera el presupuesto configurado")
+        if baseline_text:
+            st.caption("🔀 Con escaneo base solo se envían los cambios: el coste real será menor")
     
     # Botón de análisis
     st.markdown("---")
@@ -290,36 +462,55 @@ with col2:
     
     elif analyze_button:
         # Validar entrada
-        is_valid, error_msg = validate_input_text(input_text)
+        is_valid, error_msg = validate_input_text(input_text, max_length=MAX_INPUT_CHARS)
         
         if not is_valid:
             st.error(format_warning_message(error_msg))
         else:
             # Inicializar analizador
-            init_analyzer(selected_model)
+            init_analyzer(selected_model, budget, budget_policy, fallback_model, hedge, routing_policy,
+                          similarity_threshold)
             
-            # Normalizar texto
-            normalized_text = normalize_text(input_text)
+            # Normalizar texto (los formatos estructurados se parsean directamente a hosts)
+            if scan_format:
+                normalized_text = parse_scan(input_text, scan_format)
+            else:
+                normalized_text = normalize_text(input_text)
             
             # Determinar tipo de datos
             final_data_type = data_type
             if data_type == "Mixto (Auto-detectar)":
-                final_data_type = detect_data_type(normalized_text)
+                final_data_type = scan_format.data_type if scan_format else classification.label
             
-            # Mostrar spinner durante el análisis
-            with st.spinner(f"🔄 Analizando con {selected_model_name}... Esto puede tomar unos segundos."):
-                result = st.session_state.analyzer.analyze(
+            # Mostrar el análisis según se genera
+            if baseline_text:
+                final_data_type = DIFF_DATA_TYPE
+                analysis_stream = st.session_state.analyzer.analyze_diff(
+                    baseline_text,
+                    normalized_text,
+                    mode=mode,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=True
+                )
+            else:
+                analysis_stream = st.session_state.analyzer.analyze(
                     input_text=normalized_text,
                     data_type=final_data_type,
                     mode=mode,
                     temperature=temperature,
-                    max_tokens=max_tokens
+                    max_tokens=max_tokens,
+                    type_scores=None if scan_format else classification.scores,
+                    stream=True,
+                    input_token_budget=input_token_budget,
+                    structured=structured
                 )
+            st.caption("🔄 Analizando con el modelo elegido por el router..." if routing_policy
+                       else f"🔄 Analizando con {selected_model_name}...")
+            st.write_stream(analysis_stream)
+            result = analysis_stream.result
             
             if result["success"]:
-                # Mostrar resultado
-                st.markdown(result["result"])
-                
                 # Mostrar metadatos
                 with st.expander("📈 Información del Análisis"):
                     metadata = result["metadata"]
@@ -330,19 +521,89 @@ with col2:
                     **Tipo de datos:** {metadata['data_type']}
                     """)
                     
+                    diff = metadata.get("diff")
+                    if diff:
+                        st.caption(
+                            f"🔀 Cambios: {diff['added_hosts']} hosts nuevos, {diff['removed_hosts']} desaparecidos, "
+                            f"{diff['opened_ports']} puertos abiertos, {diff['closed_ports']} cerrados y "
+                            f"{diff['changed_ports']} con otro servicio o versión "
+                            f"({diff['unchanged_hosts']} hosts sin cambios)"
+                        )
+                    
+                    compaction = metadata.get("compaction")
+                    if compaction and compaction["compacted_chars"] < compaction["original_chars"]:
+                        st.caption(
+                            f"🗜️ Entrada compactada de {compaction['original_chars']:,} a "
+                            f"{compaction['compacted_chars']:,} caracteres"
+                            + (f" ({compaction['dropped_lines']} líneas omitidas por presupuesto)"
+                               if compaction['dropped_lines'] else "")
+                        )
+                    
+                    routing = metadata.get("routing")
+                    if routing:
+                        st.caption(
+                            f"🧭 Router ({routing['policy']}): {routing['model']}, {routing['reason']}; "
+                            f"máximo {routing['max_tokens']} tokens"
+                        )
+                    
+                    map_reduce = metadata.get("map_reduce")
+                    if map_reduce:
+                        st.caption(
+                            f"🧩 Entrada analizada en {map_reduce['chunks']} fragmentos"
+                            + (f" ({map_reduce['failed']} con error)" if map_reduce['failed'] else "")
+                        )
+                    
+                    downgraded_from = metadata.get("preflight", {}).get("downgraded_from")
+                    if downgraded_from:
+                        st.caption(f"💸 Modelo cambiado de {downgraded_from} a {metadata['model']} por presupuesto")
+                    
+                    resilience = metadata.get("resilience", {})
+                    if resilience.get("fallback_from"):
+                        st.caption(f"🛟 {resilience['fallback_from']} no respondió; se usó {metadata['model']}")
+                    elif resilience.get("attempts", 1) > 1:
+                        st.caption(f"🔁 Completado tras {resilience['attempts']} intentos")
+                    
+                    cache_info = metadata.get("cache", {})
+                    if cache_info.get("hit"):
+                        if cache_info.get("near_duplicate"):
+                            st.info(
+                                f"♻️ Análisis reutilizado de un escaneo casi idéntico "
+                                f"({cache_info['similarity']:.0%} de similitud), sin coste de API"
+                            )
+                        else:
+                            st.info(f"♻️ Respuesta reutilizada de la caché ({cache_info['tier']}), sin coste de API")
+                    
                     st.markdown(format_tokens_usage(metadata['usage']))
                     
+                    timing = metadata.get("timing")
+                    if timing:
+                        st.markdown(
+                            f"**⏱️ Primer token:** {timing['ttft']:.2f} s · "
+                            f"**Velocidad:** {timing['tokens_per_second']:.1f} tokens/s · "
+                            f"**Total:** {timing['duration']:.1f} s"
+                        )
+                    
                     # Estimación de coste
                     cost_estimate = st.session_state.analyzer.estimate_cost(
                         metadata['usage']['prompt_tokens'],
-                        metadata['usage']['completion_tokens']
+                        metadata['usage']['completion_tokens'],
+                        metadata['model'],
+                        cached_tokens=metadata['usage'].get('cached_tokens', 0)
                     )
                     st.markdown(format_cost_estimate(cost_estimate))
                 
+                if result.get("structured"):
+                    st.download_button(
+                        "⬇️ Descargar JSON",
+                        data=json.dumps(result["structured"], ensure_ascii=False, indent=2),
+                        file_name="recon_report.json",
+                        mime="application/json"
+                    )
+                
                 # Guardar en historial
                 st.session_state.analysis_history.append({
                     "timestamp": st.session_state.analyzer.get_timestamp() if hasattr(st.session_state.analyzer, 'get_timestamp') else "N/A",
-                    "model": selected_model,
+                    "model": result["metadata"]["model"],
                     "mode": mode,
                     "data_type": final_data_type,
                     "result": result["result"]
@@ -0,0 +1,353 @@
+"""
+Almacén compacto de activos (IPs y puertos) basado en arrays.
+Permite mantener en memoria los resultados de escaneo de una organización
+completa con operaciones rápidas de unión, intersección y pertenencia.
+"""
+
+from array import array
+from bisect import bisect_left
+from heapq import merge
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .nmap_xml import NmapHost
+
+# Bytes necesarios para un bitmap de los 65536 puertos posibles
+_PORT_BITMAP_BYTES = 65536 // 8
+
+# Proporción de tamaños a partir de la cual la intersección busca por bisección
+_GALLOP_RATIO = 16
+
+
+def ip_to_int(ip: str) -> int:
+    """
+    Convierte una IPv4 en notación decimal a entero sin signo de 32 bits.
+
+    Args:
+        ip: Dirección IPv4 ("10.0.0.1")
+
+    Returns:
+        Entero equivalente
+
+    Raises:
+        ValueError: Si la dirección no es una IPv4 válida
+    """
+    parts = ip.split(".")
+    if len(parts) != 4:
+        raise ValueError(f"IPv4 no válida: {ip}")
+    value = 0
+    for part in parts:
+        octet = int(part)
+        if not 0 <= octet <= 255:
+            raise ValueError(f"IPv4 no válida: {ip}")
+        value = (value << 8) | octet
+    return value
+
+
+def int_to_ip(value: int) -> str:
+    """
+    Convierte un entero de 32 bits en una IPv4 en notación decimal.
+
+    Args:
+        value: Entero sin signo
+
+    Returns:
+        Dirección IPv4
+    """
+    return f"{value >> 24 & 255}.{value >> 16 & 255}.{value >> 8 & 255}.{value & 255}"
+
+
+def _merge_sorted(first: Iterable[int], second: Iterable[int], typecode: str = "I") -> array:
+    """
+    Unión de dos secuencias ordenadas en un único recorrido lineal, sin
+    pasar por un `set` de todos los valores.
+
+    Args:
+        first: Valores ordenados (puede haber repetidos)
+        second: Valores ordenados (puede haber repetidos)
+        typecode: Tipo del array resultante
+
+    Returns:
+        array ordenado y sin duplicados
+    """
+    result = array(typecode)
+    append = result.append
+    last = None
+    for value in merge(first, second):
+        if value != last:
+            append(value)
+            last = value
+    return result
+
+
+def _intersect_sorted(first: array, second: array, typecode: str = "I") -> array:
+    """
+    Intersección de dos arrays ordenados y sin duplicados: recorrido lineal
+    conjunto o, si uno es mucho menor, bisección del menor sobre el mayor.
+
+    Args:
+        first: Valores ordenados
+        second: Valores ordenados
+        typecode: Tipo del array resultante
+
+    Returns:
+        array ordenado con los valores comunes
+    """
+    small, large = sorted((first, second), key=len)
+    result = array(typecode)
+    if not small:
+        return result
+    append = result.append
+    if len(large) > _GALLOP_RATIO * len(small):
+        index = 0
+        size = len(large)
+        for value in small:
+            index = bisect_left(large, value, index)
+            if index == size:
+                break
+            if large[index] == value:
+                append(value)
+        return result
+
+    i = j = 0
+    size_small, size_large = len(small), len(large)
+    while i < size_small and j < size_large:
+        a, b = small[i], large[j]
+        if a == b:
+            append(a)
+            i += 1
+            j += 1
+        elif a < b:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+class IPv4Set:
+    """
+    Conjunto de IPv4 almacenado como array('I') ordenado y sin duplicados.
+
+    Las inserciones se acumulan en un buffer y se fusionan de forma perezosa,
+    por lo que añadir millones de direcciones no reordena en cada llamada.
+    """
+
+    __slots__ = ("_sorted", "_pending")
+
+    def __init__(self, ips: Iterable = ()):
+        self._sorted = array("I")
+        self._pending = array("I")
+        self.update(ips)
+
+    def add(self, ip) -> None:
+        """Añade una IP (texto o entero)."""
+        self._pending.append(ip if isinstance(ip, int) else ip_to_int(ip))
+
+    def update(self, ips: Iterable) -> None:
+        """Añade varias IPs (texto o enteros)."""
+        for ip in ips:
+            self.add(ip)
+
+    def _compact(self) -> array:
+        if self._pending:
+            self._sorted = _merge_sorted(self._sorted, sorted(self._pending))
+            self._pending = array("I")
+        return self._sorted
+
+    def __contains__(self, ip) -> bool:
+        values = self._compact()
+        value = ip if isinstance(ip, int) else ip_to_int(ip)
+        index = bisect_left(values, value)
+        return index < len(values) and values[index] == value
+
+    def __len__(self) -> int:
+        return len(self._compact())
+
+    def __iter__(self) -> Iterator[str]:
+        return (int_to_ip(value) for value in self._compact())
+
+    def values(self) -> array:
+        """Array ordenado de enteros (vista interna, no modificar)."""
+        return self._compact()
+
+    def union(self, other: "IPv4Set") -> "IPv4Set":
+        """Unión de dos conjuntos."""
+        result = IPv4Set()
+        result._sorted = _merge_sorted(self._compact(), other._compact())
+        return result
+
+    def intersection(self, other: "IPv4Set") -> "IPv4Set":
+        """Intersección de dos conjuntos."""
+        result = IPv4Set()
+        result._sorted = _intersect_sorted(self._compact(), other._compact())
+        return result
+
+    __or__ = union
+    __and__ = intersection
+
+
+class PortBitmap:
+    """
+    Conjunto de puertos (1-65535) como bitmap de 65536 bits (8 KB).
+    """
+
+    __slots__ = ("_bits",)
+
+    def __init__(self, ports: Iterable[int] = ()):
+        self._bits = bytearray(_PORT_BITMAP_BYTES)
+        for port in ports:
+            self.add(port)
+
+    def add(self, port: int) -> None:
+        """
+        Marca un puerto.
+
+        Raises:
+            ValueError: Si el puerto no está entre 0 y 65535
+        """
+        if not 0 <= port <= 65535:
+            raise ValueError(f"Puerto fuera de rango: {port}")
+        self._bits[port >> 3] |= 1 << (port & 7)
+
+    def __contains__(self, port: int) -> bool:
+        return 0 <= port <= 65535 and bool(self._bits[port >> 3] & (1 << (port & 7)))
+
+    def __iter__(self) -> Iterator[int]:
+        bits = self._bits
+        for index, byte in enumerate(bits):
+            if byte:
+                base = index << 3
+                for offset in range(8):
+                    if byte & (1 << offset):
+                        yield base + offset
+
+    def __len__(self) -> int:
+        return sum(bin(byte).count("1") for byte in self._bits if byte)
+
+    def union(self, other: "PortBitmap") -> "PortBitmap":
+        """Unión de dos bitmaps."""
+        result = PortBitmap()
+        joined = int.from_bytes(self._bits, "little") | int.from_bytes(other._bits, "little")
+        result._bits = bytearray(joined.to_bytes(_PORT_BITMAP_BYTES, "little"))
+        return result
+
+    def intersection(self, other: "PortBitmap") -> "PortBitmap":
+        """Intersección de dos bitmaps."""
+        result = PortBitmap()
+        joined = int.from_bytes(self._bits, "little") & int.from_bytes(other._bits, "little")
+        result._bits = bytearray(joined.to_bytes(_PORT_BITMAP_BYTES, "little"))
+        return result
+
+    __or__ = union
+    __and__ = intersection
+
+
+class AssetStore:
+    """
+    Almacén de activos de escaneo.
+
+    - `ips`: todas las IPv4 vistas (array('I') ordenado)
+    - `ports`: todos los puertos vistos (bitmap de 65536 bits)
+    - puertos abiertos por host como array('H') ordenado
+    """
+
+    def __init__(self):
+        self.ips = IPv4Set()
+        self.ports = PortBitmap()
+        self._host_ports: Dict[int, array] = {}
+
+    def add_ips(self, ips: Iterable[str]) -> None:
+        """Añade IPs sin puertos asociados."""
+        self.ips.update(ips)
+
+    def add_ports(self, ports: Iterable[int], ip: Optional[str] = None) -> None:
+        """
+        Añade puertos, opcionalmente asociados a un host.
+
+        Args:
+            ports: Números de puerto
+            ip: IPv4 del host al que pertenecen (opcional)
+        """
+        ports = sorted(port for port in ports if 1 <= port <= 65535)
+        for port in ports:
+            self.ports.add(port)
+        if ip is None:
+            return
+
+        key = ip_to_int(ip)
+        self.ips.add(key)
+        self._host_ports[key] = _merge_sorted(self._host_ports.get(key, ()), ports, "H")
+
+    def add_host(self, host: NmapHost, open_only: bool = True) -> None:
+        """
+        Añade un host parseado (Nmap XML/grepable, masscan).
+
+        Args:
+            host: Registro del host
+            open_only: Guardar solo puertos abiertos
+        """
+        try:
+            ip_to_int(host.address)
+        except ValueError:
+            # Direcciones no IPv4 (IPv6, MAC) no caben en este almacén
+            return
+        ports = [
+            port.portid for port in host.ports
+            if not open_only or port.state in ("open", "open|filtered")
+        ]
+        self.add_ports(ports, host.address)
+
+    def add_hosts(self, hosts: Iterable[NmapHost], open_only: bool = True) -> None:
+        """Añade varios hosts parseados."""
+        for host in hosts:
+            self.add_host(host, open_only)
+
+    def host_ports(self, ip: str) -> List[int]:
+        """Puertos abiertos registrados para un host."""
+        return list(self._host_ports.get(ip_to_int(ip), ()))
+
+    def hosts_with_port(self, port: int) -> List[str]:
+        """Hosts que tienen abierto un puerto concreto."""
+        result = []
+        for key, ports in self._host_ports.items():
+            index = bisect_left(ports, port)
+            if index < len(ports) and ports[index] == port:
+                result.append(int_to_ip(key))
+        return result
+
+    def union(self, other: "AssetStore") -> "AssetStore":
+        """Combina dos almacenes (p. ej. escaneos de distintos workers)."""
+        result = AssetStore()
+        result.ips = self.ips | other.ips
+        result.ports = self.ports | other.ports
+        result._host_ports = dict(self._host_ports)
+        for key, ports in other._host_ports.items():
+            current = result._host_ports.get(key)
+            result._host_ports[key] = array("H", ports) if current is None else _merge_sorted(current, ports, "H")
+        return result
+
+    def intersection(self, other: "AssetStore") -> "AssetStore":
+        """Activos presentes en ambos almacenes."""
+        result = AssetStore()
+        result.ips = self.ips & other.ips
+        result.ports = self.ports & other.ports
+        for key, ports in self._host_ports.items():
+            theirs = other._host_ports.get(key)
+            if theirs is not None:
+                common = _intersect_sorted(ports, theirs, "H")
+                if common:
+                    result._host_ports[key] = common
+        return result
+
+    __or__ = union
+    __and__ = intersection
+
+    def __contains__(self, ip: str) -> bool:
+        return ip in self.ips
+
+    def stats(self) -> Dict[str, int]:
+        """Número de IPs, puertos y hosts con puertos."""
+        return {
+            "ips": len(self.ips),
+            "ports": len(self.ports),
+            "hosts_with_ports": len(self._host_ports)
+        }
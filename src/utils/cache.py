@@ -0,0 +1,178 @@
+"""
+Caché de resultados del parser indexada por hash de contenido.
+Evita recalcular estadísticas en cada rerun de Streamlit y, en modo
+incremental, solo vuelve a procesar los bloques del texto que han cambiado.
+"""
+
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from .parser import TextScan, merge_scans, scan_text
+
+# Límites de los bloques definidos por contenido (caracteres)
+_MIN_BLOCK = 512
+_MAX_BLOCK = 16384
+# Corte tras una línea cuyo final cumpla crc32 & máscara == 0 (~1 de cada 32 líneas)
+_BOUNDARY_MASK = 31
+
+
+def content_key(text: str) -> str:
+    """
+    Calcula la clave de caché de un texto.
+
+    Args:
+        text: Texto a identificar
+
+    Returns:
+        Hash hexadecimal del contenido
+    """
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+class LRUCache:
+    """
+    Caché LRU segura entre hilos (las sesiones de Streamlit comparten proceso).
+    """
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Devuelve el valor y lo marca como usado recientemente."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Guarda un valor expulsando el menos usado si se supera el tamaño."""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Devuelve el valor cacheado o lo calcula y lo guarda."""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        """Vacía la caché."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def info(self) -> Dict[str, int]:
+        """Estadísticas de uso."""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
+
+
+# Caché de proceso para textos completos
+_SCAN_CACHE = LRUCache(maxsize=32)
+
+
+def cached_scan(text: str) -> TextScan:
+    """
+    `scan_text` con caché LRU por hash de contenido.
+
+    Args:
+        text: Texto a analizar
+
+    Returns:
+        TextScan (compartido: no modificar)
+    """
+    return _SCAN_CACHE.get_or_compute(content_key(text), lambda: scan_text(text))
+
+
+def split_blocks(text: str) -> List[str]:
+    """
+    Divide el texto en bloques definidos por contenido, cortados en fin de línea.
+
+    Los cortes dependen solo del contenido cercano, así que insertar o borrar
+    texto únicamente altera los bloques afectados por la edición.
+
+    Args:
+        text: Texto a dividir
+
+    Returns:
+        Lista de bloques consecutivos
+    """
+    blocks = []
+    start = 0
+    length = len(text)
+
+    while start < length:
+        cut = length
+        newline = text.find("\n", start + _MIN_BLOCK)
+        while newline != -1 and newline - start < _MAX_BLOCK:
+            tail = text[max(newline - 32, start):newline]
+            if zlib.crc32(tail.encode("utf-8", "surrogatepass")) & _BOUNDARY_MASK == 0:
+                cut = newline + 1
+                break
+            newline = text.find("\n", newline + 1)
+        else:
+            if newline != -1:
+                cut = newline + 1
+        blocks.append(text[start:cut])
+        start = cut
+
+    return blocks
+
+
+class IncrementalScanner:
+    """
+    Escáner con memoria de bloques: tras una edición solo se vuelven a
+    procesar los bloques cuyo contenido ha cambiado.
+    """
+
+    def __init__(self, max_blocks: int = 4096):
+        self._blocks = LRUCache(maxsize=max_blocks)
+        self._last_key: Optional[str] = None
+        self._last: Optional[TextScan] = None
+
+    def scan(self, text: str) -> TextScan:
+        """
+        Analiza el texto reutilizando los bloques ya procesados.
+
+        Args:
+            text: Texto completo actual
+
+        Returns:
+            TextScan equivalente a `scan_text(text)`
+        """
+        key = content_key(text)
+        if key == self._last_key:
+            return self._last
+
+        result = _SCAN_CACHE.get(key)
+        if result is None:
+            result = merge_scans(
+                self._blocks.get_or_compute(content_key(block), lambda block=block: scan_text(block))
+                for block in split_blocks(text)
+            )
+            _SCAN_CACHE.put(key, result)
+
+        self._last_key = key
+        self._last = result
+        return result
+
+    def info(self) -> Dict[str, int]:
+        """Estadísticas de la caché de bloques."""
+        return self._blocks.info()
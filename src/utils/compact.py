@@ -0,0 +1,217 @@
+"""
+Compactación de resultados de escaneo antes de construir el prompt.
+Agrupa la repetición de baja información de la salida de Nmap (puertos
+filtrados/cerrados, hosts idénticos, texto fijo) y, si hace falta, empaqueta
+el texto en un presupuesto de tokens priorizando puertos abiertos, versiones
+y anomalías, siempre cortando por líneas completas.
+"""
+
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Línea de puerto de la salida normal de Nmap: "22/tcp open ssh OpenSSH 8.2"
+_PORT_LINE_RE = re.compile(r'^(\d{1,5})/(tcp|udp|sctp)\s+(\S+)\s+(\S+)(?:\s+(\S.*))?$')
+
+# Texto fijo de Nmap que no aporta información al análisis
+_BOILERPLATE_PREFIXES = (
+    "Service detection performed.",
+    "OS and Service detection performed.",
+    "OS detection performed.",
+    "Read data files from:",
+    "Please report any incorrect results",
+)
+
+# Líneas con prioridad máxima al empaquetar
+_ANOMALY_RE = re.compile(
+    r'VULNERABLE|CVE-\d{4}-\d+|anonymous|default (?:cred|pass)|expired|weak|self-signed'
+    r'|Warning|backdoor|unauthenticated',
+    re.IGNORECASE
+)
+_OPEN_PORT_RE = re.compile(r'^\s*\d{1,5}/(?:tcp|udp|sctp)\s+open\b')
+_HIGH_PRIORITY_PREFIXES = (
+    "Nmap scan report for", "Domain Name:", "Registrar:", "Name Server:",
+    "Registrant", "Creation Date:", "Registry Expiry Date:", "NetRange:", "CIDR:",
+    "inetnum:", "netname:", "OrgName:", "Server:", "Address:", "Name:",
+)
+_MEDIUM_PRIORITY_PREFIXES = (
+    "|", "Not shown:", "All ", "OS details:", "Running:", "Service Info:",
+    "MAC Address:", "Aggressive OS guesses:", "Device type:", "PORT",
+)
+
+
+def format_port_ranges(ports: List[int]) -> str:
+    """
+    Representa una lista de puertos como rangos ("1-19,21,23-25").
+
+    Args:
+        ports: Números de puerto (en cualquier orden)
+
+    Returns:
+        Rangos separados por comas
+    """
+    ports = sorted(set(ports))
+    ranges = []
+    index = 0
+    while index < len(ports):
+        start = end = ports[index]
+        while index + 1 < len(ports) and ports[index + 1] == end + 1:
+            index += 1
+            end = ports[index]
+        ranges.append(str(start) if start == end else f"{start}-{end}")
+        index += 1
+    return ",".join(ranges)
+
+
+def _compact_block(lines: List[str]) -> List[str]:
+    """
+    Agrupa los puertos no abiertos y sin versión de un bloque de host en una
+    línea por protocolo y estado. Los nombres de servicio de esos puertos se
+    omiten: Nmap los deduce de su tabla de puertos, no los observa.
+    """
+    output: List[str] = []
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    anchor: Optional[int] = None
+
+    for line in lines:
+        match = _PORT_LINE_RE.match(line)
+        if match and match.group(3) != "open" and not match.group(5):
+            if anchor is None:
+                anchor = len(output)
+                output.append("")
+            groups.setdefault((match.group(2), match.group(3)), []).append(int(match.group(1)))
+            continue
+        output.append(line)
+
+    if anchor is not None:
+        summary = [
+            f"{protocol} {state} ({len(ports)} puertos): {format_port_ranges(ports)}"
+            for (protocol, state), ports in groups.items()
+        ]
+        output[anchor:anchor + 1] = summary
+
+    return output
+
+
+def compact_scan_text(text: str) -> str:
+    """
+    Compacta la salida normal de Nmap sin perder puertos ni estados:
+
+    - elimina el texto fijo de Nmap ("Service detection performed...")
+    - agrupa los puertos filtrados/cerrados sin versión en rangos
+    - agrupa los hosts con exactamente el mismo resultado en un único bloque
+
+    El texto que no es salida de Nmap se devuelve sin cambios, salvo las
+    líneas de texto fijo.
+
+    Args:
+        text: Texto ya normalizado
+
+    Returns:
+        Texto compactado
+    """
+    lines = [line for line in text.split("\n") if not line.startswith(_BOILERPLATE_PREFIXES)]
+
+    # Separar preámbulo, bloques de host y líneas finales ("Nmap done")
+    preamble: List[str] = []
+    blocks: List[List[str]] = []
+    trailer: List[str] = []
+    for line in lines:
+        if line.startswith("Nmap scan report for "):
+            blocks.append([line])
+        elif line.startswith(("Nmap done", "# Nmap done")):
+            trailer.append(line)
+        elif blocks:
+            blocks[-1].append(line)
+        else:
+            preamble.append(line)
+
+    if not blocks:
+        return "\n".join(lines)
+
+    # Agrupar hosts idénticos (ignorando latencia y MAC, que varían por host)
+    groups: Dict[Tuple[str, ...], List[List[str]]] = {}
+    for block in blocks:
+        body = _compact_block(block[1:])
+        while body and not body[-1].strip():
+            body.pop()
+        signature = tuple(
+            line for line in body
+            if not line.startswith(("Host is up", "MAC Address:"))
+        )
+        groups.setdefault(signature, []).append([block[0]] + body)
+
+    output = list(preamble)
+    for signature, members in groups.items():
+        if len(members) == 1:
+            output.extend(members[0])
+        else:
+            targets = [member[0][len("Nmap scan report for "):] for member in members]
+            output.append(
+                f"Nmap scan report for {', '.join(targets)} ({len(members)} hosts con resultado idéntico)"
+            )
+            for target, member in zip(targets, members):
+                output.extend(f"{line} [{target}]" for line in member if line.startswith("MAC Address:"))
+            output.extend(signature)
+        output.append("")
+    output.extend(trailer)
+
+    return "\n".join(output).strip()
+
+
+def line_priority(line: str) -> int:
+    """
+    Prioridad de una línea al empaquetar (0 es la más importante).
+
+    Args:
+        line: Línea de texto
+
+    Returns:
+        0 para hosts, puertos abiertos, versiones y anomalías; 1 para
+        contexto de Nmap (scripts NSE, SO, resúmenes); 2 para el resto
+    """
+    stripped = line.strip()
+    if _ANOMALY_RE.search(line) or _OPEN_PORT_RE.match(line) or stripped.startswith(_HIGH_PRIORITY_PREFIXES):
+        return 0
+    if stripped.startswith(_MEDIUM_PRIORITY_PREFIXES) or _PORT_LINE_RE.match(stripped):
+        return 1
+    return 2
+
+
+def pack_text(
+    text: str,
+    max_tokens: int,
+    count_tokens: Callable[[str], int] = lambda line: len(line) // 4 + 1
+) -> Tuple[str, int]:
+    """
+    Reduce el texto a un presupuesto de tokens conservando líneas completas.
+
+    Se eligen primero las líneas de prioridad 0, después las de 1 y por
+    último las de 2 (cada nivel en orden de aparición) y se devuelven en su
+    orden original, con una nota si se ha omitido algo.
+
+    Args:
+        text: Texto a empaquetar
+        max_tokens: Presupuesto de tokens
+        count_tokens: Función que cuenta los tokens de una línea
+
+    Returns:
+        Tupla (texto empaquetado, número de líneas omitidas)
+    """
+    lines = text.split("\n")
+    costs = [count_tokens(line) for line in lines]
+    if sum(costs) <= max_tokens:
+        return text, 0
+
+    note_cost = 16
+    budget = max_tokens - note_cost
+    keep = [False] * len(lines)
+    order = sorted(range(len(lines)), key=lambda index: line_priority(lines[index]))
+    for index in order:
+        if costs[index] <= budget:
+            keep[index] = True
+            budget -= costs[index]
+
+    kept = [line for line, selected in zip(lines, keep) if selected]
+    dropped = len(lines) - len(kept)
+    kept.append(f"[... {dropped} líneas de menor prioridad omitidas ...]")
+    return "\n".join(kept), dropped
@@ -0,0 +1,269 @@
+"""
+Comparación de escaneos.
+Reduce cada escaneo a un mapa compacto host -> puertos abiertos (cada puerto
+es un entero que codifica protocolo y número, con su servicio y versión) y
+calcula con operaciones de conjuntos los hosts y puertos nuevos,
+desaparecidos y con cambios. Solo la diferencia, con un resumen breve del
+escaneo base, se envía al modelo.
+"""
+
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from .formats import extract_hosts
+from .nmap_xml import NmapHost
+
+_PROTOCOL_CODES = {"tcp": 0, "udp": 1, "sctp": 2}
+_PROTOCOL_NAMES = ["tcp", "udp", "sctp", "ip"]
+
+# (servicio, producto y versión) de un puerto abierto
+ServiceInfo = Tuple[str, str]
+
+
+def port_key(protocol: str, port: int) -> int:
+    """
+    Codifica protocolo y número de puerto en un único entero.
+
+    Args:
+        protocol: "tcp", "udp" o "sctp" (otros se agrupan como "ip")
+        port: Número de puerto
+
+    Returns:
+        Entero comparable y hashable
+    """
+    return _PROTOCOL_CODES.get(protocol.lower(), 3) << 16 | port
+
+
+def split_port_key(key: int) -> Tuple[str, int]:
+    """
+    Decodifica un entero de `port_key`.
+
+    Returns:
+        Tupla (protocolo, puerto)
+    """
+    return _PROTOCOL_NAMES[key >> 16], key & 0xFFFF
+
+
+class ScanSnapshot(NamedTuple):
+    """Estado de un escaneo: puertos abiertos y hostnames por host activo."""
+    services: Dict[str, Dict[int, ServiceInfo]]
+    hostnames: Dict[str, Tuple[str, ...]]
+
+
+class PortChange(NamedTuple):
+    """Puerto abierto que aparece, desaparece o cambia de servicio/versión."""
+    address: str
+    protocol: str
+    port: int
+    service: str
+    version: str
+    previous_service: str = ""
+    previous_version: str = ""
+
+
+class ScanDiff(NamedTuple):
+    """Diferencias entre un escaneo base y el actual."""
+    added_hosts: List[str]
+    removed_hosts: List[str]
+    opened: List[PortChange]
+    closed: List[PortChange]
+    changed: List[PortChange]
+    unchanged_hosts: int
+    baseline: ScanSnapshot
+    current: ScanSnapshot
+
+    def is_empty(self) -> bool:
+        """Indica si ambos escaneos tienen los mismos hosts y servicios."""
+        return not (self.added_hosts or self.removed_hosts or self.opened or self.closed or self.changed)
+
+    def counts(self) -> Dict[str, int]:
+        """Número de elementos de cada tipo de cambio."""
+        return {
+            "added_hosts": len(self.added_hosts),
+            "removed_hosts": len(self.removed_hosts),
+            "opened_ports": len(self.opened),
+            "closed_ports": len(self.closed),
+            "changed_ports": len(self.changed),
+            "unchanged_hosts": self.unchanged_hosts
+        }
+
+
+def snapshot_hosts(hosts: Iterable[NmapHost]) -> ScanSnapshot:
+    """
+    Reduce hosts parseados a su representación compacta.
+
+    Los hosts caídos se ignoran; un host repetido acumula sus puertos.
+
+    Args:
+        hosts: Registros de hosts
+
+    Returns:
+        ScanSnapshot con los puertos abiertos de cada host
+    """
+    services: Dict[str, Dict[int, ServiceInfo]] = {}
+    hostnames: Dict[str, Tuple[str, ...]] = {}
+    for host in hosts:
+        if host.status == "down":
+            continue
+        ports = services.setdefault(host.address, {})
+        if host.hostnames:
+            hostnames[host.address] = host.hostnames
+        for port in host.ports:
+            if port.state in ("open", "open|filtered"):
+                version = " ".join(part for part in (port.product, port.version) if part)
+                ports[port_key(port.protocol, port.portid)] = (port.service, version)
+    return ScanSnapshot(services, hostnames)
+
+
+def snapshot_text(text: str) -> ScanSnapshot:
+    """
+    Parsea un escaneo en texto (ver `utils.formats.extract_hosts`) y lo reduce.
+
+    Args:
+        text: Salida de Nmap (normal, grepable o XML) o de masscan
+
+    Returns:
+        ScanSnapshot (vacío si el texto no contiene escaneos)
+    """
+    return snapshot_hosts(extract_hosts(text))
+
+
+def _port_changes(address: str, ports: Dict[int, ServiceInfo], keys: Iterable[int]) -> List[PortChange]:
+    changes = []
+    for key in sorted(keys):
+        protocol, port = split_port_key(key)
+        service, version = ports[key]
+        changes.append(PortChange(address, protocol, port, service, version))
+    return changes
+
+
+def diff_scans(baseline: ScanSnapshot, current: ScanSnapshot) -> ScanDiff:
+    """
+    Compara dos escaneos.
+
+    Los puertos de los hosts nuevos o desaparecidos se cuentan como abiertos
+    o cerrados; un puerto con otro servicio o versión se cuenta como cambiado.
+
+    Args:
+        baseline: Escaneo de referencia
+        current: Escaneo más reciente
+
+    Returns:
+        ScanDiff con los cambios ordenados por host y puerto
+    """
+    old_hosts = baseline.services.keys()
+    new_hosts = current.services.keys()
+
+    opened: List[PortChange] = []
+    closed: List[PortChange] = []
+    changed: List[PortChange] = []
+    unchanged = 0
+
+    added = sorted(new_hosts - old_hosts)
+    removed = sorted(old_hosts - new_hosts)
+    for address in added:
+        opened.extend(_port_changes(address, current.services[address], current.services[address]))
+    for address in removed:
+        closed.extend(_port_changes(address, baseline.services[address], baseline.services[address]))
+
+    for address in sorted(old_hosts & new_hosts):
+        before = baseline.services[address]
+        after = current.services[address]
+        if before == after:
+            unchanged += 1
+            continue
+        opened.extend(_port_changes(address, after, after.keys() - before.keys()))
+        closed.extend(_port_changes(address, before, before.keys() - after.keys()))
+        for key in sorted(before.keys() & after.keys()):
+            if before[key] != after[key]:
+                protocol, port = split_port_key(key)
+                changed.append(PortChange(
+                    address, protocol, port, after[key][0], after[key][1], before[key][0], before[key][1]
+                ))
+
+    return ScanDiff(added, removed, opened, closed, changed, unchanged, baseline, current)
+
+
+def summarize_snapshot(snapshot: ScanSnapshot, top: int = 8) -> str:
+    """
+    Resumen de una línea de un escaneo.
+
+    Args:
+        snapshot: Escaneo
+        top: Servicios más frecuentes a mencionar
+
+    Returns:
+        Texto con hosts, puertos abiertos y servicios más comunes
+    """
+    total_ports = sum(len(ports) for ports in snapshot.services.values())
+    counter = Counter(
+        service or f"{split_port_key(key)[1]}/{split_port_key(key)[0]}"
+        for ports in snapshot.services.values()
+        for key, (service, _) in ports.items()
+    )
+    summary = f"{len(snapshot.services)} hosts activos, {total_ports} puertos abiertos"
+    if counter:
+        summary += "; servicios más comunes: " + ", ".join(
+            f"{service} ({count})" for service, count in counter.most_common(top)
+        )
+    return summary
+
+
+def _host_label(address: str, snapshot: ScanSnapshot) -> str:
+    names = snapshot.hostnames.get(address)
+    return f"{address} ({', '.join(names)})" if names else address
+
+
+def _service_label(service: str, version: str) -> str:
+    return " ".join(part for part in (service, version) if part) or "?"
+
+
+def format_diff(diff: ScanDiff) -> str:
+    """
+    Representa las diferencias de forma compacta para el prompt: resumen
+    del escaneo base y del actual seguido de una línea por cambio
+    (`+` nuevo, `-` desaparecido, `~` cambiado).
+
+    Args:
+        diff: Resultado de `diff_scans`
+
+    Returns:
+        Texto de la comparación
+    """
+    lines = [
+        f"ESCANEO BASE: {summarize_snapshot(diff.baseline)}",
+        f"ESCANEO ACTUAL: {summarize_snapshot(diff.current)}",
+        f"HOSTS SIN CAMBIOS: {diff.unchanged_hosts}"
+    ]
+
+    def section(title: str, entries: List[str]) -> None:
+        if entries:
+            lines.append("")
+            lines.append(f"{title} ({len(entries)}):")
+            lines.extend(entries)
+
+    new_hosts = set(diff.added_hosts)
+    gone_hosts = set(diff.removed_hosts)
+    section("HOSTS NUEVOS", [f"+ {_host_label(address, diff.current)}" for address in diff.added_hosts])
+    section("HOSTS DESAPARECIDOS", [f"- {_host_label(address, diff.baseline)}" for address in diff.removed_hosts])
+    section("PUERTOS ABIERTOS", [
+        f"+ {change.address} {change.port}/{change.protocol} {_service_label(change.service, change.version)}"
+        + (" (host nuevo)" if change.address in new_hosts else "")
+        for change in diff.opened
+    ])
+    section("PUERTOS CERRADOS", [
+        f"- {change.address} {change.port}/{change.protocol} {_service_label(change.service, change.version)}"
+        + (" (host desaparecido)" if change.address in gone_hosts else "")
+        for change in diff.closed
+    ])
+    section("CAMBIOS DE SERVICIO O VERSIÓN", [
+        f"~ {change.address} {change.port}/{change.protocol} "
+        + (
+            f"{change.service}: {change.previous_version or '?'} -> {change.version or '?'}"
+            if change.service == change.previous_service else
+            f"{_service_label(change.previous_service, change.previous_version)} -> "
+            f"{_service_label(change.service, change.version)}"
+        )
+        for change in diff.changed
+    ])
+    return "\n".join(lines)
@@ -0,0 +1,392 @@
+"""
+Registro de formatos de escaneo estructurados.
+Detecta y parsea salidas de Nmap (XML y grepable) y masscan (lista y JSON)
+conservando la asociación host↔puerto. La salida normal de Nmap también se
+puede parsear para extraer hechos, aunque no se registra como formato.
+"""
+
+import io
+import json
+import re
+from typing import IO, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from .nmap_xml import NmapHost, NmapPort, is_nmap_xml, iter_nmap_xml
+
+
+class ScanFormat(NamedTuple):
+    """Formato registrado: detector sobre el inicio del texto y parser por líneas."""
+    name: str
+    data_type: str
+    detect: Callable[[str], bool]
+    parse: Callable[[IO[str]], Iterator[NmapHost]]
+
+
+# Formatos registrados, en orden de prioridad de detección
+FORMAT_REGISTRY: Dict[str, ScanFormat] = {}
+
+# Caracteres del inicio del texto que examinan los detectores
+DETECT_SAMPLE = 4096
+
+
+def register_format(name: str, data_type: str, detect: Callable[[str], bool]):
+    """
+    Decorador que registra un parser de formato.
+
+    Args:
+        name: Identificador del formato
+        data_type: Tipo de datos asociado ("Nmap", ...)
+        detect: Función que recibe el inicio del texto y devuelve True si lo reconoce
+
+    Returns:
+        Decorador que deja el parser intacto
+    """
+    def decorator(parse: Callable[[IO[str]], Iterator[NmapHost]]):
+        FORMAT_REGISTRY[name] = ScanFormat(name, data_type, detect, parse)
+        return parse
+    return decorator
+
+
+def detect_format(text: str) -> Optional[ScanFormat]:
+    """
+    Detecta si el texto corresponde a un formato estructurado registrado.
+
+    Args:
+        text: Texto a analizar
+
+    Returns:
+        ScanFormat reconocido o None si es texto libre
+    """
+    sample = text[:DETECT_SAMPLE]
+    for scan_format in FORMAT_REGISTRY.values():
+        if scan_format.detect(sample):
+            return scan_format
+    return None
+
+
+def parse_scan(text: str, scan_format: Optional[ScanFormat] = None) -> Iterator[NmapHost]:
+    """
+    Parsea un texto con el formato indicado o detectado.
+
+    Args:
+        text: Texto completo
+        scan_format: Formato a usar (se detecta si no se indica)
+
+    Returns:
+        Iterador de NmapHost (vacío si el formato no se reconoce)
+    """
+    scan_format = scan_format or detect_format(text)
+    if scan_format is None:
+        return iter(())
+    return scan_format.parse(io.StringIO(text))
+
+
+# ============================================================================
+# Nmap XML (-oX)
+# ============================================================================
+
+register_format("nmap-xml", "Nmap", is_nmap_xml)(iter_nmap_xml)
+
+
+# ============================================================================
+# Nmap grepable (-oG)
+# ============================================================================
+
+def _is_nmap_grepable(sample: str) -> bool:
+    for line in sample.splitlines():
+        if line.startswith("# Nmap") and "-oG" in line:
+            return True
+        if line.startswith("Host: ") and ("\tPorts: " in line or "\tStatus: " in line):
+            return True
+    return False
+
+
+def _parse_grepable_ports(field: str) -> List[NmapPort]:
+    """
+    Parsea el campo "Ports:" (port/state/proto/owner/service/rpc/version/).
+    """
+    ports = []
+    for entry in field.split(", "):
+        parts = entry.split("/")
+        if len(parts) < 7 or not parts[0].isdigit():
+            continue
+        ports.append(NmapPort(
+            protocol=parts[2],
+            portid=int(parts[0]),
+            state=parts[1],
+            service=parts[4],
+            product=parts[6]
+        ))
+    return ports
+
+
+@register_format("nmap-grepable", "Nmap", _is_nmap_grepable)
+def parse_nmap_grepable(lines: Iterable[str]) -> Iterator[NmapHost]:
+    """
+    Parsea salida grepable de Nmap línea a línea.
+
+    Las líneas "Status" y "Ports" consecutivas del mismo host se fusionan
+    en un único registro.
+
+    Args:
+        lines: Líneas de la salida (un fichero abierto sirve)
+
+    Returns:
+        Iterador de NmapHost
+    """
+    current: Optional[NmapHost] = None
+
+    for line in lines:
+        if not line.startswith("Host: "):
+            continue
+
+        fields = line.rstrip("\r\n").split("\t")
+        head = fields[0][6:]
+        address, _, rest = head.partition(" ")
+        hostname = rest.strip("()")
+
+        if current is not None and current.address != address:
+            yield current
+            current = None
+        if current is None:
+            current = NmapHost(address=address, hostnames=(hostname,) if hostname else ())
+
+        for field in fields[1:]:
+            key, _, value = field.partition(": ")
+            if key == "Status":
+                current = current._replace(status=value.lower())
+            elif key == "Ports":
+                current = current._replace(ports=current.ports + tuple(_parse_grepable_ports(value)))
+            elif key == "OS":
+                current = current._replace(os_guesses=((value, 0),))
+
+    if current is not None:
+        yield current
+
+
+# ============================================================================
+# masscan lista (-oL)
+# ============================================================================
+
+def _is_masscan_list(sample: str) -> bool:
+    for line in sample.splitlines():
+        if not line:
+            continue
+        if line.startswith("#masscan"):
+            return True
+        parts = line.split()
+        return len(parts) >= 4 and parts[0] in ("open", "closed", "banner") and parts[2].isdigit()
+    return False
+
+
+@register_format("masscan-list", "Nmap", _is_masscan_list)
+def parse_masscan_list(lines: Iterable[str]) -> Iterator[NmapHost]:
+    """
+    Parsea la salida en lista de masscan ("open tcp 80 10.0.0.1 1700000000").
+
+    masscan no agrupa por host, así que los puertos se acumulan por IP y los
+    hosts se emiten al final en orden de primera aparición.
+
+    Args:
+        lines: Líneas de la salida (un fichero abierto sirve)
+
+    Returns:
+        Iterador de NmapHost
+    """
+    # Estado mínimo por host: {(protocolo, puerto): estado}; los banners aparte
+    hosts: Dict[str, Dict[tuple, str]] = {}
+    banners: Dict[tuple, tuple] = {}
+
+    for line in lines:
+        parts = line.split(" ", 5)
+        if len(parts) < 4 or line[0] == "#":
+            continue
+
+        status = parts[0]
+        key = (parts[1], parts[2])
+        ports = hosts.get(parts[3])
+        if ports is None:
+            ports = hosts[parts[3]] = {}
+
+        if status == "banner":
+            if len(parts) > 5:
+                service, _, banner = parts[5].partition(" ")
+                banners[(parts[3],) + key] = (service, banner.strip())
+            continue
+
+        ports[key] = status
+
+    for address, ports in hosts.items():
+        records = []
+        for (protocol, port), status in ports.items():
+            service, banner = banners.get((address, protocol, port), ("", ""))
+            records.append(NmapPort(protocol, int(port), status, service, banner))
+        yield NmapHost(address=address, status="up", ports=tuple(records))
+
+
+# ============================================================================
+# masscan JSON (-oJ)
+# ============================================================================
+
+def _is_masscan_json(sample: str) -> bool:
+    head = sample.lstrip()
+    return head[:1] in ("[", "{") and '"ip"' in head and '"ports"' in head
+
+
+# Restos que masscan deja al final del JSON: el objeto `{finished: 1}` de
+# versiones antiguas y la coma tras el último registro
+_MASSCAN_FINISHED_RE = re.compile(r',?\s*\{\s*"?finished"?\s*:\s*1\s*\}')
+_TRAILING_COMMA_RE = re.compile(r',\s*(?=\]|$)')
+
+
+def _load_masscan_document(text: str) -> List[dict]:
+    """
+    Carga como un único documento un JSON de masscan que no sigue el formato
+    de un objeto por línea (p. ej. reindentado con `jq` o un editor).
+
+    Args:
+        text: Documento completo
+
+    Returns:
+        Registros del documento (lista vacía si no es JSON válido)
+    """
+    text = _TRAILING_COMMA_RE.sub("", _MASSCAN_FINISHED_RE.sub("", text.strip()))
+    if text.startswith("[") and not text.endswith("]"):
+        text += "]"
+    try:
+        document = json.loads(text)
+    except ValueError:
+        return []
+    records = document if isinstance(document, list) else [document]
+    return [record for record in records if isinstance(record, dict) and "ip" in record]
+
+
+def _add_masscan_record(hosts: Dict[str, Dict[tuple, NmapPort]], record: dict) -> None:
+    ports = hosts.setdefault(record.get("ip", ""), {})
+    for entry in record.get("ports", ()):
+        key = (entry.get("proto", ""), entry.get("port", 0))
+        service = entry.get("service") or {}
+        previous = ports.get(key)
+        ports[key] = NmapPort(
+            protocol=key[0],
+            portid=int(key[1]),
+            state=entry.get("status", previous.state if previous else "open"),
+            service=service.get("name", previous.service if previous else ""),
+            product=service.get("banner", previous.product if previous else "")
+        )
+
+
+@register_format("masscan-json", "Nmap", _is_masscan_json)
+def parse_masscan_json(lines: Iterable[str]) -> Iterator[NmapHost]:
+    """
+    Parsea la salida JSON de masscan, que escribe un objeto por línea.
+
+    Si ninguna línea es un registro completo (JSON reindentado), se parsea el
+    documento entero quitando la coma final y el `{finished: 1}` de cierre.
+
+    Args:
+        lines: Líneas de la salida (un fichero abierto sirve)
+
+    Returns:
+        Iterador de NmapHost
+    """
+    hosts: Dict[str, Dict[tuple, NmapPort]] = {}
+    # Líneas guardadas hasta encontrar el primer registro por línea
+    document: Optional[List[str]] = []
+
+    for line in lines:
+        if document is not None:
+            document.append(line.rstrip("\n"))
+        line = line.strip().rstrip(",")
+        if not line.startswith("{"):
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if not isinstance(record, dict) or "ip" not in record:
+            continue
+        document = None
+        _add_masscan_record(hosts, record)
+
+    if document is not None:
+        for record in _load_masscan_document("\n".join(document)):
+            _add_masscan_record(hosts, record)
+
+    for address, ports in hosts.items():
+        yield NmapHost(address=address, status="up", ports=tuple(ports.values()))
+
+
+# ============================================================================
+# Nmap salida normal (-oN)
+# ============================================================================
+# No se registra en FORMAT_REGISTRY: la salida normal se envía como texto al
+# modelo (conserva scripts NSE y avisos); este parser solo extrae los hechos.
+
+_NORMAL_PORT_RE = re.compile(r'^(\d{1,5})/(tcp|udp|sctp)\s+(\S+)\s+(\S+)(?:\s+(\S.*))?$')
+
+
+def parse_nmap_normal(lines: Iterable[str]) -> Iterator[NmapHost]:
+    """
+    Parsea la salida normal de Nmap ("Nmap scan report for ...").
+
+    La columna VERSION se guarda completa en `product`.
+
+    Args:
+        lines: Líneas de la salida (un fichero abierto sirve)
+
+    Returns:
+        Iterador de NmapHost
+    """
+    current: Optional[NmapHost] = None
+    ports: List[NmapPort] = []
+
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line.startswith("Nmap scan report for "):
+            if current is not None:
+                yield current._replace(ports=tuple(ports))
+            target = line[len("Nmap scan report for "):].strip()
+            name, _, address = target.partition(" (")
+            if address:
+                current = NmapHost(address=address.rstrip(")"), hostnames=(name,))
+            else:
+                current = NmapHost(address=name)
+            ports = []
+            continue
+        if current is None:
+            continue
+
+        match = _NORMAL_PORT_RE.match(line.strip())
+        if match:
+            service = match.group(4)
+            ports.append(NmapPort(
+                protocol=match.group(2),
+                portid=int(match.group(1)),
+                state=match.group(3),
+                service="" if service == "unknown" else service,
+                product=(match.group(5) or "").strip()
+            ))
+        elif line.startswith("Host is up"):
+            current = current._replace(status="up")
+        elif line.startswith("OS details: "):
+            current = current._replace(os_guesses=((line[len("OS details: "):].strip(), 0),))
+
+    if current is not None:
+        yield current._replace(ports=tuple(ports))
+
+
+def extract_hosts(text: str) -> List[NmapHost]:
+    """
+    Extrae hosts y puertos de cualquier salida de escaneo conocida: los
+    formatos registrados y la salida normal de Nmap.
+
+    Args:
+        text: Texto completo
+
+    Returns:
+        Lista de NmapHost (vacía si el texto no contiene escaneos)
+    """
+    scan_format = detect_format(text)
+    if scan_format is not None:
+        return list(parse_scan(text, scan_format))
+    return list(parse_nmap_normal(io.StringIO(text)))
@@ -91,10 +91,12 @@ def format_tokens_usage(usage: Dict[str, int]) -> str:
     prompt_tokens = usage.get("prompt_tokens", 0)
     completion_tokens = usage.get("completion_tokens", 0)
     total_tokens = usage.get("total_tokens", 0)
+    cached_tokens = usage.get("cached_tokens", 0)
+    cached = f" ({cached_tokens:,} desde caché)" if cached_tokens else ""
     
     return f"""
 **Uso de Tokens:**
-- Entrada: {prompt_tokens:,} tokens
+- Entrada: {prompt_tokens:,} tokens{cached}
 - Salida: {completion_tokens:,} tokens
 - Total: {total_tokens:,} tokens
 """
@@ -0,0 +1,209 @@
+"""
+Extracción de direcciones IPv4/IPv6 y rangos CIDR, e índice de prefijos.
+El índice es un árbol radix binario con búsqueda de prefijo más largo, útil
+para comprobar contra qué rango del alcance (scope) cae cada host.
+"""
+
+import ipaddress
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from .parser import IPV4_PATTERN
+
+IPNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+AddressLike = Union[str, int, ipaddress.IPv4Address, ipaddress.IPv6Address]
+
+# IPv4 con prefijo opcional, o candidato IPv6 (se valida después con ipaddress)
+_NETWORK_RE = re.compile(
+    rf'(?P<v4>{IPV4_PATTERN}(?:/(?:3[0-2]|[12]?\d)\b)?)'
+    r'|(?P<v6>(?<![\w:.])(?:[0-9a-fA-F]{0,4}:){2,7}'
+    r'(?:\d{1,3}(?:\.\d{1,3}){3}|[0-9a-fA-F]{1,4})?'
+    r'(?:/(?:12[0-8]|1[01]\d|[1-9]?\d))?(?![\w:]))'
+)
+
+
+def extract_networks(text: str) -> List[IPNetwork]:
+    """
+    Extrae IPv4, IPv6 y rangos CIDR del texto.
+
+    Las direcciones sueltas se devuelven como redes /32 o /128; los CIDR con
+    bits de host se normalizan a su red ("10.0.0.7/24" -> 10.0.0.0/24).
+
+    Args:
+        text: Texto a analizar
+
+    Returns:
+        Lista de redes sin duplicados, en orden de aparición
+    """
+    found: Dict[IPNetwork, None] = {}
+
+    for match in _NETWORK_RE.finditer(text):
+        candidate = match.group()
+        if match.lastgroup == "v6" and not candidate.strip(":"):
+            continue
+        try:
+            network = ipaddress.ip_network(candidate, strict=False)
+        except ValueError:
+            # Horas, MACs y similares que parecen IPv6 pero no lo son
+            continue
+        found[network] = None
+
+    return list(found)
+
+
+def aggregate_networks(networks: Iterable[Union[str, IPNetwork]]) -> List[IPNetwork]:
+    """
+    Agrupa direcciones y rangos adyacentes o solapados en el mínimo de CIDRs.
+
+    Args:
+        networks: Direcciones o redes (texto u objetos ipaddress)
+
+    Returns:
+        Redes agregadas, primero IPv4 y luego IPv6
+    """
+    by_version: Dict[int, List[IPNetwork]] = {4: [], 6: []}
+    for network in networks:
+        network = ipaddress.ip_network(network, strict=False)
+        by_version[network.version].append(network)
+
+    aggregated: List[IPNetwork] = []
+    for version in (4, 6):
+        aggregated.extend(ipaddress.collapse_addresses(by_version[version]))
+    return aggregated
+
+
+def _to_int(address: AddressLike) -> Tuple[int, int]:
+    """
+    Convierte una dirección a (versión, entero).
+    """
+    if isinstance(address, str):
+        address = ipaddress.ip_address(address.split("%", 1)[0])
+    elif isinstance(address, int):
+        address = ipaddress.ip_address(address)
+    return address.version, int(address)
+
+
+class PrefixTree:
+    """
+    Árbol radix binario de prefijos IPv4/IPv6 con búsqueda de prefijo más largo.
+
+    Cada búsqueda recorre como mucho 32 (IPv4) o 128 (IPv6) nodos, de modo que
+    el coste no depende del número de prefijos cargados.
+    """
+
+    _WIDTH = {4: 32, 6: 128}
+
+    def __init__(self, prefixes: Iterable = ()):
+        # Nodo: [hijo_0, hijo_1, (red, valor) o None]
+        self._roots = {4: [None, None, None], 6: [None, None, None]}
+        self._size = 0
+        for prefix in prefixes:
+            if isinstance(prefix, tuple):
+                self.insert(*prefix)
+            else:
+                self.insert(prefix)
+
+    def insert(self, prefix: Union[str, IPNetwork], value: Any = None) -> None:
+        """
+        Inserta un prefijo con un valor asociado (p. ej. el nombre del scope).
+
+        Args:
+            prefix: Red en notación CIDR o dirección suelta
+            value: Valor asociado al prefijo
+        """
+        network = ipaddress.ip_network(prefix, strict=False)
+        width = self._WIDTH[network.version]
+        bits = int(network.network_address)
+        node = self._roots[network.version]
+
+        for depth in range(network.prefixlen):
+            bit = (bits >> (width - 1 - depth)) & 1
+            child = node[bit]
+            if child is None:
+                child = node[bit] = [None, None, None]
+            node = child
+
+        if node[2] is None:
+            self._size += 1
+        node[2] = (network, value)
+
+    def _walk(self, address: AddressLike) -> List[Tuple[IPNetwork, Any]]:
+        version, bits = _to_int(address)
+        width = self._WIDTH[version]
+        node = self._roots[version]
+        matches = []
+
+        for depth in range(width + 1):
+            if node[2] is not None:
+                matches.append(node[2])
+            if depth == width:
+                break
+            node = node[(bits >> (width - 1 - depth)) & 1]
+            if node is None:
+                break
+
+        return matches
+
+    def longest_match(self, address: AddressLike) -> Optional[Tuple[IPNetwork, Any]]:
+        """
+        Devuelve el prefijo más específico que contiene la dirección.
+
+        Args:
+            address: Dirección IPv4/IPv6
+
+        Returns:
+            Tupla (red, valor) o None si ningún prefijo la contiene
+        """
+        matches = self._walk(address)
+        return matches[-1] if matches else None
+
+    def covering(self, address: AddressLike) -> List[Tuple[IPNetwork, Any]]:
+        """
+        Devuelve todos los prefijos que contienen la dirección, del más amplio
+        al más específico.
+        """
+        return self._walk(address)
+
+    def __contains__(self, address: AddressLike) -> bool:
+        return bool(self._walk(address))
+
+    def __len__(self) -> int:
+        return self._size
+
+    def prefixes(self) -> List[IPNetwork]:
+        """Prefijos almacenados."""
+        result = []
+        stack = list(self._roots.values())
+        while stack:
+            node = stack.pop()
+            if node[2] is not None:
+                result.append(node[2][0])
+            stack.extend(child for child in node[:2] if child is not None)
+        return sorted(result, key=lambda network: (network.version, network))
+
+    def aggregate(self) -> List[IPNetwork]:
+        """Prefijos almacenados agregados en el mínimo de CIDRs."""
+        return aggregate_networks(self.prefixes())
+
+    def partition(self, addresses: Iterable[AddressLike]) -> Tuple[Dict[Any, List[AddressLike]], List[AddressLike]]:
+        """
+        Reparte direcciones por el valor de su prefijo más específico.
+
+        Args:
+            addresses: Direcciones a clasificar
+
+        Returns:
+            Tupla (direcciones por valor de scope, direcciones fuera de scope)
+        """
+        in_scope: Dict[Any, List[AddressLike]] = {}
+        out_of_scope: List[AddressLike] = []
+
+        for address in addresses:
+            match = self.longest_match(address)
+            if match is None:
+                out_of_scope.append(address)
+            else:
+                key = match[1] if match[1] is not None else match[0]
+                in_scope.setdefault(key, []).append(address)
+
+        return in_scope, out_of_scope
@@ -0,0 +1,166 @@
+"""
+Módulo de lectura incremental de salidas XML de Nmap (-oX).
+Produce registros compactos de hosts y puertos sin cargar el documento completo.
+"""
+
+import io
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import IO, Iterable, Iterator, NamedTuple, Optional, Tuple, Union
+
+
+class NmapPort(NamedTuple):
+    """Puerto de un host tal y como lo reporta Nmap."""
+    protocol: str
+    portid: int
+    state: str
+    service: str = ""
+    product: str = ""
+    version: str = ""
+
+
+class NmapHost(NamedTuple):
+    """Host escaneado con sus puertos y estimaciones de sistema operativo."""
+    address: str
+    hostnames: Tuple[str, ...] = ()
+    status: str = ""
+    ports: Tuple[NmapPort, ...] = ()
+    os_guesses: Tuple[Tuple[str, int], ...] = ()
+
+
+def is_nmap_xml(text: str) -> bool:
+    """
+    Indica si el texto parece una salida XML de Nmap.
+
+    Args:
+        text: Texto a comprobar
+
+    Returns:
+        True si contiene la raíz <nmaprun>
+    """
+    head = text[:2048].lstrip()
+    return head.startswith("<") and "<nmaprun" in head
+
+
+def _build_host(element: ET.Element) -> NmapHost:
+    """
+    Convierte un elemento <host> en un NmapHost.
+    """
+    address = ""
+    for addr in element.iterfind("address"):
+        if addr.get("addrtype") in ("ipv4", "ipv6"):
+            address = addr.get("addr", "")
+            break
+        if not address:
+            address = addr.get("addr", "")
+
+    status_el = element.find("status")
+    status = status_el.get("state", "") if status_el is not None else ""
+
+    hostnames = tuple(
+        name.get("name", "")
+        for name in element.iterfind("hostnames/hostname")
+        if name.get("name")
+    )
+
+    ports = []
+    for port in element.iterfind("ports/port"):
+        state_el = port.find("state")
+        service_el = port.find("service")
+        ports.append(NmapPort(
+            protocol=port.get("protocol", ""),
+            portid=int(port.get("portid", 0)),
+            state=state_el.get("state", "") if state_el is not None else "",
+            service=service_el.get("name", "") if service_el is not None else "",
+            product=service_el.get("product", "") if service_el is not None else "",
+            version=service_el.get("version", "") if service_el is not None else ""
+        ))
+
+    os_guesses = tuple(
+        (match.get("name", ""), int(match.get("accuracy", 0)))
+        for match in element.iterfind("os/osmatch")
+    )
+
+    return NmapHost(
+        address=address,
+        hostnames=tuple(dict.fromkeys(hostnames)),
+        status=status,
+        ports=tuple(ports),
+        os_guesses=os_guesses
+    )
+
+
+def iter_nmap_xml(source: Union[str, Path, IO]) -> Iterator[NmapHost]:
+    """
+    Lee un XML de Nmap de forma incremental y produce un NmapHost por host.
+
+    Cada elemento <host> se libera en cuanto se procesa, de modo que la
+    memoria se mantiene plana aunque el escaneo tenga cientos de miles de hosts.
+
+    Args:
+        source: Ruta del fichero o fichero abierto
+
+    Returns:
+        Iterador de NmapHost
+    """
+    context = ET.iterparse(source, events=("start", "end"))
+    root: Optional[ET.Element] = None
+
+    for event, element in context:
+        if event == "start":
+            if root is None:
+                root = element
+            continue
+
+        if element.tag == "host":
+            yield _build_host(element)
+            element.clear()
+            if root is not None:
+                # Soltar las referencias de la raíz a los hosts ya procesados
+                root.clear()
+
+
+def parse_nmap_xml(text: str) -> Iterator[NmapHost]:
+    """
+    Variante de `iter_nmap_xml` para XML ya cargado como texto.
+
+    Args:
+        text: Documento XML de Nmap
+
+    Returns:
+        Iterador de NmapHost
+    """
+    return iter_nmap_xml(io.BytesIO(text.encode("utf-8")))
+
+
+def format_nmap_hosts(hosts: Iterable[NmapHost], include_closed: bool = False) -> str:
+    """
+    Representa los hosts en un texto compacto apto para el prompt.
+
+    Args:
+        hosts: Registros de hosts
+        include_closed: Incluir puertos cerrados o filtrados
+
+    Returns:
+        Texto con una cabecera por host y una línea por puerto
+    """
+    lines = []
+
+    for host in hosts:
+        header = host.address
+        if host.hostnames:
+            header += f" ({', '.join(host.hostnames)})"
+        if host.status:
+            header += f" [{host.status}]"
+        if host.os_guesses:
+            name, accuracy = host.os_guesses[0]
+            header += f" OS: {name} ({accuracy}%)"
+        lines.append(header)
+
+        for port in host.ports:
+            if not include_closed and port.state not in ("open", "open|filtered"):
+                continue
+            details = " ".join(part for part in (port.service, port.product, port.version) if part)
+            lines.append(f"  {port.portid}/{port.protocol} {port.state} {details}".rstrip())
+
+    return "\n".join(lines)
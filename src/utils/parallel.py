@@ -0,0 +1,115 @@
+"""
+Parsing en paralelo con un pool de procesos.
+Reparte textos grandes (cortados en fin de línea) o lotes de ficheros entre
+varios núcleos y combina los resultados con una reducción determinista.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from .parser import TextScan, merge_scans, scan_text
+from .streaming import scan_mapped
+
+# Por debajo de este tamaño el coste del pool supera la ganancia
+PARALLEL_MIN_SIZE = 4 * 1024 * 1024
+
+# Tamaño objetivo de cada fragmento enviado a un worker (caracteres)
+DEFAULT_SHARD_SIZE = 2 * 1024 * 1024
+
+
+def shard_text(text: str, shard_size: int = DEFAULT_SHARD_SIZE) -> List[str]:
+    """
+    Divide el texto en fragmentos de tamaño similar cortados en fin de línea.
+
+    Args:
+        text: Texto completo
+        shard_size: Tamaño objetivo de cada fragmento
+
+    Returns:
+        Lista de fragmentos consecutivos
+    """
+    shards = []
+    start = 0
+    length = len(text)
+
+    while start < length:
+        end = start + shard_size
+        if end >= length:
+            end = length
+        else:
+            newline = text.find("\n", end)
+            end = length if newline == -1 else newline + 1
+        shards.append(text[start:end])
+        start = end
+
+    return shards
+
+
+def _default_workers(workers: Optional[int]) -> int:
+    return workers or os.cpu_count() or 1
+
+
+def parallel_scan_text(
+    text: str,
+    workers: Optional[int] = None,
+    shard_size: int = DEFAULT_SHARD_SIZE
+) -> TextScan:
+    """
+    `scan_text` repartido entre procesos para entradas grandes.
+
+    Los resultados se combinan en el orden de los fragmentos, así que el
+    resultado es idéntico al de `scan_text(text)`.
+
+    Args:
+        text: Texto a analizar
+        workers: Número de procesos (por defecto, núcleos disponibles)
+        shard_size: Tamaño objetivo de cada fragmento
+
+    Returns:
+        TextScan del texto completo
+    """
+    workers = _default_workers(workers)
+    if workers == 1 or len(text) < PARALLEL_MIN_SIZE:
+        return scan_text(text)
+
+    shards = shard_text(text, shard_size)
+    with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as pool:
+        return merge_scans(pool.map(scan_text, shards))
+
+
+def _scan_file(path: Union[str, Path]) -> TextScan:
+    return scan_mapped(path)
+
+
+def parallel_scan_files(
+    paths: Iterable[Union[str, Path]],
+    workers: Optional[int] = None
+) -> Tuple[Dict[str, TextScan], TextScan]:
+    """
+    Analiza un lote de ficheros en paralelo (un fichero por tarea).
+
+    Cada worker mapea su fichero en memoria, así que la memoria por proceso
+    está acotada aunque los ficheros sean grandes.
+
+    Args:
+        paths: Rutas de los ficheros
+        workers: Número de procesos (por defecto, núcleos disponibles)
+
+    Returns:
+        Tupla (resultado por fichero, resultado combinado de todo el lote)
+    """
+    paths = [str(path) for path in paths]
+    if not paths:
+        return {}, TextScan()
+
+    workers = _default_workers(workers)
+    if workers == 1 or len(paths) == 1:
+        results = [_scan_file(path) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+            results = list(pool.map(_scan_file, paths))
+
+    per_file = dict(zip(paths, results))
+    return per_file, merge_scans(results, contiguous=False)
@@ -3,8 +3,20 @@ Módulo de parsing y procesamiento de texto.
 Funciones para limpiar, normalizar y detectar tipos de datos de reconocimiento.
 """
 
+import codecs
+import mmap
 import re
-from typing import Optional, Dict, List
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Iterable, List, Set, Union
+
+from .assets import AssetStore
+
+# Caracteres de control a eliminar (todos salvo \t, \n y \r)
+_CONTROL_CHARS = bytes([*range(0x00, 0x09), 0x0B, 0x0C, *range(0x0E, 0x20), 0x7F])
+_CONTROL_TABLE = dict.fromkeys(_CONTROL_CHARS)
+
+# Tres o más saltos de línea separados solo por espacios
+_BLANK_LINES_RE = re.compile(r'\n\s*\n\s*\n')
 
 def clean_text(text: str) -> str:
     """
@@ -20,19 +32,28 @@ def clean_text(text: str) -> str:
         return ""
     
     # Eliminar múltiples líneas en blanco
-    text = re.sub(r'\n\s*\n\s*\n', '\n\n', text)
+    text = _BLANK_LINES_RE.sub('\n\n', text)
     
     # Eliminar espacios al inicio y final
     text = text.strip()
     
     return text
 
-def normalize_text(text: str) -> str:
+def normalize_text(
+    text: Union[str, bytes, bytearray, memoryview],
+    encoding: str = "utf-8"
+) -> str:
     """
     Normaliza el texto para análisis consistente.
     
+    Cada paso se ejecuta en C y solo copia si hay algo que cambiar, en este
+    orden: CRLF a LF, borrado de caracteres de control con una tabla
+    precalculada, colapso de líneas en blanco y recorte de extremos. Acepta
+    bytes (p. ej. ficheros subidos) y los decodifica una única vez al final.
+    
     Args:
-        text: Texto a normalizar
+        text: Texto a normalizar (str o bytes)
+        encoding: Codificación si se recibe bytes
     
     Returns:
         Texto normalizado
@@ -40,52 +61,34 @@ def normalize_text(text: str) -> str:
     if not text:
         return ""
     
-    # Limpiar primero
-    text = clean_text(text)
-    
-    # Normalizar saltos de línea
-    text = text.replace('\r\n', '\n')
+    if isinstance(text, str):
+        text = text.replace('\r\n', '\n').translate(_CONTROL_TABLE)
+    else:
+        data = text if isinstance(text, bytes) else bytes(text)
+        data = data.replace(b'\r\n', b'\n').translate(None, _CONTROL_CHARS)
+        text = data.decode(encoding, errors="replace")
     
-    # Eliminar caracteres de control excepto \n y \t
-    text = re.sub(r'[\x00-\x08\x0B-\x0C\x0E-\x1F\x7F]', '', text)
-    
-    return text
+    return clean_text(text)
 
-def detect_data_type(text: str) -> str:
-    """
-    Detecta el tipo de datos de reconocimiento basándose en patrones.
-    
-    Args:
-        text: Texto a analizar
-    
-    Returns:
-        Tipo detectado: "Nmap", "WHOIS", "DNS", "Mixto"
-    """
-    if not text:
-        return "Desconocido"
-    
-    text_lower = text.lower()
-    
-    # Patrones de detección
-    nmap_patterns = [
+# Señales de detección por tipo de datos (se evalúan sobre texto en minúsculas)
+DATA_TYPE_SIGNALS: Dict[str, List[str]] = {
+    "Nmap": [
         r'nmap',
         r'starting nmap',
         r'port\s+state\s+service',
         r'\d+/tcp',
         r'\d+/udp',
         r'host is up'
-    ]
-    
-    whois_patterns = [
+    ],
+    "WHOIS": [
         r'domain name:',
         r'registrar:',
         r'registrant',
         r'creation date:',
         r'expiry date:',
         r'name server:'
-    ]
-    
-    dns_patterns = [
+    ],
+    "DNS": [
         r'nslookup',
         r'dig',
         r'answer section',
@@ -94,19 +97,100 @@ def detect_data_type(text: str) -> str:
         r'mx record',
         r'txt record'
     ]
+}
+
+# Patrones de entidades (sin el \b inicial, que el escáner maestro factoriza)
+_IPV4_BODY = r'(?:(?:25[0-5]|2[0-4]\d|[01]?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|[01]?\d?\d)\b'
+_DOMAIN_BODY = r'(?:[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?\.)+[a-zA-Z]{2,}\b'
+_PORT_BODY = r'(\d{1,5})/(?:tcp|udp)\b'
+
+IPV4_PATTERN = r'\b' + _IPV4_BODY
+DOMAIN_PATTERN = r'\b' + _DOMAIN_BODY
+PORT_PATTERN = r'\b' + _PORT_BODY
+
+_SIGNAL_LIST = [
+    (data_type, pattern)
+    for data_type, patterns in DATA_TYPE_SIGNALS.items()
+    for pattern in patterns
+]
+_SIGNAL_RES = [(data_type, pattern, re.compile(pattern)) for data_type, pattern in _SIGNAL_LIST]
+_SIGNAL_ALTERNATION = '|'.join(
+    f'(?:{pattern})' for _, pattern in sorted(_SIGNAL_LIST, key=lambda item: -len(item[1]))
+)
+
+# Escáner maestro: una única alternancia compilada que recorre el texto una sola vez.
+# Todas las ramas empiezan en inicio de palabra, de modo que las posiciones intermedias
+# se descartan con una sola comprobación. Puertos, IPs y dominios tienen prioridad
+# sobre las señales; las señales contenidas en un dominio (p. ej. "nmap.org") se
+# recuperan a posteriori. Una IP seguida de una etiqueta con letras (nombres PTR como
+# "4.3.2.1.in-addr.arpa") no se acepta como IP y la rama de dominio toma el nombre completo;
+# una IP tampoco empieza a mitad de una secuencia con puntos ("1.2.3.4.5" o un OID SNMP
+# solo dan "1.2.3.4", no "2.3.4.5").
+_SCAN_RE = re.compile(
+    r'\b(?=\w)(?:'
+    f'(?P<port>{_PORT_BODY})'
+    rf'|(?P<ip>(?<![\d.]){_IPV4_BODY}(?!\.[A-Za-z0-9-]*[A-Za-z]))'
+    f'|(?P<domain>{_DOMAIN_BODY})'
+    f'|(?P<signal>(?i:{_SIGNAL_ALTERNATION}))'
+    ')'
+)
+
+# Mismo escáner sobre bytes, para ficheros mapeados en memoria
+_SCAN_RE_BYTES = re.compile(_SCAN_RE.pattern.encode('ascii'))
+
+# Tamaño de ventana para contar palabras sin duplicar el texto completo
+_WORD_WINDOW = 1 << 20
+_ASCII_WHITESPACE = frozenset(b' \t\n\r\x0b\x0c')
+
+# En UTF-8 cada carácter tiene un único byte que no es de continuación (0x80-0xBF):
+# caracteres = bytes - continuaciones, que se cuentan borrando el resto de bytes
+_UTF8_NON_CONTINUATION = bytes(range(0x80)) + bytes(range(0xC0, 0x100))
+_SINGLE_BYTE_CODECS = frozenset({"ascii", "iso8859-1", "cp1252"})
+
+
+@dataclass
+class TextScan:
+    """
+    Resultado de un recorrido único sobre el texto de entrada.
+    """
+    characters: int = 0
+    lines: int = 0
+    words: int = 0
+    ips: List[str] = field(default_factory=list)
+    domains: List[str] = field(default_factory=list)
+    ports: List[int] = field(default_factory=list)
+    signals: Dict[str, Set[str]] = field(default_factory=dict)
+
+    @property
+    def data_type(self) -> str:
+        """Tipo de datos deducido de las señales encontradas."""
+        if not self.characters:
+            return "Desconocido"
+        counts = {data_type: len(self.signals.get(data_type, ())) for data_type in DATA_TYPE_SIGNALS}
+        return _resolve_data_type(counts)
+
+    def stats(self) -> Dict[str, int]:
+        """Estadísticas en el formato de `get_text_stats`."""
+        return {
+            "characters": self.characters,
+            "lines": self.lines,
+            "words": self.words,
+            "ips": len(self.ips),
+            "domains": len(self.domains),
+            "ports": len(self.ports)
+        }
+
+
+def _resolve_data_type(counts: Dict[str, int]) -> str:
+    """
+    Decide el tipo de datos a partir del número de señales por tipo.
     
-    # Contar coincidencias
-    nmap_count = sum(1 for pattern in nmap_patterns if re.search(pattern, text_lower))
-    whois_count = sum(1 for pattern in whois_patterns if re.search(pattern, text_lower))
-    dns_count = sum(1 for pattern in dns_patterns if re.search(pattern, text_lower))
-    
-    # Determinar tipo
-    counts = {
-        "Nmap": nmap_count,
-        "WHOIS": whois_count,
-        "DNS": dns_count
-    }
+    Args:
+        counts: Señales distintas encontradas por tipo
     
+    Returns:
+        Tipo detectado: "Nmap", "WHOIS", "DNS" o "Mixto"
+    """
     max_count = max(counts.values())
     
     if max_count == 0:
@@ -120,102 +204,388 @@ def detect_data_type(text: str) -> str:
     
     return max(counts, key=counts.get)
 
-def extract_ips(text: str) -> List[str]:
+
+def _count_words(text: str) -> int:
     """
-    Extrae direcciones IP del texto.
+    Cuenta palabras en ventanas acotadas para no materializar `text.split()` completo.
+    """
+    total = 0
+    start = 0
+    length = len(text)
+    
+    while start < length:
+        end = min(start + _WORD_WINDOW, length)
+        # Extender la ventana hasta un espacio para no partir palabras
+        while end < length and not text[end].isspace():
+            end += 1
+        total += len(text[start:end].split())
+        start = end
+    
+    return total
+
+
+def _record_signals(fragment: str, signals: Dict[str, Set[str]], memo: Dict[str, tuple]) -> None:
+    """
+    Registra todas las señales contenidas en un fragmento (memoizado por contenido).
+    """
+    key = fragment.lower()
+    found = memo.get(key)
+    if found is None:
+        found = tuple(
+            (data_type, pattern)
+            for data_type, pattern, regex in _SIGNAL_RES
+            if regex.search(key)
+        )
+        memo[key] = found
+    for data_type, pattern in found:
+        signals.setdefault(data_type, set()).add(pattern)
+
+
+def _collect_entities(matches: Iterable, binary: bool = False) -> tuple:
+    """
+    Agrega las coincidencias del escáner maestro en IPs, dominios, puertos y señales.
+    
+    Args:
+        matches: Coincidencias de `_SCAN_RE` o `_SCAN_RE_BYTES`
+        binary: True si las coincidencias son bytes (solo se decodifican los tramos)
+    
+    Returns:
+        Tupla (ips, dominios, puertos, señales)
+    """
+    ips: Dict[str, None] = {}
+    domains: Dict[str, None] = {}
+    ports: Set[int] = set()
+    signals: Dict[str, Set[str]] = {}
+    memo: Dict[str, tuple] = {}
+    
+    for match in matches:
+        kind = match.lastgroup
+        value = match.group(kind)
+        if binary:
+            value = value.decode("ascii")
+        
+        if kind == "ip":
+            ips[value] = None
+        elif kind == "port":
+            port = int(match.group(2))
+            if 1 <= port <= 65535:
+                ports.add(port)
+            if value not in memo:
+                _record_signals(value, signals, memo)
+        elif kind == "domain":
+            if value not in domains:
+                domains[value] = None
+                _record_signals(value, signals, memo)
+        else:
+            _record_signals(value, signals, memo)
+    
+    return ips, domains, ports, signals
+
+
+def scan_text(text: str, store: Optional[AssetStore] = None) -> TextScan:
+    """
+    Recorre el texto una sola vez y extrae líneas, palabras, IPs, dominios,
+    puertos y señales de tipo de datos.
     
     Args:
         text: Texto a analizar
+        store: Almacén de activos donde registrar IPs y puertos (opcional)
     
     Returns:
-        Lista de IPs encontradas
+        TextScan con todos los resultados
+    """
+    if not text:
+        return TextScan()
+    
+    ips, domains, ports, signals = _collect_entities(_SCAN_RE.finditer(text))
+    
+    if store is not None:
+        store.add_ips(ips)
+        store.add_ports(ports)
+    
+    return TextScan(
+        characters=len(text),
+        lines=text.count('\n') + 1,
+        words=_count_words(text),
+        ips=list(ips),
+        domains=list(domains),
+        ports=sorted(ports),
+        signals=signals
+    )
+
+
+def scan_buffer(
+    buffer: Union[bytes, bytearray, memoryview, mmap.mmap],
+    encoding: str = "utf-8",
+    store: Optional[AssetStore] = None
+) -> TextScan:
     """
-    # Patrón para IPv4
-    ipv4_pattern = r'\b(?:\d{1,3}\.){3}\d{1,3}\b'
+    Variante de `scan_text` que trabaja directamente sobre bytes (p. ej. un mmap).
     
-    ips = re.findall(ipv4_pattern, text)
+    El escáner maestro se ejecuta sobre los bytes con un patrón `bytes` y solo
+    se decodifican los tramos coincidentes. Los recuentos de caracteres,
+    líneas y palabras se calculan por ventanas acotadas; en UTF-8 y en las
+    codificaciones de un byte los caracteres se cuentan sin decodificar.
+    Requiere una codificación compatible con ASCII (UTF-8, Latin-1...).
     
-    # Filtrar IPs válidas (0-255 en cada octeto)
-    valid_ips = []
-    for ip in ips:
-        octets = ip.split('.')
-        if all(0 <= int(octet) <= 255 for octet in octets):
-            valid_ips.append(ip)
+    Args:
+        buffer: Datos en bytes o cualquier objeto con protocolo buffer
+        encoding: Codificación usada para contar caracteres
+        store: Almacén de activos donde registrar IPs y puertos (opcional)
     
-    # Eliminar duplicados manteniendo orden
-    return list(dict.fromkeys(valid_ips))
+    Returns:
+        TextScan con todos los resultados
+    """
+    length = len(buffer)
+    if not length:
+        return TextScan()
+    
+    ips, domains, ports, signals = _collect_entities(_SCAN_RE_BYTES.finditer(buffer), binary=True)
+    
+    codec = codecs.lookup(encoding).name
+    characters = 0
+    newlines = 0
+    words = 0
+    start = 0
+    while start < length:
+        end = min(start + _WORD_WINDOW, length)
+        # Extender la ventana hasta un espacio ASCII (nunca parte un carácter UTF-8)
+        while end < length and buffer[end] not in _ASCII_WHITESPACE:
+            end += 1
+        window = bytes(buffer[start:end])
+        if codec == "utf-8":
+            characters += len(window) - len(window.translate(None, _UTF8_NON_CONTINUATION))
+        elif codec in _SINGLE_BYTE_CODECS:
+            characters += len(window)
+        else:
+            characters += len(window.decode(encoding, errors="replace"))
+        newlines += window.count(b'\n')
+        words += len(window.split())
+        start = end
+    
+    if store is not None:
+        store.add_ips(ips)
+        store.add_ports(ports)
+    
+    return TextScan(
+        characters=characters,
+        lines=newlines + 1,
+        words=words,
+        ips=list(ips),
+        domains=list(domains),
+        ports=sorted(ports),
+        signals=signals
+    )
 
-def extract_domains(text: str) -> List[str]:
+
+def merge_scans(scans: Iterable[TextScan], contiguous: bool = True) -> TextScan:
     """
-    Extrae dominios del texto.
+    Combina resultados de fragmentos consecutivos del mismo texto.
+    
+    Los fragmentos deben estar cortados en fin de línea. La combinación es
+    determinista: el orden de IPs y dominios es el de primera aparición
+    siguiendo el orden de los fragmentos.
+    
+    Args:
+        scans: Resultados de cada fragmento, en orden
+        contiguous: True si son trozos de un mismo texto; False si son
+            documentos independientes (las líneas se suman sin fusionar)
+    
+    Returns:
+        TextScan equivalente al del texto completo
+    """
+    result = TextScan(lines=1 if contiguous else 0)
+    ips: Dict[str, None] = {}
+    domains: Dict[str, None] = {}
+    ports: Set[int] = set()
+    
+    for part in scans:
+        if not part.characters:
+            continue
+        result.characters += part.characters
+        result.lines += part.lines - 1 if contiguous else part.lines
+        result.words += part.words
+        ips.update(dict.fromkeys(part.ips))
+        domains.update(dict.fromkeys(part.domains))
+        ports.update(part.ports)
+        for data_type, patterns in part.signals.items():
+            result.signals.setdefault(data_type, set()).update(patterns)
+    
+    if not result.characters:
+        return TextScan()
+    
+    result.ips = list(ips)
+    result.domains = list(domains)
+    result.ports = sorted(ports)
+    return result
+
+
+# Autómata del clasificador: la alternancia de señales, más largas primero;
+# las señales contenidas en la coincidencia ("starting nmap" -> "nmap") se
+# recuperan con `_record_signals`
+_CLASSIFIER_RE = re.compile(r'\b(?i:' + _SIGNAL_ALTERNATION + ')')
+
+# Caracteres examinados por el clasificador (inicio y final del texto)
+CLASSIFIER_HEAD = 48 * 1024
+CLASSIFIER_TAIL = 16 * 1024
+
+# Señales distintas a partir de las cuales un tipo sin competencia es decisivo
+_DECISIVE_SIGNALS = 4
+
+
+@dataclass
+class DataTypeClassification:
+    """
+    Veredicto del clasificador con puntuaciones de confianza por tipo.
+    """
+    label: str
+    scores: Dict[str, float] = field(default_factory=dict)
+    signals: Dict[str, Set[str]] = field(default_factory=dict)
+    decisive: bool = False
+
+    @property
+    def confidence(self) -> float:
+        """Confianza del tipo elegido (0.0-1.0)."""
+        return max(self.scores.values(), default=0.0)
+
+
+def classify_data_type(
+    text: str,
+    head: int = CLASSIFIER_HEAD,
+    tail: int = CLASSIFIER_TAIL
+) -> DataTypeClassification:
+    """
+    Clasifica el tipo de datos examinando solo una muestra acotada del texto.
+    
+    Un único autómata compilado recorre el inicio y el final del texto y se
+    detiene en cuanto un tipo acumula suficientes señales sin competencia.
     
     Args:
         text: Texto a analizar
+        head: Caracteres examinados desde el inicio
+        tail: Caracteres examinados desde el final
     
     Returns:
-        Lista de dominios encontrados
+        DataTypeClassification con el tipo, las puntuaciones y las señales
+    """
+    if not text:
+        return DataTypeClassification(label="Desconocido")
+    
+    if len(text) <= head + tail:
+        samples = [text]
+    else:
+        # Cortar la cola en un salto de línea para no empezar a mitad de token
+        tail_start = text.find('\n', len(text) - tail)
+        samples = [text[:head], text[tail_start + 1:] if tail_start != -1 else ""]
+    
+    signals: Dict[str, Set[str]] = {data_type: set() for data_type in DATA_TYPE_SIGNALS}
+    memo: Dict[str, tuple] = {}
+    total = len(_SIGNAL_LIST)
+    found = 0
+    decisive = False
+    
+    for sample in samples:
+        for match in _CLASSIFIER_RE.finditer(sample):
+            _record_signals(match.group(), signals, memo)
+            current = sum(len(value) for value in signals.values())
+            if current == found:
+                continue
+            found = current
+            
+            counts = sorted((len(value) for value in signals.values()), reverse=True)
+            if found == total or (counts[0] >= _DECISIVE_SIGNALS and counts[1] == 0):
+                decisive = True
+                break
+        if decisive:
+            break
+    
+    counts = {data_type: len(value) for data_type, value in signals.items()}
+    hits = sum(counts.values())
+    scores = {
+        data_type: round(count / hits, 3) if hits else 0.0
+        for data_type, count in counts.items()
+    }
+    
+    return DataTypeClassification(
+        label=_resolve_data_type(counts),
+        scores=scores,
+        signals={data_type: value for data_type, value in signals.items() if value},
+        decisive=decisive
+    )
+
+
+def detect_data_type(text: str) -> str:
     """
-    # Patrón para dominios
-    domain_pattern = r'\b(?:[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?\.)+[a-zA-Z]{2,}\b'
+    Detecta el tipo de datos de reconocimiento basándose en patrones.
     
-    domains = re.findall(domain_pattern, text)
+    Args:
+        text: Texto a analizar
     
-    # Eliminar duplicados manteniendo orden
-    return list(dict.fromkeys(domains))
+    Returns:
+        Tipo detectado: "Nmap", "WHOIS", "DNS", "Mixto"
+    """
+    return classify_data_type(text).label
+
 
-def extract_ports(text: str) -> List[int]:
+def extract_ips(text: str, store: Optional[AssetStore] = None) -> List[str]:
     """
-    Extrae números de puerto del texto.
+    Extrae direcciones IP del texto.
     
     Args:
         text: Texto a analizar
+        store: Almacén de activos donde registrarlas (opcional)
     
     Returns:
-        Lista de puertos encontrados
+        Lista de IPs encontradas
+    """
+    return scan_text(text, store).ips
+
+
+def extract_domains(text: str) -> List[str]:
     """
-    # Patrón para puertos (formato común: 80/tcp, 443/udp, etc.)
-    port_pattern = r'\b(\d{1,5})/(?:tcp|udp)\b'
+    Extrae dominios del texto.
     
-    ports = re.findall(port_pattern, text)
+    Args:
+        text: Texto a analizar
+    
+    Returns:
+        Lista de dominios encontrados
+    """
+    return scan_text(text).domains
+
+
+def extract_ports(text: str, store: Optional[AssetStore] = None) -> List[int]:
+    """
+    Extrae números de puerto del texto.
     
-    # Convertir a int y filtrar puertos válidos (1-65535)
-    valid_ports = [int(p) for p in ports if 1 <= int(p) <= 65535]
+    Args:
+        text: Texto a analizar
+        store: Almacén de activos donde registrarlos (opcional)
     
-    # Eliminar duplicados y ordenar
-    return sorted(list(set(valid_ports)))
+    Returns:
+        Lista de puertos encontrados
+    """
+    return scan_text(text, store).ports
+
 
-def get_text_stats(text: str) -> Dict[str, int]:
+def get_text_stats(text: str, store: Optional[AssetStore] = None) -> Dict[str, int]:
     """
     Obtiene estadísticas básicas del texto.
     
     Args:
         text: Texto a analizar
+        store: Almacén de activos donde registrar IPs y puertos (opcional)
     
     Returns:
         Diccionario con estadísticas
     """
-    if not text:
-        return {
-            "characters": 0,
-            "lines": 0,
-            "words": 0,
-            "ips": 0,
-            "domains": 0,
-            "ports": 0
-        }
-    
-    return {
-        "characters": len(text),
-        "lines": len(text.split('\n')),
-        "words": len(text.split()),
-        "ips": len(extract_ips(text)),
-        "domains": len(extract_domains(text)),
-        "ports": len(extract_ports(text))
-    }
+    return scan_text(text, store).stats()
 
 def truncate_text(text: str, max_length: int = 10000) -> str:
     """
-    Trunca el texto si excede la longitud máxima.
+    Trunca el texto si excede la longitud máxima, cortando en fin de línea.
+    Para reducir la entrada a un presupuesto de tokens conservando lo más
+    relevante, ver `utils.compact.pack_text`.
     
     Args:
         text: Texto a truncar
@@ -227,4 +597,78 @@ def truncate_text(text: str, max_length: int = 10000) -> str:
     if len(text) <= max_length:
         return text
     
-    return text[:max_length] + "\n\n[... texto truncado ...]"
+    # Cortar en el último fin de línea para no dejar líneas a medias
+    cut = text.rfind("\n", 0, max_length)
+    if cut <= 0:
+        cut = max_length
+    
+    return text[:cut] + "\n\n[... texto truncado ...]"
+
+
+# Inicio de una sección autocontenida: bloque de host de Nmap, registro WHOIS
+# o sección de salida DNS (dig/nslookup)
+_SECTION_RE = re.compile(
+    r'^(?:Nmap scan report for |Domain Name:|domain:|inetnum:|inet6num:|NetRange:'
+    r'|% Information related to|; <<>> DiG|Server:\s)',
+    re.MULTILINE | re.IGNORECASE
+)
+
+
+def split_sections(text: str) -> List[str]:
+    """
+    Divide el texto en secciones semánticas (host de Nmap, registro WHOIS,
+    sección DNS). El texto previo a la primera sección forma su propio bloque.
+    
+    Args:
+        text: Texto a dividir
+    
+    Returns:
+        Lista de secciones consecutivas (concatenadas reproducen el texto)
+    """
+    starts = [match.start() for match in _SECTION_RE.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    starts.append(len(text))
+    return [text[start:end] for start, end in zip(starts, starts[1:]) if start < end]
+
+
+def chunk_text(text: str, max_chars: int = 16000) -> List[str]:
+    """
+    Agrupa secciones semánticas consecutivas en fragmentos de hasta
+    `max_chars` caracteres. Una sección mayor que el límite se corta en
+    fin de línea, nunca a mitad de línea.
+    
+    Args:
+        text: Texto a fragmentar
+        max_chars: Tamaño máximo orientativo de cada fragmento
+    
+    Returns:
+        Lista de fragmentos
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    
+    def flush():
+        nonlocal size
+        if current:
+            chunks.append("".join(current))
+            current.clear()
+            size = 0
+    
+    for section in split_sections(text):
+        if size + len(section) > max_chars:
+            flush()
+        if len(section) <= max_chars:
+            current.append(section)
+            size += len(section)
+            continue
+        # Sección demasiado grande: trocear por líneas
+        for line in section.splitlines(keepends=True):
+            if size + len(line) > max_chars:
+                flush()
+            current.append(line)
+            size += len(line)
+    flush()
+    
+    return chunks
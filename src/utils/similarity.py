@@ -0,0 +1,233 @@
+"""
+Detección de escaneos casi duplicados.
+Elimina los campos volátiles (fechas, latencias, duración del escaneo),
+calcula una firma MinHash de las líneas resultantes y la indexa con LSH por
+bandas, de modo que buscar el escaneo previo más parecido entre cientos de
+miles solo consulta unos pocos buckets.
+"""
+
+import hashlib
+import re
+import threading
+from array import array
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple, Union
+
+# Campos que cambian entre dos escaneos del mismo objetivo sin aportar información
+_VOLATILE_PATTERNS = [
+    # Cabecera y cierre de Nmap: "Starting Nmap 7.94 ( https://nmap.org ) at 2024-05-01 10:00 UTC"
+    (re.compile(r'^(Starting Nmap \S+ \(.*?\)) at .*$', re.M), r'\1'),
+    (re.compile(r'^(# Nmap \S+ scan initiated) .*?( as: .*)?$', re.M), r'\1\2'),
+    (re.compile(r'^((?:# )?Nmap done).*?(\d+ IP address(?:es)? \(\d+ hosts? up\)).*$', re.M), r'\1 \2'),
+    (re.compile(r'\(\d+(?:\.\d+)?s latency\)'), '(latency)'),
+    (re.compile(r'scanned in \d+(?:\.\d+)? seconds'), 'scanned'),
+    (re.compile(r'^Network Distance: .*$|^TRACEROUTE.*$|^HOP RTT .*$|^\d+\s+\d+(?:\.\d+)? ms .*$', re.M), ''),
+    (re.compile(r'^\|?_?\s*(?:clock-skew|date|ssl-date|http-date|smb2-time):.*$', re.M | re.I), ''),
+    # WHOIS: marca de actualización de la base de datos
+    (re.compile(r'^>>> Last update of WHOIS database: .*$', re.M | re.I), ''),
+    # dig: tiempos, servidor y tamaño de la consulta
+    (re.compile(r'^;; (?:Query time|WHEN|MSG SIZE|SERVER):.*$', re.M), ''),
+    (re.compile(r'^;; ->>HEADER<<-.*$', re.M), ''),
+    # Fechas y horas sueltas
+    (re.compile(r'\b\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2}| ?[A-Z]{3,4})?'), '<fecha>'),
+    (re.compile(r'\b\d{2}:\d{2}:\d{2}\b'), '<hora>'),
+]
+_SPACES_RE = re.compile(r'[ \t]+')
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def strip_volatile(text: str) -> str:
+    """
+    Elimina de un escaneo los campos que varían entre ejecuciones.
+
+    Args:
+        text: Texto ya normalizado
+
+    Returns:
+        Texto sin fechas, latencias, duraciones ni trazas de ruta
+    """
+    for pattern, replacement in _VOLATILE_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def scan_features(text: str) -> Set[int]:
+    """
+    Rasgos de un escaneo: el hash de 64 bits de cada línea no vacía, tras
+    quitar los campos volátiles y colapsar espacios (el orden no importa).
+
+    Args:
+        text: Texto ya normalizado
+
+    Returns:
+        Conjunto de hashes de línea
+    """
+    features = set()
+    for line in strip_volatile(text).split("\n"):
+        line = _SPACES_RE.sub(" ", line).strip()
+        if line:
+            digest = hashlib.blake2b(line.encode("utf-8", "surrogatepass"), digest_size=8).digest()
+            features.add(int.from_bytes(digest, "little"))
+    return features
+
+
+class MinHasher:
+    """
+    Firmas MinHash de `num_perm` valores de 32 bits con permutaciones
+    universales (a·x + b) mod p. Los coeficientes salen de una semilla fija,
+    así que las firmas son comparables entre procesos y se pueden persistir.
+    """
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        self.num_perm = num_perm
+        self._params = []
+        for index in range(num_perm):
+            digest = hashlib.blake2b(f"minhash-{seed}-{index}".encode(), digest_size=16).digest()
+            a = int.from_bytes(digest[:8], "little") % (_MERSENNE_PRIME - 1) + 1
+            b = int.from_bytes(digest[8:], "little") % _MERSENNE_PRIME
+            self._params.append((a, b))
+
+    def signature(self, features: Iterable[int]) -> array:
+        """
+        Calcula la firma de un conjunto de rasgos.
+
+        Args:
+            features: Hashes enteros de los rasgos
+
+        Returns:
+            array('I') con `num_perm` mínimos (todos al máximo si no hay rasgos)
+        """
+        features = list(features)
+        if not features:
+            return array("I", [_MAX_HASH] * self.num_perm)
+        prime = _MERSENNE_PRIME
+        return array("I", [
+            min((a * feature + b) % prime for feature in features) & _MAX_HASH
+            for a, b in self._params
+        ])
+
+
+def estimate_similarity(first: array, second: array) -> float:
+    """
+    Estima la similitud de Jaccard a partir de dos firmas MinHash.
+
+    Returns:
+        Fracción de posiciones iguales (0.0-1.0)
+    """
+    if not first:
+        return 0.0
+    return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+
+def lsh_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Elige bandas y filas por banda para un umbral de similitud.
+
+    Se toma la configuración cuyo umbral efectivo (1/b)^(1/r) es el mayor
+    que no supera `threshold`: se priorizan los candidatos sobre la precisión,
+    porque cada candidato se verifica después con la firma completa.
+
+    Returns:
+        Tupla (bandas, filas por banda)
+    """
+    options = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    below = [(bands, rows) for bands, rows in options if (1 / bands) ** (1 / rows) <= threshold]
+    if not below:
+        return options[0]
+    return max(below, key=lambda option: (1 / option[0]) ** (1 / option[1]))
+
+
+class SimilarityIndex:
+    """
+    Índice LSH de firmas MinHash.
+
+    Las firmas se guardan contiguas en un único `array('I')` y cada banda en
+    un diccionario de buckets, así que 100 000 documentos ocupan unas decenas
+    de MB y una búsqueda consulta `bands` buckets más la verificación de
+    los pocos candidatos.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 64):
+        """
+        Args:
+            threshold: Similitud de Jaccard mínima para considerar dos escaneos casi iguales
+            num_perm: Valores de cada firma
+        """
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = lsh_bands(threshold, num_perm)
+        self._signatures = array("I")
+        self._keys: List[Hashable] = []
+        self._scopes: List[Hashable] = []
+        self._positions: Dict[Hashable, int] = {}
+        self._buckets: List[Dict[int, Union[int, List[int]]]] = [{} for _ in range(self.bands)]
+        self._lock = threading.Lock()
+
+    def _band_hashes(self, signature: array, scope: Hashable) -> List[int]:
+        rows = self.rows
+        return [hash((scope, tuple(signature[band * rows:(band + 1) * rows]))) for band in range(self.bands)]
+
+    def add(self, key: Hashable, signature: array, scope: Hashable = "") -> None:
+        """
+        Indexa una firma. Volver a añadir una clave existente no la duplica.
+
+        Args:
+            key: Identificador del documento (p. ej. la clave de la caché de respuestas)
+            signature: Firma de `MinHasher.signature`
+            scope: Espacio de búsqueda: solo se comparan documentos del mismo scope
+        """
+        with self._lock:
+            if key in self._positions:
+                return
+            position = len(self._keys)
+            self._positions[key] = position
+            self._keys.append(key)
+            self._scopes.append(scope)
+            self._signatures.extend(signature)
+            for bucket, band_hash in zip(self._buckets, self._band_hashes(signature, scope)):
+                members = bucket.get(band_hash)
+                if members is None:
+                    bucket[band_hash] = position
+                elif isinstance(members, int):
+                    bucket[band_hash] = [members, position]
+                else:
+                    members.append(position)
+
+    def query(self, signature: array, scope: Hashable = "") -> Optional[Tuple[Hashable, float]]:
+        """
+        Busca el documento indexado más parecido.
+
+        Args:
+            signature: Firma del documento nuevo
+            scope: Espacio de búsqueda
+
+        Returns:
+            Tupla (clave, similitud estimada) del mejor candidato que alcanza
+            el umbral, o None
+        """
+        with self._lock:
+            candidates: Set[int] = set()
+            for bucket, band_hash in zip(self._buckets, self._band_hashes(signature, scope)):
+                members = bucket.get(band_hash)
+                if members is None:
+                    continue
+                if isinstance(members, int):
+                    candidates.add(members)
+                else:
+                    candidates.update(members)
+
+            best: Optional[Tuple[Hashable, float]] = None
+            size = self.num_perm
+            for position in candidates:
+                if self._scopes[position] != scope:
+                    continue
+                similarity = estimate_similarity(
+                    signature, self._signatures[position * size:(position + 1) * size]
+                )
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (self._keys[position], similarity)
+            return best
+
+    def __len__(self) -> int:
+        return len(self._keys)
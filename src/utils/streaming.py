@@ -0,0 +1,204 @@
+"""
+Módulo de ingesta en streaming para ficheros de reconocimiento muy grandes.
+Lee la entrada por bloques y extrae entidades con memoria acotada.
+"""
+
+import codecs
+import mmap
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Dict, Iterator, List, Optional, Set, Union
+
+from .assets import AssetStore
+from .parser import TextScan, merge_scans, scan_buffer, scan_text
+
+# Tamaño por defecto de cada bloque leído (caracteres)
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+Source = Union[str, Path, IO]
+
+
+@dataclass
+class StreamUpdate:
+    """
+    Resultado incremental de un bloque procesado.
+    """
+    offset: int
+    ips: List[str] = field(default_factory=list)
+    domains: List[str] = field(default_factory=list)
+    ports: List[int] = field(default_factory=list)
+    stats: Dict[str, int] = field(default_factory=dict)
+
+
+def _read_blocks(handle: IO, chunk_size: int, encoding: str) -> Iterator[str]:
+    """
+    Lee bloques de texto de un fichero abierto en modo texto o binario.
+    """
+    decoder = None
+
+    while True:
+        block = handle.read(chunk_size)
+        if not block:
+            break
+        if isinstance(block, (bytes, bytearray)):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+            block = decoder.decode(block)
+            if not block:
+                continue
+        yield block
+
+    if decoder is not None:
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+
+def iter_text_chunks(
+    source: Source,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    encoding: str = "utf-8"
+) -> Iterator[str]:
+    """
+    Divide la entrada en bloques que terminan en fin de línea.
+
+    Ningún token queda partido entre dos bloques: el resto posterior al último
+    salto de línea se arrastra al bloque siguiente. Si una línea supera cuatro
+    veces `chunk_size`, se corta en el último espacio disponible.
+
+    Args:
+        source: Ruta del fichero o fichero abierto (texto o binario)
+        chunk_size: Tamaño aproximado de cada bloque en caracteres
+        encoding: Codificación usada para rutas y ficheros binarios
+
+    Returns:
+        Iterador de bloques de texto
+    """
+    if isinstance(source, (str, Path)):
+        with open(source, "r", encoding=encoding, errors="replace", newline="") as handle:
+            yield from iter_text_chunks(handle, chunk_size, encoding)
+        return
+
+    max_carry = chunk_size * 4
+    pending = ""
+
+    for block in _read_blocks(source, chunk_size, encoding):
+        pending += block
+        cut = pending.rfind("\n") + 1
+
+        if not cut and len(pending) >= max_carry:
+            # Línea patológicamente larga: cortar en el último espacio
+            cut = max(pending.rfind(" "), pending.rfind("\t")) + 1 or len(pending)
+
+        if cut:
+            yield pending[:cut]
+            pending = pending[cut:]
+
+    if pending:
+        yield pending
+
+
+def stream_scan(
+    source: Source,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    encoding: str = "utf-8"
+) -> Iterator[StreamUpdate]:
+    """
+    Procesa la entrada bloque a bloque y produce resultados incrementales.
+
+    La memoria pico depende del tamaño de bloque y del número de entidades
+    distintas, no del tamaño total de la entrada.
+
+    Args:
+        source: Ruta del fichero o fichero abierto (texto o binario)
+        chunk_size: Tamaño aproximado de cada bloque en caracteres
+        encoding: Codificación usada para rutas y ficheros binarios
+
+    Returns:
+        Iterador de StreamUpdate con las entidades nuevas de cada bloque
+        y las estadísticas acumuladas
+    """
+    seen_ips: Set[str] = set()
+    seen_domains: Set[str] = set()
+    seen_ports: Set[int] = set()
+    characters = 0
+    newlines = 0
+    words = 0
+
+    for chunk in iter_text_chunks(source, chunk_size, encoding):
+        chunk_scan = scan_text(chunk)
+        characters += chunk_scan.characters
+        newlines += chunk_scan.lines - 1
+        words += chunk_scan.words
+
+        new_ips = [ip for ip in chunk_scan.ips if ip not in seen_ips]
+        new_domains = [domain for domain in chunk_scan.domains if domain not in seen_domains]
+        new_ports = [port for port in chunk_scan.ports if port not in seen_ports]
+        seen_ips.update(new_ips)
+        seen_domains.update(new_domains)
+        seen_ports.update(new_ports)
+
+        yield StreamUpdate(
+            offset=characters,
+            ips=new_ips,
+            domains=new_domains,
+            ports=new_ports,
+            stats={
+                "characters": characters,
+                "lines": newlines + 1,
+                "words": words,
+                "ips": len(seen_ips),
+                "domains": len(seen_domains),
+                "ports": len(seen_ports)
+            }
+        )
+
+
+def scan_source(
+    source: Source,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    encoding: str = "utf-8",
+    store: Optional[AssetStore] = None
+) -> TextScan:
+    """
+    Equivalente a `scan_text` para ficheros que no caben en memoria.
+
+    Args:
+        source: Ruta del fichero o fichero abierto (texto o binario)
+        chunk_size: Tamaño aproximado de cada bloque en caracteres
+        encoding: Codificación usada para rutas y ficheros binarios
+        store: Almacén de activos donde registrar IPs y puertos (opcional)
+
+    Returns:
+        TextScan con los resultados agregados
+    """
+    return merge_scans(
+        scan_text(chunk, store)
+        for chunk in iter_text_chunks(source, chunk_size, encoding)
+    )
+
+
+def scan_mapped(
+    path: Union[str, Path],
+    encoding: str = "utf-8",
+    store: Optional[AssetStore] = None
+) -> TextScan:
+    """
+    Analiza un fichero mapeado en memoria sin leerlo ni decodificarlo entero.
+
+    El sistema operativo pagina el fichero bajo demanda, así que la memoria
+    residente no crece con el tamaño del archivo y no hay copia en `str`.
+
+    Args:
+        path: Ruta del fichero
+        encoding: Codificación compatible con ASCII del fichero
+        store: Almacén de activos donde registrar IPs y puertos (opcional)
+
+    Returns:
+        TextScan equivalente a `scan_text` sobre el contenido
+    """
+    with open(path, "rb") as handle:
+        if not Path(path).stat().st_size:
+            return TextScan()
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return scan_buffer(mapped, encoding, store)
@@ -0,0 +1,128 @@
+"""
+Configuración común de las pruebas: los módulos se importan desde `src`,
+igual que hace `app.py`.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+
+import json  # noqa: E402
+import types  # noqa: E402
+
+import pytest  # noqa: E402
+
+
+class FakeCompletions:
+    """Sustituto de `client.chat.completions` que registra las peticiones."""
+
+    def __init__(self, content: str = "## 📋 Resumen Ejecutivo\nSin hallazgos"):
+        self.content = content
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        usage = types.SimpleNamespace(prompt_tokens=100, completion_tokens=50, total_tokens=150)
+        if kwargs.get("stream"):
+            return self._stream(usage)
+        message = types.SimpleNamespace(content=self.content)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=usage)
+
+    def _stream(self, usage):
+        for line in self.content.splitlines(keepends=True):
+            delta = types.SimpleNamespace(content=line)
+            yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)], usage=None)
+        yield types.SimpleNamespace(choices=[], usage=usage)
+
+
+class FakeFiles:
+    """Sustituto de `client.files`: guarda los ficheros en memoria."""
+
+    def __init__(self):
+        self.data = {}
+
+    def create(self, file, purpose):
+        file_id = f"file-{len(self.data) + 1}"
+        self.data[file_id] = file[1]
+        return types.SimpleNamespace(id=file_id)
+
+    def content(self, file_id):
+        return types.SimpleNamespace(text=self.data[file_id].decode("utf-8"))
+
+
+class FakeBatches:
+    """
+    Sustituto de `client.batches`: cada lote se resuelve al crearlo llamando
+    a `respond(custom_id, body)`, que devuelve el texto de la respuesta o
+    lanza una excepción para que la petición termine con error.
+    """
+
+    def __init__(self, files, respond):
+        self.files = files
+        self.respond = respond
+        self.bodies = []
+        self._batches = {}
+
+    def create(self, input_file_id, endpoint, completion_window, metadata=None):
+        output, errors = [], []
+        for line in self.files.data[input_file_id].decode("utf-8").splitlines():
+            row = json.loads(line)
+            self.bodies.append(row["body"])
+            try:
+                content = self.respond(row["custom_id"], row["body"])
+            except Exception as e:
+                errors.append({"custom_id": row["custom_id"], "error": {"message": str(e)}})
+                continue
+            body = {
+                "choices": [{"message": {"content": content}}],
+                "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150}
+            }
+            output.append({"custom_id": row["custom_id"], "response": {"status_code": 200, "body": body}})
+        batch = types.SimpleNamespace(
+            id=f"batch-{len(self._batches) + 1}", status="completed", metadata=metadata,
+            output_file_id=self._store(output), error_file_id=self._store(errors)
+        )
+        self._batches[batch.id] = batch
+        return batch
+
+    def retrieve(self, batch_id):
+        return self._batches[batch_id]
+
+    def _store(self, rows):
+        if not rows:
+            return None
+        return self.files.create(
+            ("salida.jsonl", "".join(json.dumps(row) + "\n" for row in rows).encode("utf-8")), "batch"
+        ).id
+
+
+@pytest.fixture
+def fake_completions():
+    return FakeCompletions()
+
+
+@pytest.fixture
+def analyzer(fake_completions):
+    """ReconAnalyzer con caché en memoria y un cliente de chat falso."""
+    pytest.importorskip("openai")
+    from ai.analyzer import ReconAnalyzer
+    from ai.cache import ResponseCache
+
+    instance = ReconAnalyzer(api_key="sk-test", cache=ResponseCache(":memory:"))
+    instance.client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=fake_completions))
+    return instance
+
+
+@pytest.fixture
+def batch_client(analyzer):
+    """
+    Instala en `analyzer` un cliente falso de la Batch API; `respond` se
+    puede sustituir en cada prueba.
+    """
+    files = FakeFiles()
+    batches = FakeBatches(files, lambda custom_id, body: "## 📋 Resumen Ejecutivo\nSin hallazgos")
+    analyzer.client.files = files
+    analyzer.client.batches = batches
+    return batches
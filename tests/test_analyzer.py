@@ -0,0 +1,160 @@
+"""Pruebas de `ReconAnalyzer` con un cliente de chat falso."""
+
+import pytest
+
+pytest.importorskip("openai")
+
+from ai import router  # noqa: E402
+
+WHOIS_TEXT = """Domain Name: EXAMPLE.COM
+Registrar: Example Registrar, Inc.
+Name Server: NS1.EXAMPLE.COM
+Name Server: NS2.EXAMPLE.COM
+Creation Date: 1995-08-14T04:00:00Z"""
+
+
+@pytest.fixture
+def history(monkeypatch):
+    # Historial compartido vacío: la predicción de max_tokens no depende de otras pruebas
+    monkeypatch.setattr(router.HISTORY, "_latency", {})
+    monkeypatch.setattr(router.HISTORY, "_completions", {})
+    return router.HISTORY
+
+
+@pytest.mark.parametrize("routing_policy", [None, "cheapest"])
+def test_cache_key_ignores_predicted_max_tokens_and_routed_model(analyzer, fake_completions, history, routing_policy):
+    analyzer.routing_policy = routing_policy
+
+    first = analyzer.analyze(WHOIS_TEXT, data_type="WHOIS/DNS", max_tokens=None)
+    assert first["success"]
+    for index in range(5):
+        other = analyzer.analyze(f"{WHOIS_TEXT}\nRegistrant Org: Org {index}", data_type="WHOIS/DNS", max_tokens=None)
+        assert other["success"]
+
+    again = analyzer.analyze(WHOIS_TEXT, data_type="WHOIS/DNS", max_tokens=None)
+    assert again["metadata"]["cache"]["hit"]
+    assert len(fake_completions.calls) == 6
+
+
+NMAP_TEXT = """Nmap scan report for web.example.com (10.0.0.1)
+Host is up (0.012s latency).
+PORT   STATE SERVICE VERSION
+22/tcp open  ssh     OpenSSH 8.2p1
+80/tcp open  http    nginx 1.18.0"""
+
+REPORT_JSON = (
+    '{"summary": "Servidor web", "exposure_level": "medio", "technologies": ["nginx"], '
+    '"findings": [], "risks": [], "recommendations": [], "next_steps": [], "learning_resources": []}'
+)
+
+
+def test_structured_request_routed_to_model_without_json_schema(analyzer, fake_completions, monkeypatch):
+    fake_completions.content = REPORT_JSON
+    monkeypatch.setattr(analyzer, "get_available_models", lambda: ["gpt-3.5-turbo"])
+    analyzer.routing_policy = "cheapest"
+    analyzer.quality_floor = 1
+
+    result = analyzer.analyze(NMAP_TEXT, data_type="Nmap", structured=True, use_cache=False)
+
+    assert result["success"]
+    assert result["metadata"]["routing"]["model"] == "gpt-3.5-turbo"
+    assert fake_completions.calls[-1]["model"] == "gpt-3.5-turbo"
+    assert fake_completions.calls[-1]["response_format"] == {"type": "json_object"}
+    assert result["structured"]["analysis"]["summary"] == "Servidor web"
+
+
+def test_structured_fallback_model_gets_its_own_response_format(analyzer, fake_completions, monkeypatch):
+    from ai import resilience
+    from ai.resilience import CircuitBreaker, RetryPolicy
+
+    monkeypatch.setitem(resilience._breakers, "gpt-4o", CircuitBreaker())
+    monkeypatch.setitem(resilience._breakers, "gpt-3.5-turbo", CircuitBreaker())
+    fake_completions.content = REPORT_JSON
+    create = fake_completions.create
+
+    def primary_times_out(**kwargs):
+        if kwargs["model"] == "gpt-4o":
+            fake_completions.calls.append(kwargs)
+            raise TimeoutError("sin respuesta")
+        return create(**kwargs)
+
+    fake_completions.create = primary_times_out
+    analyzer.set_model("gpt-4o")
+    analyzer.caller.policy = RetryPolicy(max_retries=0, base_delay=0.0)
+    analyzer.caller.fallback_model = "gpt-3.5-turbo"
+
+    result = analyzer.analyze(NMAP_TEXT, data_type="Nmap", structured=True, use_cache=False)
+
+    assert result["success"]
+    assert result["metadata"]["model"] == "gpt-3.5-turbo"
+    assert fake_completions.calls[0]["response_format"]["type"] == "json_schema"
+    assert fake_completions.calls[1]["response_format"] == {"type": "json_object"}
+
+
+def _failing_render(monkeypatch):
+    from ai import analyzer as analyzer_module
+
+    render = analyzer_module.render_report
+
+    def render_or_fail(report, facts, mode="junior"):
+        if report["summary"] == "roto":
+            raise AttributeError("'str' object has no attribute 'get'")
+        return render(report, facts, mode)
+
+    monkeypatch.setattr(analyzer_module, "render_report", render_or_fail)
+
+
+def test_stream_returns_error_when_report_cannot_be_built(analyzer, fake_completions, monkeypatch):
+    _failing_render(monkeypatch)
+    fake_completions.content = REPORT_JSON.replace("Servidor web", "roto")
+
+    stream = analyzer.analyze(NMAP_TEXT, data_type="Nmap", structured=True, use_cache=False, stream=True)
+
+    assert list(stream) == []
+    assert stream.result["success"] is False
+    assert "'str' object" in stream.result["error"]
+
+
+def test_batch_keeps_other_results_when_one_report_fails(analyzer, batch_client, monkeypatch):
+    _failing_render(monkeypatch)
+    batch_client.respond = lambda custom_id, body: REPORT_JSON.replace(
+        "Servidor web", "roto" if custom_id == "1" else "Servidor web"
+    )
+
+    results = analyzer.analyze_batch(
+        [NMAP_TEXT, NMAP_TEXT.replace("10.0.0.1", "10.0.0.2")],
+        data_type="Nmap", structured=True, use_cache=False, poll_interval=0
+    )
+
+    assert results[0]["success"]
+    assert "Servidor web" in results[0]["result"]
+    assert results[1]["success"] is False
+
+
+def test_stream_yields_text_incrementally_and_reports_timing(analyzer, fake_completions):
+    fake_completions.content = "## 📋 Resumen Ejecutivo\nServidor web\nSin hallazgos críticos\n"
+
+    stream = analyzer.analyze(NMAP_TEXT, data_type="Nmap", use_cache=False, stream=True)
+    chunks = list(stream)
+
+    assert len(chunks) == 3 and "".join(chunks) == fake_completions.content
+    assert fake_completions.calls[-1]["stream"] is True
+    timing = stream.result["metadata"]["timing"]
+    assert 0 <= timing["ttft"] <= timing["duration"]
+    assert stream.result["metadata"]["usage"]["completion_tokens"] == 50
+
+
+def test_oversized_input_is_mapped_per_chunk_then_reduced(analyzer, fake_completions):
+    analyzer.map_reduce_threshold = 2000
+    analyzer.chunk_chars = 1000
+    text = "\n".join(f"Nmap scan report for 10.0.{i // 256}.{i % 256}\n22/tcp open ssh" for i in range(100))
+
+    result = analyzer.analyze(text, data_type="Nmap", use_cache=False, compact=False)
+
+    assert result["success"]
+    chunks = result["metadata"]["map_reduce"]["chunks"]
+    assert chunks > 1 and result["metadata"]["map_reduce"]["failed"] == 0
+    # Una llamada por fragmento y una final que reduce los hallazgos
+    assert len(fake_completions.calls) == chunks + 1
+    assert all(call["max_tokens"] == analyzer.chunk_max_tokens for call in fake_completions.calls[:-1])
+    assert result["metadata"]["usage"]["prompt_tokens"] == 100 * (chunks + 1)
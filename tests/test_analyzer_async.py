@@ -0,0 +1,98 @@
+"""Pruebas de `analyze_async`/`analyze_many`: fase map asíncrona, límites y concurrencia."""
+
+import asyncio
+import types
+
+import pytest
+
+pytest.importorskip("openai")
+
+from ai import resilience  # noqa: E402
+from ai.resilience import CircuitBreaker, RetryPolicy  # noqa: E402
+
+MODEL = "gpt-4o-mini"
+
+
+class FakeAsyncCompletions:
+    """Cliente de chat asíncrono falso que mide las peticiones simultáneas."""
+
+    def __init__(self, fail_first: int = 0):
+        self.calls = []
+        self.fail_first = fail_first
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        fail = len(self.calls) <= self.fail_first
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if fail:
+                raise TimeoutError("sin respuesta")
+        finally:
+            self.in_flight -= 1
+        usage = types.SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+        message = types.SimpleNamespace(content="- hallazgo")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=usage)
+
+
+class CountingLimiter:
+    def __init__(self):
+        self.acquired = []
+
+    async def acquire(self, tokens):
+        self.acquired.append(tokens)
+
+
+def _large_scan(hosts: int) -> str:
+    return "\n".join(
+        f"Nmap scan report for 10.0.{index // 250}.{index % 250}\nHost is up.\n"
+        f"PORT STATE SERVICE VERSION\n{1000 + index}/tcp open http nginx 1.{index}"
+        for index in range(hosts)
+    )
+
+
+@pytest.fixture
+def async_analyzer(analyzer, monkeypatch):
+    completions = FakeAsyncCompletions()
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions))
+    monkeypatch.setattr(analyzer, "_get_async_client", lambda: client)
+    monkeypatch.setitem(resilience._breakers, MODEL, CircuitBreaker())
+    analyzer.set_model(MODEL)
+    analyzer.map_reduce_threshold = 2000
+    analyzer.chunk_chars = 1500
+    analyzer.caller.policy = RetryPolicy(max_retries=2, base_delay=0.0, max_delay=0.0)
+    return analyzer, completions
+
+
+def test_map_phase_uses_async_client_and_limiter_for_every_request(async_analyzer, fake_completions):
+    analyzer, completions = async_analyzer
+    completions.fail_first = 1
+    limiter = CountingLimiter()
+
+    result = asyncio.run(analyzer.analyze_async(_large_scan(60), data_type="Nmap", limiter=limiter, use_cache=False))
+
+    assert result["success"]
+    assert result["metadata"]["map_reduce"]["chunks"] > 1
+    assert fake_completions.calls == []
+    # Fragmentos + reduce + el reintento del primer fallo
+    assert len(completions.calls) == result["metadata"]["map_reduce"]["chunks"] + 2
+    assert len(limiter.acquired) == len(completions.calls)
+
+
+def test_analyze_many_concurrency_bounds_map_requests(async_analyzer, fake_completions):
+    analyzer, completions = async_analyzer
+
+    async def collect():
+        return [item async for item in analyzer.analyze_many(
+            [_large_scan(40), _large_scan(41)], concurrency=2, data_type="Nmap", use_cache=False
+        )]
+
+    results = asyncio.run(collect())
+
+    assert all(result["success"] for _, result in results)
+    assert fake_completions.calls == []
+    assert len(completions.calls) == sum(result["metadata"]["map_reduce"]["chunks"] + 1 for _, result in results)
+    assert completions.max_in_flight <= 2
@@ -0,0 +1,75 @@
+"""Pruebas del almacén compacto de activos de `utils.assets`."""
+
+import pytest
+
+from utils.assets import AssetStore, IPv4Set, PortBitmap, int_to_ip, ip_to_int
+from utils.nmap_xml import NmapHost, NmapPort
+
+
+def test_ip_int_round_trip():
+    assert ip_to_int("10.0.0.1") == 0x0A000001
+    assert int_to_ip(ip_to_int("192.168.255.254")) == "192.168.255.254"
+    with pytest.raises(ValueError):
+        ip_to_int("10.0.0.256")
+
+
+def test_ipv4_set_deduplicates_and_keeps_order():
+    ips = IPv4Set(["10.0.0.2", "10.0.0.1", "10.0.0.2"])
+    ips.update(["10.0.0.3", "10.0.0.1"])
+    ips.add(ip_to_int("9.9.9.9"))
+    assert list(ips) == ["9.9.9.9", "10.0.0.1", "10.0.0.2", "10.0.0.3"]
+    assert "10.0.0.3" in ips and "10.0.0.4" not in ips
+    assert ips.values().typecode == "I"
+
+
+def test_ipv4_set_union_and_intersection():
+    first = IPv4Set(f"10.0.{i // 256}.{i % 256}" for i in range(0, 2000, 2))
+    second = IPv4Set(f"10.0.{i // 256}.{i % 256}" for i in range(0, 2000, 3))
+    union = first | second
+    both = first & second
+    assert len(union) == len({i for i in range(0, 2000, 2)} | {i for i in range(0, 2000, 3)})
+    assert list(both) == [f"10.0.{i // 256}.{i % 256}" for i in range(0, 2000, 6)]
+    assert list(union.values()) == sorted(union.values())
+    # Conjuntos de tamaños muy distintos (búsqueda por bisección)
+    assert list(IPv4Set(["10.0.0.6", "1.1.1.1"]) & first) == ["10.0.0.6"]
+    assert len(IPv4Set() & first) == 0
+
+
+def test_port_bitmap_rejects_out_of_range_ports():
+    ports = PortBitmap([0, 22, 443, 65535])
+    assert list(ports) == [0, 22, 443, 65535] and len(ports) == 4
+    for port in (-1, 65536, 70000):
+        with pytest.raises(ValueError):
+            ports.add(port)
+    assert 65535 in ports and -1 not in ports
+    assert list(PortBitmap([22, 80]) & PortBitmap([80, 443])) == [80]
+    assert list(PortBitmap([22]) | PortBitmap([80])) == [22, 80]
+
+
+def test_asset_store_host_ports_union_and_intersection():
+    first = AssetStore()
+    first.add_ports([443, 22, 22, 0, 70000], "10.0.0.1")
+    first.add_ports([80], "10.0.0.1")
+    first.add_hosts([
+        NmapHost(address="10.0.0.2", status="up", ports=(
+            NmapPort(protocol="tcp", portid=3306, state="open"),
+            NmapPort(protocol="tcp", portid=25, state="closed")
+        )),
+        NmapHost(address="fe80::1", status="up", ports=())
+    ])
+    assert first.host_ports("10.0.0.1") == [22, 80, 443]
+    assert first.host_ports("10.0.0.2") == [3306]
+    assert first.hosts_with_port(22) == ["10.0.0.1"]
+
+    second = AssetStore()
+    second.add_ports([22, 8080], "10.0.0.1")
+    second.add_ips(["10.0.0.9"])
+
+    union = first | second
+    assert union.host_ports("10.0.0.1") == [22, 80, 443, 8080]
+    assert union.stats() == {"ips": 3, "ports": 5, "hosts_with_ports": 2}
+
+    common = first & second
+    assert common.host_ports("10.0.0.1") == [22]
+    assert common.host_ports("10.0.0.2") == []
+    assert list(common.ips) == ["10.0.0.1"]
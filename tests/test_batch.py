@@ -0,0 +1,83 @@
+"""Pruebas de `analyze_batch` contra un cliente falso de la Batch API."""
+
+import json
+
+import pytest
+
+pytest.importorskip("openai")
+
+from ai.batch import build_batch_line, split_batch_files  # noqa: E402
+
+HOST_BLOCK = """Nmap scan report for host{i}.example.com (10.0.{a}.{b})
+Host is up (0.010s latency).
+PORT   STATE SERVICE VERSION
+22/tcp open  ssh     OpenSSH 8.{i}p1
+80/tcp open  http    nginx 1.{i}.0
+"""
+
+
+def _scan(first: int, count: int) -> str:
+    return "\n".join(HOST_BLOCK.format(i=i, a=i // 250, b=i % 250 + 1) for i in range(first, first + count))
+
+
+def test_batch_lines_and_file_split():
+    line = build_batch_line("7", {"model": "gpt-4o-mini", "messages": []})
+    assert json.loads(line) == {
+        "custom_id": "7", "method": "POST", "url": "/v1/chat/completions",
+        "body": {"model": "gpt-4o-mini", "messages": []}
+    }
+    files = list(split_batch_files([(str(i), line) for i in range(5)], max_requests=2))
+    assert [len(lines) for lines in files] == [2, 2, 1]
+    files = list(split_batch_files([(str(i), line) for i in range(5)], max_bytes=len(line) * 3))
+    assert [len(lines) for lines in files] == [3, 2]
+
+
+def test_batch_mixed_cached_empty_and_oversized_inputs(analyzer, fake_completions, batch_client, tmp_path):
+    analyzer.map_reduce_threshold = 3000
+    analyzer.chunk_chars = 1500
+    cached_text = _scan(0, 2)
+    assert analyzer.analyze(cached_text, data_type="Nmap")["success"]
+    scan_file = tmp_path / "scan.txt"
+    scan_file.write_text(_scan(200, 2), encoding="utf-8")
+
+    seen = []
+
+    def respond(custom_id, body):
+        seen.append(custom_id)
+        if custom_id == "2-2":
+            raise RuntimeError("fragmento rechazado")
+        if "-" in custom_id:
+            return f"- hallazgo del fragmento {custom_id}"
+        prompt = body["messages"][-1]["content"]
+        if custom_id == "2":
+            assert "hallazgo del fragmento 2-1" in prompt
+            assert "(fragmento no analizado)" in prompt
+        return f"informe {custom_id}"
+
+    batch_client.respond = respond
+    big_text = _scan(20, 60)
+    results = analyzer.analyze_batch(
+        [cached_text, "   ", big_text, _scan(100, 1), scan_file, tmp_path / "no-existe.txt"],
+        data_type="Nmap", poll_interval=0
+    )
+
+    assert len(results) == 6
+    assert results[0]["metadata"]["cache"]["hit"]
+    assert results[1]["success"] is False and "No se proporcionó texto" in results[1]["error"]
+    assert results[2]["result"] == "informe 2"
+    chunks = results[2]["metadata"]["map_reduce"]["chunks"]
+    assert chunks > 2 and results[2]["metadata"]["map_reduce"]["failed"] == 1
+    assert results[3]["result"] == "informe 3"
+    assert results[3]["metadata"]["batch"]["batch_id"] == "batch-1"
+    assert results[4]["result"] == "informe 4"
+    assert results[5]["success"] is False and "Error al leer el fichero" in results[5]["error"]
+
+    # Un lote con los fragmentos y las entradas pequeñas y otro con la fase reduce
+    assert sorted(seen[:-1]) == sorted([f"2-{n}" for n in range(1, chunks + 1)] + ["3", "4"])
+    assert seen[-1] == "2"
+    assert results[2]["metadata"]["batch"]["batch_id"] == "batch-2"
+    assert len(fake_completions.calls) == 1
+
+    # Los resultados del lote quedan en la caché de respuestas
+    again = analyzer.analyze(_scan(100, 1), data_type="Nmap")
+    assert again["metadata"]["cache"]["hit"] and again["result"] == "informe 3"
@@ -0,0 +1,42 @@
+"""Pruebas de la caché por contenido y del escaneo incremental."""
+
+from utils.cache import IncrementalScanner, LRUCache, split_blocks
+from utils.parser import scan_text
+
+TEXT = "".join(f"Nmap scan report for host{i}.example.com (10.1.{i // 256}.{i % 256})\n" for i in range(2000))
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get_or_compute("a", lambda: 99) == 1
+    assert cache.info() == {"hits": 2, "misses": 1, "size": 2, "maxsize": 2}
+
+
+def test_split_blocks_cuts_at_line_ends_and_is_local_to_edits():
+    blocks = split_blocks(TEXT)
+    assert "".join(blocks) == TEXT
+    assert len(blocks) > 1 and all(block.endswith("\n") for block in blocks)
+
+    edited = split_blocks("Starting Nmap 7.94\n" + TEXT)
+    # Solo cambia el primer bloque: el resto se reutiliza tal cual
+    assert len(set(blocks) - set(edited)) == 1
+
+
+def test_incremental_scanner_reuses_unchanged_blocks():
+    scanner = IncrementalScanner()
+    first = scanner.scan(TEXT)
+    blocks = scanner.info()["size"]
+    assert first.ips == scan_text(TEXT).ips
+
+    edited = TEXT + "Nmap scan report for extra.example.org (192.168.7.7)\n"
+    result = scanner.scan(edited)
+    expected = scan_text(edited)
+    assert (result.characters, result.lines, result.words) == (expected.characters, expected.lines, expected.words)
+    assert result.ips == expected.ips and result.domains == expected.domains
+    assert scanner.info()["hits"] >= blocks - 1
+    assert scanner.scan(edited) is result
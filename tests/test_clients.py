@@ -0,0 +1,53 @@
+"""Pruebas del registro de clientes compartidos de OpenAI."""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("httpx")
+
+from ai import clients  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def registry():
+    clients.clear_clients()
+    yield
+    clients.clear_clients()
+
+
+def test_sync_clients_are_shared_per_key_and_base_url():
+    first = clients.get_client("sk-a")
+    assert clients.get_client("sk-a") is first
+    assert clients.get_client("sk-b") is not first
+    assert clients.get_client("sk-a", "http://localhost:8000/v1") is not first
+
+    clients.clear_clients()
+    assert clients.get_client("sk-a") is not first
+
+
+def test_async_clients_are_bound_to_their_event_loop():
+    async def pair():
+        return clients.get_async_client("sk-a"), clients.get_async_client("sk-a")
+
+    first, again = asyncio.run(pair())
+    assert first is again
+    other, _ = asyncio.run(pair())
+    assert other is not first
+
+
+def test_warm_up_runs_once_per_client(monkeypatch):
+    calls = []
+    monkeypatch.setattr(clients, "get_client", lambda api_key, base_url=None: calls.append(api_key) or _Broken())
+
+    clients.warm_up("sk-a", background=False)
+    clients.warm_up("sk-a", background=False)
+    assert calls == ["sk-a"]
+
+
+class _Broken:
+    """Cliente cuya petición de calentamiento falla: el error se ignora."""
+
+    def with_options(self, **kwargs):
+        raise ConnectionError("sin red")
@@ -0,0 +1,91 @@
+"""Pruebas de la compactación y el empaquetado de escaneos de `utils.compact`."""
+
+from utils.compact import compact_scan_text, format_port_ranges, line_priority, pack_text
+
+HOST_BLOCK = """Nmap scan report for {address}
+Host is up ({latency}s latency).
+PORT    STATE    SERVICE
+21/tcp  filtered ftp
+22/tcp  open     ssh     OpenSSH 8.2p1
+23/tcp  filtered telnet
+24/tcp  filtered priv-mail
+80/tcp  closed   http
+MAC Address: {mac} (Vendor)
+"""
+
+SCAN = (
+    "Starting Nmap 7.94 ( https://nmap.org ) at 2024-05-01 10:00 UTC\n"
+    + HOST_BLOCK.format(address="10.0.0.1", latency="0.010", mac="AA:AA:AA:AA:AA:01") + "\n"
+    + HOST_BLOCK.format(address="10.0.0.2", latency="0.020", mac="AA:AA:AA:AA:AA:02") + "\n"
+    + "Service detection performed. Please report any incorrect results at https://nmap.org/submit/ .\n"
+    + "Nmap done: 2 IP addresses (2 hosts up) scanned in 5.00 seconds"
+)
+
+
+def test_format_port_ranges():
+    assert format_port_ranges([25, 1, 2, 3, 21, 23, 24, 2]) == "1-3,21,23-25"
+    assert format_port_ranges([]) == ""
+
+
+def test_compact_groups_closed_ports_and_identical_hosts():
+    compacted = compact_scan_text(SCAN)
+    assert compacted.splitlines() == [
+        "Starting Nmap 7.94 ( https://nmap.org ) at 2024-05-01 10:00 UTC",
+        "Nmap scan report for 10.0.0.1, 10.0.0.2 (2 hosts con resultado idéntico)",
+        "MAC Address: AA:AA:AA:AA:AA:01 (Vendor) [10.0.0.1]",
+        "MAC Address: AA:AA:AA:AA:AA:02 (Vendor) [10.0.0.2]",
+        "PORT    STATE    SERVICE",
+        "tcp filtered (3 puertos): 21,23-24",
+        "tcp closed (1 puertos): 80",
+        "22/tcp  open     ssh     OpenSSH 8.2p1",
+        "",
+        "Nmap done: 2 IP addresses (2 hosts up) scanned in 5.00 seconds"
+    ]
+
+
+def test_compact_keeps_different_hosts_and_free_text():
+    other = HOST_BLOCK.format(address="10.0.0.3", latency="0.010", mac="AA:AA:AA:AA:AA:03").replace("8.2p1", "9.6p1")
+    compacted = compact_scan_text(HOST_BLOCK.format(address="10.0.0.1", latency="0.010", mac="M1") + other)
+    assert "Nmap scan report for 10.0.0.1\n" in compacted + "\n"
+    assert "Nmap scan report for 10.0.0.3" in compacted
+    assert "OpenSSH 9.6p1" in compacted and "OpenSSH 8.2p1" in compacted
+
+    whois = "Domain Name: EXAMPLE.COM\nRegistrar: Example\nPlease report any incorrect results"
+    assert compact_scan_text(whois) == "Domain Name: EXAMPLE.COM\nRegistrar: Example"
+
+
+def test_line_priority():
+    assert line_priority("22/tcp open ssh OpenSSH 8.2p1") == 0
+    assert line_priority("|_  VULNERABLE: CVE-2014-0160") == 0
+    assert line_priority("Nmap scan report for 10.0.0.1") == 0
+    assert line_priority("| http-title: Inicio") == 1
+    assert line_priority("80/tcp closed http") == 1
+    assert line_priority("texto cualquiera") == 2
+
+
+def test_pack_text_keeps_high_priority_lines_in_order():
+    lines = ["ruido de poco interés " * 4] * 20 + ["22/tcp open ssh OpenSSH 8.2p1"] + ["| ssl-cert: Subject"] * 3
+    text = "\n".join(lines)
+    assert pack_text(text, 10_000) == (text, 0)
+
+    packed, dropped = pack_text(text, 16 + 29 + 2 * 19, count_tokens=len)
+    kept = packed.splitlines()
+    assert kept[0] == "22/tcp open ssh OpenSSH 8.2p1"
+    assert kept[1:3] == ["| ssl-cert: Subject"] * 2
+    assert kept[-1] == f"[... {dropped} líneas de menor prioridad omitidas ...]"
+    assert dropped == len(lines) - 3 and len(kept) == 4
+
+
+def test_analyze_sends_compacted_input(analyzer, fake_completions):
+    result = analyzer.analyze(SCAN, data_type="Nmap", use_cache=False)
+
+    prompt = fake_completions.calls[0]["messages"][-1]["content"]
+    assert "tcp filtered (3 puertos): 21,23-24" in prompt
+    assert "Service detection performed" not in prompt
+    compaction = result["metadata"]["compaction"]
+    assert compaction["compacted_chars"] < compaction["original_chars"]
+    assert compaction["dropped_lines"] == 0
+
+    packed = analyzer.analyze(SCAN * 20, data_type="Nmap", use_cache=False, compact=False, input_token_budget=200)
+    assert packed["metadata"]["compaction"]["dropped_lines"] > 0
+    assert "22/tcp  open     ssh     OpenSSH 8.2p1" in fake_completions.calls[1]["messages"][-1]["content"]
@@ -0,0 +1,105 @@
+"""Pruebas de la comparación de escaneos de `utils.diff`."""
+
+from utils.diff import (
+    diff_scans, format_diff, port_key, snapshot_hosts, snapshot_text, split_port_key, summarize_snapshot
+)
+from utils.nmap_xml import NmapHost, NmapPort
+
+BASELINE = """Nmap scan report for web.example.com (10.0.0.1)
+Host is up (0.010s latency).
+PORT    STATE  SERVICE VERSION
+22/tcp  open   ssh     OpenSSH 8.2p1
+80/tcp  open   http    nginx 1.18.0
+443/tcp closed https
+Nmap scan report for 10.0.0.2
+Host is up (0.010s latency).
+3306/tcp open mysql MySQL 5.7.32
+Nmap scan report for 10.0.0.3
+Host is up (0.010s latency).
+21/tcp open ftp vsftpd 3.0.3
+"""
+
+CURRENT = """Nmap scan report for web.example.com (10.0.0.1)
+Host is up (0.020s latency).
+PORT    STATE  SERVICE VERSION
+22/tcp  open   ssh     OpenSSH 9.6p1
+443/tcp open   https   nginx 1.24.0
+Nmap scan report for 10.0.0.2
+Host is up (0.030s latency).
+3306/tcp open mysql MySQL 5.7.32
+Nmap scan report for 10.0.0.4
+Host is up (0.010s latency).
+53/udp open domain
+"""
+
+
+def test_port_key_round_trip():
+    for protocol, port in (("tcp", 22), ("udp", 53), ("sctp", 65535), ("ip", 0)):
+        assert split_port_key(port_key(protocol, port)) == (protocol, port)
+    assert split_port_key(port_key("TCP", 80)) == ("tcp", 80)
+
+
+def test_snapshot_keeps_open_ports_of_live_hosts():
+    snapshot = snapshot_hosts([
+        NmapHost("10.0.0.1", ("web",), "up", (
+            NmapPort("tcp", 22, "open", "ssh", "OpenSSH", "8.2p1"),
+            NmapPort("tcp", 25, "closed", "smtp")
+        )),
+        NmapHost("10.0.0.1", (), "up", (NmapPort("udp", 161, "open|filtered", "snmp"),)),
+        NmapHost("10.0.0.9", (), "down", (NmapPort("tcp", 80, "open"),))
+    ])
+    assert snapshot.services == {"10.0.0.1": {
+        port_key("tcp", 22): ("ssh", "OpenSSH 8.2p1"),
+        port_key("udp", 161): ("snmp", "")
+    }}
+    assert snapshot.hostnames == {"10.0.0.1": ("web",)}
+
+
+def test_diff_scans_classifies_changes():
+    diff = diff_scans(snapshot_text(BASELINE), snapshot_text(CURRENT))
+    assert diff.added_hosts == ["10.0.0.4"]
+    assert diff.removed_hosts == ["10.0.0.3"]
+    assert [(c.address, c.port, c.protocol) for c in diff.opened] == [("10.0.0.4", 53, "udp"), ("10.0.0.1", 443, "tcp")]
+    assert [(c.address, c.port) for c in diff.closed] == [("10.0.0.3", 21), ("10.0.0.1", 80)]
+    assert [(c.port, c.previous_version, c.version) for c in diff.changed] == [(22, "OpenSSH 8.2p1", "OpenSSH 9.6p1")]
+    assert diff.unchanged_hosts == 1
+    assert diff.counts() == {
+        "added_hosts": 1, "removed_hosts": 1, "opened_ports": 2,
+        "closed_ports": 2, "changed_ports": 1, "unchanged_hosts": 1
+    }
+    assert not diff.is_empty()
+    assert diff_scans(snapshot_text(BASELINE), snapshot_text(BASELINE)).is_empty()
+
+
+def test_format_diff_lists_only_changes():
+    text = format_diff(diff_scans(snapshot_text(BASELINE), snapshot_text(CURRENT)))
+    lines = text.splitlines()
+    assert lines[0] == f"ESCANEO BASE: {summarize_snapshot(snapshot_text(BASELINE))}"
+    assert "+ 10.0.0.4 53/udp domain (host nuevo)" in lines
+    assert "- 10.0.0.3 21/tcp ftp vsftpd 3.0.3 (host desaparecido)" in lines
+    assert "+ 10.0.0.1 443/tcp https nginx 1.24.0" in lines
+    assert "~ 10.0.0.1 22/tcp ssh: OpenSSH 8.2p1 -> OpenSSH 9.6p1" in lines
+    assert "HOSTS DESAPARECIDOS (1):" in lines
+    assert "3306" not in text.split("HOSTS SIN CAMBIOS")[1]
+
+
+def test_summarize_snapshot():
+    assert summarize_snapshot(snapshot_text(BASELINE)) == (
+        "3 hosts activos, 4 puertos abiertos; servicios más comunes: ssh (1), http (1), mysql (1), ftp (1)"
+    )
+    assert summarize_snapshot(snapshot_text("")) == "0 hosts activos, 0 puertos abiertos"
+
+
+def test_analyze_diff_sends_only_the_changes(analyzer, fake_completions):
+    same = analyzer.analyze_diff(BASELINE, BASELINE.replace("0.010s", "0.500s"))
+    assert same["success"] and "No hay cambios" in same["result"]
+    assert fake_completions.calls == []
+
+    result = analyzer.analyze_diff(BASELINE, CURRENT, use_cache=False)
+    assert result["success"]
+    assert result["metadata"]["diff"]["changed_ports"] == 1
+    prompt = fake_completions.calls[0]["messages"][-1]["content"]
+    assert "~ 10.0.0.1 22/tcp ssh: OpenSSH 8.2p1 -> OpenSSH 9.6p1" in prompt
+    assert "MySQL 5.7.32" not in prompt
+
+    assert analyzer.analyze_diff("texto", "sin hosts")["success"] is False
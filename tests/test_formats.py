@@ -0,0 +1,122 @@
+"""Pruebas de los parsers de `utils.formats`."""
+
+from utils.formats import FORMAT_REGISTRY, detect_format, extract_hosts, parse_scan
+from utils.nmap_xml import NmapPort
+
+NMAP_GREPABLE = """# Nmap 7.94 scan initiated Mon May  1 10:00:00 2024 as: nmap -sV -oG - 10.0.0.0/30
+Host: 10.0.0.1 (web.example.com)\tStatus: Up
+Host: 10.0.0.1 (web.example.com)\tPorts: 22/open/tcp//ssh//OpenSSH 8.2p1/, 80/open/tcp//http//nginx 1.18.0/\tIgnored State: closed (998)
+Host: 10.0.0.2 ()\tStatus: Down
+# Nmap done at Mon May  1 10:00:05 2024 -- 4 IP addresses (1 host up) scanned in 5.00 seconds
+"""
+
+MASSCAN_LIST = """#masscan
+open tcp 80 10.0.0.1 1700000000
+open tcp 443 10.0.0.2 1700000001
+banner tcp 80 10.0.0.1 1700000002 http Server: nginx
+open tcp 22 10.0.0.1 1700000003
+# end
+"""
+
+NMAP_NORMAL = """Starting Nmap 7.94 ( https://nmap.org ) at 2024-05-01 10:00 UTC
+Nmap scan report for web.example.com (10.0.0.1)
+Host is up (0.012s latency).
+PORT    STATE  SERVICE VERSION
+22/tcp  open   ssh     OpenSSH 8.2p1 Ubuntu
+25/tcp  closed smtp
+OS details: Linux 5.4
+Nmap scan report for 10.0.0.2
+Host is up (0.020s latency).
+8080/tcp open  unknown
+"""
+
+MASSCAN_LINES = """[
+{   "ip": "10.0.0.1",   "timestamp": "1700000000", "ports": [ {"port": 80, "proto": "tcp", "status": "open"} ] },
+{   "ip": "10.0.0.2",   "timestamp": "1700000000", "ports": [ {"port": 22, "proto": "tcp", "status": "open"} ] },
+{finished: 1}
+]
+"""
+
+MASSCAN_INDENTED = """[
+  {
+    "ip": "10.0.0.1",
+    "timestamp": "1700000000",
+    "ports": [
+      {"port": 80, "proto": "tcp", "status": "open", "reason": "syn-ack", "ttl": 64}
+    ]
+  },
+  {
+    "ip": "10.0.0.2",
+    "timestamp": "1700000000",
+    "ports": [
+      {
+        "port": 443,
+        "proto": "tcp",
+        "service": {"name": "https", "banner": "nginx"}
+      }
+    ]
+  },
+{finished: 1}
+"""
+
+
+def _ports(text):
+    scan_format = detect_format(text)
+    assert scan_format is not None and scan_format.name == "masscan-json"
+    return {
+        host.address: [(port.portid, port.protocol, port.service) for port in host.ports]
+        for host in parse_scan(text, scan_format)
+    }
+
+
+def test_masscan_json_one_record_per_line():
+    assert _ports(MASSCAN_LINES) == {"10.0.0.1": [(80, "tcp", "")], "10.0.0.2": [(22, "tcp", "")]}
+
+
+def test_masscan_json_indented_document():
+    assert _ports(MASSCAN_INDENTED) == {"10.0.0.1": [(80, "tcp", "")], "10.0.0.2": [(443, "tcp", "https")]}
+
+
+def test_detect_format_names():
+    assert detect_format(NMAP_GREPABLE).name == "nmap-grepable"
+    assert detect_format(MASSCAN_LIST).name == "masscan-list"
+    assert detect_format(NMAP_NORMAL) is None
+    assert detect_format("Domain Name: EXAMPLE.COM") is None
+    assert list(FORMAT_REGISTRY)[0] == "nmap-xml"
+
+
+def test_nmap_grepable_merges_status_and_ports_lines():
+    hosts = list(parse_scan(NMAP_GREPABLE))
+    assert [(host.address, host.hostnames, host.status) for host in hosts] == [
+        ("10.0.0.1", ("web.example.com",), "up"),
+        ("10.0.0.2", (), "down")
+    ]
+    assert hosts[0].ports == (
+        NmapPort("tcp", 22, "open", "ssh", "OpenSSH 8.2p1"),
+        NmapPort("tcp", 80, "open", "http", "nginx 1.18.0")
+    )
+
+
+def test_masscan_list_groups_ports_and_banners_by_host():
+    hosts = list(parse_scan(MASSCAN_LIST))
+    assert [host.address for host in hosts] == ["10.0.0.1", "10.0.0.2"]
+    assert hosts[0].ports == (
+        NmapPort("tcp", 80, "open", "http", "Server: nginx"),
+        NmapPort("tcp", 22, "open")
+    )
+    assert hosts[1].ports == (NmapPort("tcp", 443, "open"),)
+
+
+def test_extract_hosts_falls_back_to_normal_output():
+    hosts = extract_hosts(NMAP_NORMAL)
+    assert [(host.address, host.hostnames, host.status) for host in hosts] == [
+        ("10.0.0.1", ("web.example.com",), "up"),
+        ("10.0.0.2", (), "up")
+    ]
+    assert hosts[0].ports == (
+        NmapPort("tcp", 22, "open", "ssh", "OpenSSH 8.2p1 Ubuntu"),
+        NmapPort("tcp", 25, "closed", "smtp")
+    )
+    assert hosts[0].os_guesses == (("Linux 5.4", 0),)
+    assert hosts[1].ports == (NmapPort("tcp", 8080, "open"),)
+    assert extract_hosts("texto sin escaneos") == []
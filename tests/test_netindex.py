@@ -0,0 +1,60 @@
+"""Pruebas de la extracción de redes y del árbol de prefijos de `utils.netindex`."""
+
+import ipaddress
+
+from utils.netindex import PrefixTree, aggregate_networks, extract_networks
+
+
+def _nets(*values):
+    return [ipaddress.ip_network(value) for value in values]
+
+
+def test_extract_networks_ipv4_ipv6_and_cidr():
+    text = (
+        "Alcance: 10.0.0.7/24 y 192.168.1.10; IPv6 2001:db8::1 y fe80::/64.\n"
+        "Otra vez 192.168.1.10. Hora 10:15:30, MAC aa:bb:cc:dd:ee:ff, ::ffff:10.0.0.1"
+    )
+    assert extract_networks(text) == _nets(
+        "10.0.0.0/24", "192.168.1.10/32", "2001:db8::1/128", "fe80::/64", "::ffff:10.0.0.1/128"
+    )
+    assert extract_networks("sin direcciones :: aquí") == []
+
+
+def test_aggregate_networks_collapses_adjacent_ranges():
+    assert aggregate_networks(["10.0.0.0/25", "10.0.0.128/25", "10.0.1.5", "2001:db8::/33", "2001:db8:8000::/33"]) == (
+        _nets("10.0.0.0/24", "10.0.1.5/32", "2001:db8::/32")
+    )
+
+
+def test_prefix_tree_longest_match_and_partition():
+    tree = PrefixTree([
+        ("10.0.0.0/8", "corporativo"),
+        ("10.1.0.0/16", "dmz"),
+        ("10.1.2.0/24", "web"),
+        "2001:db8::/32"
+    ])
+    assert len(tree) == 4
+    assert tree.longest_match("10.1.2.3") == (ipaddress.ip_network("10.1.2.0/24"), "web")
+    assert tree.longest_match("10.200.0.1")[1] == "corporativo"
+    assert tree.longest_match("192.168.0.1") is None
+    assert [value for _, value in tree.covering("10.1.2.3")] == ["corporativo", "dmz", "web"]
+    assert "2001:db8::5" in tree and "fe80::1%eth0" not in tree
+    assert ipaddress.ip_address("10.1.9.9") in tree
+
+    in_scope, out_of_scope = tree.partition(["10.1.2.3", "10.1.3.1", "8.8.8.8", "2001:db8::5"])
+    assert in_scope == {
+        "web": ["10.1.2.3"],
+        "dmz": ["10.1.3.1"],
+        ipaddress.ip_network("2001:db8::/32"): ["2001:db8::5"]
+    }
+    assert out_of_scope == ["8.8.8.8"]
+
+
+def test_prefix_tree_reinsert_and_aggregate():
+    tree = PrefixTree(["10.0.0.0/25", "10.0.0.128/25", "0.0.0.0/0"])
+    tree.insert("10.0.0.0/25", "nuevo valor")
+    assert len(tree) == 3
+    assert tree.longest_match("10.0.0.1")[1] == "nuevo valor"
+    assert tree.longest_match("1.2.3.4")[0] == ipaddress.ip_network("0.0.0.0/0")
+    assert tree.prefixes() == _nets("0.0.0.0/0", "10.0.0.0/25", "10.0.0.128/25")
+    assert tree.aggregate() == _nets("0.0.0.0/0")
@@ -0,0 +1,73 @@
+"""Pruebas del lector incremental de XML de Nmap de `utils.nmap_xml`."""
+
+from utils.nmap_xml import NmapHost, NmapPort, format_nmap_hosts, is_nmap_xml, iter_nmap_xml, parse_nmap_xml
+
+NMAP_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE nmaprun>
+<nmaprun scanner="nmap" args="nmap -sV -O -oX - 10.0.0.0/30" version="7.94">
+<host><status state="up" reason="syn-ack"/>
+<address addr="aa:bb:cc:dd:ee:ff" addrtype="mac"/>
+<address addr="10.0.0.1" addrtype="ipv4"/>
+<hostnames><hostname name="web.example.com" type="PTR"/><hostname name="web.example.com" type="user"/></hostnames>
+<ports>
+<port protocol="tcp" portid="22"><state state="open"/><service name="ssh" product="OpenSSH" version="8.2p1"/></port>
+<port protocol="tcp" portid="25"><state state="closed"/></port>
+<port protocol="udp" portid="53"><state state="open|filtered"/><service name="domain"/></port>
+</ports>
+<os><osmatch name="Linux 5.4" accuracy="96"/><osmatch name="Linux 4.15" accuracy="90"/></os>
+</host>
+<host><status state="down" reason="no-response"/><address addr="10.0.0.2" addrtype="ipv4"/></host>
+<runstats><finished time="1700000000"/></runstats>
+</nmaprun>
+"""
+
+
+def test_is_nmap_xml():
+    assert is_nmap_xml(NMAP_XML)
+    assert not is_nmap_xml("Nmap scan report for 10.0.0.1")
+    assert not is_nmap_xml("<html><body>nmaprun</body></html>")
+
+
+def test_parse_nmap_xml_builds_hosts():
+    hosts = list(parse_nmap_xml(NMAP_XML))
+    assert [host.address for host in hosts] == ["10.0.0.1", "10.0.0.2"]
+    web, down = hosts
+    assert web.status == "up" and down.status == "down"
+    # La dirección IP tiene prioridad sobre la MAC y los hostnames no se repiten
+    assert web.hostnames == ("web.example.com",)
+    assert web.ports == (
+        NmapPort("tcp", 22, "open", "ssh", "OpenSSH", "8.2p1"),
+        NmapPort("tcp", 25, "closed"),
+        NmapPort("udp", 53, "open|filtered", "domain")
+    )
+    assert web.os_guesses == (("Linux 5.4", 96), ("Linux 4.15", 90))
+    assert down.ports == ()
+
+
+def test_iter_nmap_xml_reads_files(tmp_path):
+    path = tmp_path / "scan.xml"
+    path.write_text(NMAP_XML, encoding="utf-8")
+    assert [host.address for host in iter_nmap_xml(path)] == ["10.0.0.1", "10.0.0.2"]
+    with open(path, "rb") as handle:
+        assert len(list(iter_nmap_xml(handle))) == 2
+
+
+def test_format_nmap_hosts_lists_open_ports():
+    hosts = list(parse_nmap_xml(NMAP_XML))
+    assert format_nmap_hosts(hosts) == (
+        "10.0.0.1 (web.example.com) [up] OS: Linux 5.4 (96%)\n"
+        "  22/tcp open ssh OpenSSH 8.2p1\n"
+        "  53/udp open|filtered domain\n"
+        "10.0.0.2 [down]"
+    )
+    assert "25/tcp closed" in format_nmap_hosts(hosts, include_closed=True)
+    assert format_nmap_hosts([NmapHost(address="10.0.0.9")]) == "10.0.0.9"
+
+
+def test_analyze_accepts_parsed_hosts(analyzer, fake_completions):
+    result = analyzer.analyze(parse_nmap_xml(NMAP_XML), use_cache=False)
+
+    assert result["success"]
+    assert result["metadata"]["data_type"] == "Nmap"
+    prompt = "\n".join(message["content"] for message in fake_completions.calls[0]["messages"])
+    assert "22/tcp open ssh OpenSSH 8.2p1" in prompt
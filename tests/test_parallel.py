@@ -0,0 +1,37 @@
+"""Pruebas del parsing en paralelo con un pool de procesos."""
+
+from utils import parallel
+from utils.parallel import parallel_scan_files, parallel_scan_text, shard_text
+from utils.parser import scan_text
+
+TEXT = "".join(f"Nmap scan report for host{i}.example.com (10.2.{i // 256}.{i % 256})\n{i % 1000}/tcp open\n" for i in range(3000))
+
+
+def _summary(scan):
+    return scan.characters, scan.lines, scan.words, scan.ips, scan.domains, scan.ports
+
+
+def test_shards_end_at_line_boundaries():
+    shards = shard_text(TEXT, shard_size=10000)
+    assert "".join(shards) == TEXT
+    assert len(shards) > 5 and all(shard.endswith("\n") for shard in shards)
+    assert shard_text("sin salto de línea", shard_size=4) == ["sin salto de línea"]
+
+
+def test_parallel_scan_matches_scan_text(monkeypatch):
+    monkeypatch.setattr(parallel, "PARALLEL_MIN_SIZE", 0)
+    assert _summary(parallel_scan_text(TEXT, workers=2, shard_size=50000)) == _summary(scan_text(TEXT))
+
+
+def test_file_batch_merges_non_contiguous_results(tmp_path):
+    paths = []
+    for index, part in enumerate(("10.9.0.1 a.example.com\n", "10.9.0.2\n22/tcp open\n")):
+        path = tmp_path / f"scan{index}.txt"
+        path.write_text(part, encoding="utf-8")
+        paths.append(path)
+
+    per_file, combined = parallel_scan_files(paths, workers=2)
+    assert set(per_file) == {str(path) for path in paths}
+    assert combined.ips == ["10.9.0.1", "10.9.0.2"] and combined.ports == [22]
+    assert combined.lines == per_file[str(paths[0])].lines + per_file[str(paths[1])].lines
+    assert parallel_scan_files([])[1].characters == 0
@@ -0,0 +1,76 @@
+"""Pruebas de la extracción de entidades de `utils.parser`."""
+
+from utils.parser import classify_data_type, extract_domains, extract_ips, normalize_text
+
+DIG_PTR = """;; QUESTION SECTION:
+;4.3.2.1.in-addr.arpa.\t\tIN\tPTR
+
+;; ANSWER SECTION:
+4.3.2.1.in-addr.arpa.\t3600\tIN\tPTR\thost.example.com.
+;; SERVER: 10.0.0.1#53(10.0.0.1)
+"""
+
+
+def test_reverse_dns_names_are_domains_not_ips():
+    assert "4.3.2.1.in-addr.arpa" in extract_domains(DIG_PTR)
+    assert "in-addr.arpa" not in extract_domains(DIG_PTR)
+    assert "4.3.2.1" not in extract_ips(DIG_PTR)
+    assert extract_ips(DIG_PTR) == ["10.0.0.1"]
+
+
+def test_ip_at_end_of_sentence_is_still_an_ip():
+    assert extract_ips("Host 192.168.1.10. Otro: 8.8.8.8.") == ["192.168.1.10", "8.8.8.8"]
+
+
+def test_dotted_sequences_longer_than_an_ip_do_not_invent_addresses():
+    assert extract_ips("version 1.2.3.4.5") == ["1.2.3.4"]
+    assert extract_ips("1.2.3.4.5.6") == ["1.2.3.4"]
+    # OID SNMP (sysName): solo el prefijo, como la extracción original
+    assert extract_ips("iso.3.6.1.2.1.1.5.0 = STRING: router") == []
+    assert extract_ips("1.3.6.1.2.1.1.5.0 = STRING: router") == ["1.3.6.1"]
+
+
+def test_scan_buffer_matches_scan_text_across_windows(tmp_path):
+    import mmap
+
+    from utils.parser import scan_buffer, scan_text
+
+    block = "Nmap scan report for servidor-ñandú.example.com (10.0.{i}.1)\n22/tcp open ssh — «OpenSSH» 8.2p1 ✓\n"
+    text = "".join(block.format(i=i % 256) for i in range(30_000))
+    data = text.encode("utf-8")
+    assert len(data) > 2 * (1 << 20)
+
+    expected = scan_text(text)
+    path = tmp_path / "scan.txt"
+    path.write_bytes(data)
+    with open(path, "rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        scan = scan_buffer(mapped)
+
+    assert (scan.characters, scan.lines, scan.words) == (expected.characters, expected.lines, expected.words)
+    assert scan.ips == expected.ips and scan.ports == expected.ports
+    assert scan_buffer(text.encode("latin-1", "replace"), encoding="latin-1").characters == len(text)
+
+
+def test_classifier_stops_early_on_decisive_nmap_output():
+    text = "Starting Nmap 7.94\nHost is up (0.01s latency).\nPORT   STATE SERVICE\n22/tcp open ssh\n" * 3
+    result = classify_data_type(text)
+    assert result.label == "Nmap" and result.decisive
+    assert result.confidence == 1.0 and set(result.signals) == {"Nmap"}
+
+
+def test_classifier_only_samples_head_and_tail():
+    whois = "Domain Name: example.com\nRegistrar: Example\nCreation Date: 2020-01-01\n" * 20
+    text = whois + "Starting Nmap 7.94\nHost is up.\n22/tcp open ssh\n" + whois
+    # Las señales de Nmap del centro quedan fuera de una muestra pequeña
+    assert classify_data_type(text, head=200, tail=200).label == "WHOIS"
+    assert classify_data_type(text).label == "Mixto"
+    assert classify_data_type("").label == "Desconocido"
+
+
+def test_normalize_text_accepts_str_and_bytes_alike():
+    raw = "  Línea\x00 uno\r\n\r\n\r\n\r\nLínea\x07 dos\r\n  "
+    expected = "Línea uno\n\nLínea dos"
+    assert normalize_text(raw) == expected
+    assert normalize_text(raw.encode("utf-8")) == expected
+    assert normalize_text(bytearray(raw.encode("latin-1")), encoding="latin-1") == expected
+    assert normalize_text(b"") == ""
@@ -0,0 +1,39 @@
+"""Pruebas del orden de los prompts (contenido fijo primero, datos al final)."""
+
+import os
+
+from ai.prompts import (
+    ANALYSIS_RESTRICTIONS, get_analysis_prompt, get_chunk_prompt, get_reduce_prompt, get_structured_prompt,
+)
+
+
+def _shared_prefix(first: str, second: str) -> str:
+    return os.path.commonprefix([first, second])
+
+
+def test_analysis_prompts_share_the_static_prefix():
+    first = get_analysis_prompt("22/tcp open ssh", "Nmap", type_scores={"Nmap": 1.0})
+    second = get_analysis_prompt("80/tcp open http", "Nmap")
+    prefix = _shared_prefix(first, second)
+
+    # Todo lo fijo (formato y restricciones) queda antes del primer dato variable
+    assert ANALYSIS_RESTRICTIONS in prefix
+    assert first.endswith("22/tcp open ssh\n```\n")
+    assert len(prefix) >= first.index("TIPO DE DATOS: Nmap")
+
+
+def test_structured_and_reduce_prompts_keep_the_data_last():
+    structured = get_structured_prompt("dato-a", "IPs: 10.0.0.1", "Nmap")
+    other = get_structured_prompt("dato-b", "IPs: 10.0.0.2", "Nmap")
+    assert ANALYSIS_RESTRICTIONS in _shared_prefix(structured, other)
+    assert structured.index("IPs: 10.0.0.1") > structured.index(ANALYSIS_RESTRICTIONS)
+
+    reduce = get_reduce_prompt(["- 10.0.0.1", "- 10.0.0.2"], "Nmap")
+    assert reduce.index("2 fragmentos") > reduce.index(ANALYSIS_RESTRICTIONS)
+    assert reduce.rstrip().endswith("### Fragmento 2\n- 10.0.0.2\n```")
+
+
+def test_chunk_prompts_differ_only_after_the_instructions():
+    first = get_chunk_prompt("10.0.0.1", 1, 3, "Nmap")
+    second = get_chunk_prompt("10.0.0.2", 2, 3, "Nmap")
+    assert _shared_prefix(first, second).rstrip().endswith("Omite las categorías vacías y no repitas los datos en bruto.\n\nFragmento")
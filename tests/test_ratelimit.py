@@ -0,0 +1,36 @@
+"""Pruebas de los limitadores de ritmo."""
+
+import asyncio
+
+import pytest
+
+from ai.ratelimit import RateLimiter, TokenBucket
+
+
+def test_bucket_waits_for_refill_and_caps_oversized_requests(monkeypatch):
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+        bucket._updated -= seconds
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    bucket = TokenBucket(per_minute=60, capacity=2)
+
+    async def run():
+        await bucket.acquire(2)
+        await bucket.acquire(1)
+        # Mayor que la capacidad: se limita a 2 en vez de bloquearse
+        await bucket.acquire(100)
+
+    asyncio.run(run())
+    assert slept[0] == pytest.approx(1.0, abs=0.05)
+    assert slept[1] == pytest.approx(2.0, abs=0.05)
+    assert bucket.tokens < 0.01
+
+
+def test_limiter_without_limits_never_waits():
+    limiter = RateLimiter()
+    assert limiter.requests is None and limiter.tokens is None
+    asyncio.run(limiter.acquire(10 ** 9))
+    assert RateLimiter(rpm=10, tpm=1000).tokens.capacity == 1000
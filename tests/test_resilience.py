@@ -0,0 +1,100 @@
+"""Pruebas del circuit breaker y de los reintentos de `ai.resilience`."""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("openai")
+
+from ai import resilience  # noqa: E402
+from ai.resilience import CircuitBreaker, ResilientCaller, RetryPolicy  # noqa: E402
+
+
+def _half_open_breaker(monkeypatch, model: str) -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.state == "half-open"
+    monkeypatch.setitem(resilience._breakers, model, breaker)
+    return breaker
+
+
+def test_non_retryable_error_during_probe_releases_breaker(monkeypatch):
+    breaker = _half_open_breaker(monkeypatch, "modelo-prueba")
+    caller = ResilientCaller(RetryPolicy(max_retries=0))
+
+    def bad_request(model, timeout):
+        raise ValueError("400: petición no válida")
+
+    with pytest.raises(ValueError):
+        caller.call(bad_request, "modelo-prueba")
+
+    assert breaker.allow()
+    response, info = caller.call(lambda model, timeout: "ok", "modelo-prueba")
+    assert response == "ok"
+    assert info["model"] == "modelo-prueba"
+
+
+def test_non_retryable_error_during_async_probe_releases_breaker(monkeypatch):
+    breaker = _half_open_breaker(monkeypatch, "modelo-prueba-async")
+    caller = ResilientCaller(RetryPolicy(max_retries=0))
+
+    async def bad_request(model, timeout):
+        raise ValueError("400: petición no válida")
+
+    async def ok(model, timeout):
+        return "ok"
+
+    with pytest.raises(ValueError):
+        asyncio.run(caller.call_async(bad_request, "modelo-prueba-async"))
+
+    assert breaker.allow()
+    response, _ = asyncio.run(caller.call_async(ok, "modelo-prueba-async"))
+    assert response == "ok"
+
+
+def test_interrupted_probe_releases_breaker(monkeypatch):
+    breaker = _half_open_breaker(monkeypatch, "modelo-interrumpido")
+    caller = ResilientCaller(RetryPolicy(max_retries=0))
+
+    def interrupted(model, timeout):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        caller.call(interrupted, "modelo-interrumpido")
+
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+
+
+def test_stream_opens_do_not_feed_hedging_latencies(monkeypatch):
+    tracker = resilience.LatencyTracker(min_samples=1)
+    monkeypatch.setattr(resilience, "LATENCIES", tracker)
+    monkeypatch.setitem(resilience._breakers, "modelo-stream", CircuitBreaker())
+    caller = ResilientCaller(RetryPolicy(max_retries=0), hedge=True)
+
+    caller.call(lambda model, timeout: iter(()), "modelo-stream", stream=True)
+    assert tracker.percentile("modelo-stream") is None
+
+    caller.call(lambda model, timeout: "ok", "modelo-stream", max_tokens=100)
+    assert tracker.percentile("modelo-stream") is not None
+
+
+def test_timeout_scales_with_max_tokens(monkeypatch):
+    monkeypatch.setitem(resilience._breakers, "modelo-timeout", CircuitBreaker())
+    caller = ResilientCaller(RetryPolicy(max_retries=0, timeout=60.0))
+    timeouts = []
+
+    def record_timeout(model, timeout):
+        timeouts.append(timeout)
+        return "ok"
+
+    caller.call(record_timeout, "modelo-timeout", max_tokens=4000)
+    caller.call(record_timeout, "modelo-timeout", max_tokens=4000, stream=True)
+    asyncio.run(caller.call_async(lambda model, timeout: _async_value(timeouts, timeout), "modelo-timeout", max_tokens=500))
+
+    assert timeouts == [180.0, 60.0, 75.0]
+
+
+async def _async_value(timeouts, timeout):
+    timeouts.append(timeout)
+    return "ok"
@@ -0,0 +1,35 @@
+"""Pruebas de la caché persistente de respuestas."""
+
+from ai.cache import ResponseCache, response_cache_key
+
+ARGS = ("gpt-4o-mini", "Completo", "Nmap", 0.3, 2000, "v1", "22/tcp open ssh")
+
+
+def test_cache_key_ignores_mode_case_but_not_parameters():
+    key = response_cache_key(*ARGS)
+    assert response_cache_key("gpt-4o-mini", "completo", *ARGS[2:]) == key
+    assert response_cache_key(*ARGS[:3], 0.7, *ARGS[4:]) != key
+    assert response_cache_key(*ARGS[:6], "23/tcp open telnet") != key
+
+
+def test_entries_survive_a_restart_and_are_copies(tmp_path):
+    path = tmp_path / "responses.sqlite3"
+    key = response_cache_key(*ARGS)
+    value = {"success": True, "result": {"summary": "ok"}}
+
+    cache = ResponseCache(path)
+    cache.put(key, value)
+    value["result"]["summary"] = "modificado"
+    assert cache.get(key) == ({"success": True, "result": {"summary": "ok"}}, "memory")
+
+    assert ResponseCache(path).get(key) == ({"success": True, "result": {"summary": "ok"}}, "disk")
+    assert ResponseCache(path, ttl=-1).get(key) == (None, None)
+
+
+def test_least_recently_used_entries_are_evicted_over_max_bytes():
+    cache = ResponseCache(":memory:", max_bytes=150, memory_size=1)
+    for index in range(3):
+        cache.put(f"k{index}", {"text": str(index) * 50})
+    assert cache.get("k0") == (None, None)
+    assert cache.get("k2")[0] == {"text": "2" * 50}
+    assert cache.stats()["disk_entries"] == 2
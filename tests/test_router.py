@@ -0,0 +1,32 @@
+"""Pruebas del router de modelos y de la predicción de `max_tokens`."""
+
+import pytest
+
+from ai.router import UsageHistory, normalize_data_type, predict_max_tokens, required_quality, route
+
+
+@pytest.mark.parametrize("label", ["WHOIS", "DNS", "WHOIS/DNS"])
+def test_auto_detected_whois_dns_labels_use_whois_dns_defaults(label):
+    history = UsageHistory()
+    assert normalize_data_type(label) == "WHOIS/DNS"
+    assert predict_max_tokens(label, "junior", history) == 1700
+    assert predict_max_tokens(label, "expert", history) == 1200
+    assert required_quality(label, "junior", 5_000) == 1
+
+
+def test_whois_label_routes_small_lookups_to_cheapest_model():
+    decision = route(5_000, "WHOIS", "junior", ["gpt-3.5-turbo", "gpt-4o"], history=UsageHistory())
+    assert decision.model == "gpt-3.5-turbo"
+    assert decision.max_tokens == 1700
+
+
+def test_history_pools_whois_and_dns_samples():
+    history = UsageHistory()
+    for _ in range(5):
+        history.record("gpt-4o-mini", "DNS", "junior", 400)
+    assert history.completion_tokens("WHOIS", "junior") == [400] * 5
+    assert predict_max_tokens("WHOIS", "junior", history) == 500
+
+
+def test_unknown_data_type_falls_back_to_mixed_default():
+    assert predict_max_tokens("Mixto", "expert", UsageHistory()) == 2500
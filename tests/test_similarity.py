@@ -0,0 +1,85 @@
+"""Pruebas de la detección de escaneos casi duplicados de `utils.similarity`."""
+
+from utils.similarity import (
+    MinHasher, SimilarityIndex, estimate_similarity, lsh_bands, scan_features, strip_volatile
+)
+
+
+def _scan(hosts: int, latency: str = "0.010", date: str = "2024-05-01 10:00", skip: int = -1) -> str:
+    blocks = [f"Starting Nmap 7.94 ( https://nmap.org ) at {date} UTC"]
+    for i in range(hosts):
+        if i == skip:
+            continue
+        blocks.append(
+            f"Nmap scan report for host{i}.example.com (10.0.0.{i + 1})\n"
+            f"Host is up ({latency}s latency).\n"
+            f"22/tcp open ssh OpenSSH 8.{i}p1\n"
+            f"80/tcp open http nginx 1.{i}.0"
+        )
+    blocks.append(f"Nmap done: {hosts} IP addresses ({hosts} hosts up) scanned in 12.{hosts} seconds")
+    return "\n".join(blocks)
+
+
+def test_strip_volatile_removes_dates_latency_and_durations():
+    first = strip_volatile(_scan(3))
+    second = strip_volatile(_scan(3, latency="0.250", date="2025-01-31 23:59"))
+    assert first == second
+    assert "latency)" in first and "0.010" not in first
+    assert strip_volatile(";; Query time: 12 msec\n;; ANSWER SECTION:") == "\n;; ANSWER SECTION:"
+
+
+def test_scan_features_ignore_order_and_spacing():
+    assert scan_features("a  b\nc\n\n") == scan_features("c\na b")
+    # Cabecera, cierre, una línea "Host is up (latency)" común y tres por host
+    assert len(scan_features(_scan(5))) == 3 + 5 * 3
+    assert scan_features("") == set()
+
+
+def test_minhash_estimates_jaccard():
+    hasher = MinHasher(num_perm=128)
+    first = scan_features(_scan(50))
+    second = scan_features(_scan(50, skip=7))
+    jaccard = len(first & second) / len(first | second)
+    estimate = estimate_similarity(hasher.signature(first), hasher.signature(second))
+    assert abs(estimate - jaccard) < 0.1
+    # Misma semilla: firmas idénticas entre instancias (se pueden persistir)
+    assert MinHasher(num_perm=128).signature(first) == hasher.signature(first)
+    assert estimate_similarity(hasher.signature(set()), hasher.signature(set())) == 1.0
+
+
+def test_lsh_bands_threshold_not_above_target():
+    for threshold in (0.5, 0.8, 0.9):
+        bands, rows = lsh_bands(threshold, 64)
+        assert bands * rows == 64
+        assert (1 / bands) ** (1 / rows) <= threshold
+
+
+def test_similarity_index_query_and_scope():
+    hasher = MinHasher()
+    index = SimilarityIndex(threshold=0.8)
+    base = hasher.signature(scan_features(_scan(50)))
+    index.add("base", base, scope="gpt-4o-mini")
+    index.add("base", base, scope="gpt-4o-mini")
+    index.add("otro", hasher.signature(scan_features(_scan(50, skip=0).replace("nginx", "apache"))), scope="gpt-4o-mini")
+    assert len(index) == 2
+
+    key, similarity = index.query(hasher.signature(scan_features(_scan(50, latency="0.5", skip=3))), "gpt-4o-mini")
+    assert key == "base" and similarity >= 0.8
+    assert index.query(base, scope="gpt-4o") is None
+    assert index.query(hasher.signature(scan_features(_scan(3))), "gpt-4o-mini") is None
+
+
+def test_analyze_reuses_near_duplicate_scan(analyzer, fake_completions):
+    analyzer.similarity_threshold = 0.8
+    first = analyzer.analyze(_scan(40), data_type="Nmap")
+    again = analyzer.analyze(_scan(40, latency="0.300", date="2024-06-01 09:00", skip=5), data_type="Nmap")
+
+    assert first["success"] and again["success"]
+    cache = again["metadata"]["cache"]
+    assert cache["hit"] and cache["near_duplicate"] and cache["similarity"] >= 0.8
+    assert again["result"] == first["result"]
+    assert len(fake_completions.calls) == 1
+
+    different = analyzer.analyze(_scan(4), data_type="Nmap")
+    assert not different["metadata"]["cache"]["hit"]
+    assert len(fake_completions.calls) == 2
@@ -0,0 +1,56 @@
+"""Pruebas de la ingesta por bloques de `utils.streaming`."""
+
+import io
+
+from utils.assets import AssetStore
+from utils.parser import scan_text
+from utils.streaming import iter_text_chunks, scan_mapped, scan_source, stream_scan
+
+TEXT = "".join(
+    f"Nmap scan report for host{i}.example.com (10.0.{i // 256}.{i % 256})\n{20 + i % 5}/tcp open ssh ñandú\n"
+    for i in range(400)
+)
+
+
+def test_chunks_end_at_line_boundaries_and_rebuild_the_text():
+    chunks = list(iter_text_chunks(io.StringIO(TEXT), chunk_size=1000))
+    assert len(chunks) > 10
+    assert "".join(chunks) == TEXT
+    assert all(chunk.endswith("\n") for chunk in chunks)
+
+
+def test_binary_input_is_decoded_across_block_boundaries():
+    data = TEXT.encode("utf-8")
+    # Bloques de 7 bytes: los caracteres de 2 bytes quedan partidos entre bloques
+    assert "".join(iter_text_chunks(io.BytesIO(data), chunk_size=7)) == TEXT
+
+
+def test_overlong_lines_are_cut_at_a_space():
+    line = "palabra " * 1000
+    chunks = list(iter_text_chunks(io.StringIO(line), chunk_size=100))
+    assert "".join(chunks) == line
+    assert all(chunk.endswith(" ") for chunk in chunks[:-1])
+
+
+def test_scan_source_and_scan_mapped_match_scan_text(tmp_path):
+    path = tmp_path / "scan.txt"
+    path.write_text(TEXT, encoding="utf-8")
+    expected = scan_text(TEXT)
+
+    store = AssetStore()
+    for scan in (scan_source(path, chunk_size=512, store=store), scan_mapped(path)):
+        assert (scan.characters, scan.lines, scan.words) == (expected.characters, expected.lines, expected.words)
+        assert scan.ips == expected.ips and scan.domains == expected.domains and scan.ports == expected.ports
+    assert len(store.ips) == 400
+
+    empty = tmp_path / "vacio.txt"
+    empty.write_bytes(b"")
+    assert scan_mapped(empty).characters == 0
+
+
+def test_stream_scan_yields_only_new_entities():
+    updates = list(stream_scan(io.StringIO(TEXT), chunk_size=1000))
+    assert sum(len(update.ips) for update in updates) == 400
+    assert sorted(port for update in updates for port in update.ports) == [20, 21, 22, 23, 24]
+    assert updates[-1].stats["characters"] == len(TEXT) == updates[-1].offset
+    assert updates[-1].stats["ips"] == 400 and updates[-1].stats["lines"] == TEXT.count("\n") + 1
@@ -0,0 +1,38 @@
+"""Pruebas del modo de salida estructurada de `ai.structured`."""
+
+import json
+
+from ai.structured import extract_facts, parse_report, render_report
+
+NMAP_TEXT = """Nmap scan report for web.example.com (10.0.0.1)
+Host is up (0.012s latency).
+PORT   STATE SERVICE VERSION
+22/tcp open  ssh     OpenSSH 8.2p1"""
+
+
+def test_parse_report_fills_missing_keys():
+    report = parse_report('```json\n{"summary": "Servidor SSH"}\n```')
+    assert report["summary"] == "Servidor SSH"
+    assert report["findings"] == [] and report["exposure_level"] == ""
+
+
+def test_parse_report_converts_free_json_object_items():
+    # Respuesta típica de un modelo con {"type": "json_object"}
+    report = parse_report(json.dumps({
+        "findings": ["Puerto 22 abierto"],
+        "recommendations": ["Deshabilitar el acceso con contraseña"],
+        "technologies": "OpenSSH"
+    }))
+    assert report["findings"] == [{"title": "Puerto 22 abierto"}]
+    assert report["recommendations"] == [{"action": "Deshabilitar el acceso con contraseña"}]
+    assert report["technologies"] == ["OpenSSH"]
+
+    markdown = render_report(report, extract_facts(NMAP_TEXT))
+    assert "**Puerto 22 abierto**" in markdown
+    assert "Deshabilitar el acceso con contraseña" in markdown
+
+
+def test_parse_report_rejects_unexpected_types():
+    assert parse_report('{"findings": [3]}') is None
+    assert parse_report('{"summary": {"texto": "x"}}') is None
+    assert parse_report('["no es un objeto"]') is None
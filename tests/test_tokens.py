@@ -0,0 +1,88 @@
+"""Pruebas del conteo de tokens y la estimación de costes de `ai.tokens`."""
+
+import types
+
+import pytest
+
+from ai import tokens
+from ai.tokens import (
+    MODEL_PRICING, best_model_within_budget, cached_prompt_tokens, count_message_tokens, count_tokens,
+    estimate_cost, get_model_pricing, get_token_counter
+)
+
+
+@pytest.fixture
+def heuristic(monkeypatch):
+    # Conteo heurístico aunque tiktoken esté instalado
+    monkeypatch.setattr(tokens, "tiktoken", None)
+    tokens._get_encoding.cache_clear()
+    yield
+    tokens._get_encoding.cache_clear()
+
+
+def test_heuristic_counts(heuristic):
+    assert not tokens.has_exact_tokenizer()
+    assert count_tokens("") == 0
+    # "Nmap" (1) + "scan" (1) + "report" (2) + "10" "0" "0" "1" (4) + "." x3 (3) + "\n" (1)
+    assert count_tokens("Nmap scan report 10.0.0.1\n") == 12
+    assert count_tokens("65535/tcp") == 2 + 1 + 1
+    assert get_token_counter()("Nmap scan report 10.0.0.1\n") == 12
+
+
+def test_count_message_tokens_adds_chat_overhead(heuristic):
+    messages = [{"role": "system", "content": "Eres un analista"}, {"role": "user", "content": "Hola"}]
+    expected = tokens.TOKENS_PER_REPLY + sum(
+        tokens.TOKENS_PER_MESSAGE + count_tokens(message["content"]) + 1 for message in messages
+    )
+    assert count_message_tokens(messages) == expected
+
+
+def test_estimate_cost_with_cache_and_batch_discount():
+    pricing = MODEL_PRICING["gpt-4o"]
+    cost = estimate_cost(1000, 500, "gpt-4o", cached_tokens=400)
+    assert cost["input_cost"] == round(600 * pricing["input"] + 400 * pricing["cached_input"], 6)
+    assert cost["output_cost"] == round(500 * pricing["output"], 6)
+    assert cost["cached_tokens"] == 400
+    batch = estimate_cost(1000, 500, "gpt-4o", batch=True)
+    assert batch["total_cost"] == pytest.approx(estimate_cost(1000, 500, "gpt-4o")["total_cost"] / 2, abs=1e-6)
+    # Los tokens cacheados nunca superan los de prompt
+    assert estimate_cost(10, 0, "gpt-4o", cached_tokens=50)["cached_tokens"] == 10
+
+
+def test_unknown_models_use_the_most_expensive_pricing():
+    assert get_model_pricing("modelo-nuevo") == MODEL_PRICING["gpt-4-turbo"]
+
+
+def test_cached_prompt_tokens_from_sdk_objects_and_dicts():
+    assert cached_prompt_tokens({"prompt_tokens_details": {"cached_tokens": 128}}) == 128
+    assert cached_prompt_tokens(types.SimpleNamespace(prompt_tokens_details=types.SimpleNamespace(cached_tokens=64))) == 64
+    assert cached_prompt_tokens(types.SimpleNamespace(prompt_tokens=10)) == 0
+    assert cached_prompt_tokens({"prompt_tokens_details": None}) == 0
+
+
+def test_best_model_within_budget():
+    models = list(MODEL_PRICING)
+    budget = estimate_cost(10_000, 2_000, "gpt-4o")["total_cost"]
+    assert best_model_within_budget(budget, 10_000, 2_000, models) == "gpt-4o"
+    assert best_model_within_budget(budget, 10_000, 2_000, models, exclude="gpt-4o") == "gpt-3.5-turbo"
+    assert best_model_within_budget(0.0, 10_000, 2_000, models) is None
+
+
+def test_preflight_and_budget_policies(analyzer, fake_completions):
+    text = "Nmap scan report for 10.0.0.1\n22/tcp open ssh OpenSSH 8.2p1\n" * 50
+    preflight = analyzer.preflight(text, data_type="Nmap", max_tokens=1000)
+    assert preflight["prompt_tokens"] > 0 and preflight["max_completion_tokens"] == 1000
+    assert preflight["within_budget"]
+    assert preflight["projected_cost"] == estimate_cost(preflight["prompt_tokens"], 1000, analyzer.model)
+
+    analyzer.set_model("gpt-4o")
+    analyzer.budget = preflight["projected_cost"]["total_cost"]
+    refused = analyzer.analyze(text, data_type="Nmap", max_tokens=1000, use_cache=False)
+    assert refused["success"] is False and "presupuesto" in refused["error"]
+    assert fake_completions.calls == []
+
+    analyzer.budget_policy = "downgrade"
+    downgraded = analyzer.analyze(text, data_type="Nmap", max_tokens=1000, use_cache=False)
+    assert downgraded["success"]
+    assert downgraded["metadata"]["preflight"]["downgraded_from"] == "gpt-4o"
+    assert fake_completions.calls[0]["model"] != "gpt-4o"